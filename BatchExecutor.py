@@ -0,0 +1,393 @@
+import numpy as np
+
+from Compiler import Compiler
+from errors.StackUnderflowError import StackUnderflowError
+from Executor import Executor
+from token_types.DropKeep import DropKeep
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from token_types.VectorLiteral import VectorLiteral
+from util.Stack import Stack
+from values.Vec3 import Vec3
+
+NUMBER = "number"
+# Numbers the interpreter holds as ints, such as floors. The column holds them as floats
+# and they come back as ints. Math that would keep them ints is left to the interpreter
+INTEGER = "integer"
+VECTOR = "vector"
+BOOLEAN = "boolean"
+
+AXES = np.array([
+    [1, 0, 0],
+    [0, 1, 0],
+    [0, 0, 1],
+    [-1, 0, 0],
+    [0, -1, 0],
+    [0, 0, -1]
+], dtype=float)
+
+
+class NotVectorizable(Exception):
+    pass
+
+
+class Column:
+    """One stack slot across the whole batch.
+
+    ``data`` is either an array with one entry (or row, for vectors) per stack, or a
+    single value shared by every stack when the slot holds a constant. ``values`` keeps
+    the original Python values of input slots, so untouched slots come back unchanged.
+    """
+    __slots__ = ("kind", "data", "values")
+
+    def __init__(self, kind, data, values=None):
+        self.kind = kind
+        self.data = data
+        self.values = values
+
+    def to_values(self, count):
+        if self.values is not None:
+            return self.values
+        data = self.data
+        if self.kind == VECTOR:
+            return Vec3.from_rows(np.broadcast_to(data, (count, 3)))
+        data = np.broadcast_to(data, (count,))
+        if self.kind == BOOLEAN:
+            return [bool(item) for item in data]
+        if self.kind == INTEGER:
+            return [int(item) for item in data.tolist()]
+        return data.tolist()
+
+
+def input_column(values):
+    if all(isinstance(value, bool) for value in values):
+        return Column(BOOLEAN, np.array(values), values)
+    if all(isinstance(value, float) for value in values):
+        return Column(NUMBER, np.array(values, dtype=float), values)
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return Column(INTEGER, np.array(values, dtype=float), values)
+    if all(type(value) is Vec3 for value in values):
+        return Column(VECTOR, Vec3.to_rows(values), values)
+    raise NotVectorizable("slot holds mixed or unsupported values")
+
+
+def require(column, *kinds):
+    if column.kind not in kinds:
+        raise NotVectorizable(f"{column.kind} is not supported here")
+
+
+def integers(data):
+    """Return a column of numbers the interpreter would hold as ints."""
+    # The interpreter can't make ints of infinities or NaN, so it reports them instead
+    if not np.all(np.isfinite(data)):
+        raise NotVectorizable("numbers that aren't finite can't be ints")
+    return Column(INTEGER, data)
+
+
+def as_vector_operand(column, other):
+    # Numbers combined with vectors broadcast over the vector's components
+    if column.kind == NUMBER and other.kind == VECTOR:
+        return np.asarray(column.data)[..., None]
+    return column.data
+
+
+def elementwise(func, keeps_integers=True):
+    """Build a math operator. ``keeps_integers`` is whether it gives an int for two ints in the interpreter."""
+    def apply(stack):
+        a = stack.pop()
+        b = stack.pop()
+        require(a, NUMBER, INTEGER, VECTOR)
+        require(b, NUMBER, INTEGER, VECTOR)
+        if INTEGER in (a.kind, b.kind):
+            if VECTOR in (a.kind, b.kind) or (keeps_integers and a.kind == b.kind):
+                raise NotVectorizable("math that keeps ints is not vectorized")
+        kind = VECTOR if VECTOR in (a.kind, b.kind) else NUMBER
+        stack.append(Column(kind, func(as_vector_operand(b, a), as_vector_operand(a, b))))
+
+    return apply
+
+
+add = elementwise(np.add)
+sub = elementwise(np.subtract)
+multiply = elementwise(np.multiply)
+divide = elementwise(np.divide, keeps_integers=False)
+power = elementwise(np.power)
+
+
+def mul(stack):
+    a = stack[-1]
+    b = stack[-2]
+    if a.kind == VECTOR and b.kind == VECTOR:
+        del stack[-2:]
+        stack.append(Column(NUMBER, (b.data * a.data).sum(axis=-1)))
+    else:
+        multiply(stack)
+
+
+def div(stack):
+    a = stack[-1]
+    b = stack[-2]
+    if a.kind == VECTOR and b.kind == VECTOR:
+        del stack[-2:]
+        stack.append(Column(VECTOR, np.cross(b.data, a.data)))
+    elif a.kind == VECTOR and b.kind in (NUMBER, INTEGER):
+        # Left to the interpreter, which divides componentwise with its own errors
+        raise NotVectorizable("numbers divided by vectors are not vectorized")
+    else:
+        divide(stack)
+
+
+def pwr(stack):
+    a = stack[-1]
+    b = stack[-2]
+    if a.kind == VECTOR and b.kind == VECTOR:
+        del stack[-2:]
+        scale = (b.data * a.data).sum(axis=-1) / (b.data * b.data).sum(axis=-1)
+        stack.append(Column(VECTOR, b.data * np.asarray(scale)[..., None]))
+    elif VECTOR in (a.kind, b.kind):
+        # Vectors raise to or by numbers with math.pow, whose domain errors numpy doesn't match
+        raise NotVectorizable("powers of numbers and vectors are not vectorized")
+    else:
+        power(stack)
+
+
+def mag(stack):
+    a = stack.pop()
+    require(a, NUMBER, INTEGER, VECTOR)
+    if a.kind == VECTOR:
+        stack.append(Column(NUMBER, np.linalg.norm(a.data, axis=-1)))
+    else:
+        stack.append(Column(a.kind, np.abs(a.data)))
+
+
+def unary(func):
+    def apply(stack):
+        a = stack.pop()
+        require(a, NUMBER, INTEGER)
+        stack.append(Column(NUMBER, func(a.data)))
+
+    return apply
+
+
+def rounding(func):
+    # math.floor and math.ceil give ints
+    def apply(stack):
+        a = stack.pop()
+        require(a, NUMBER, INTEGER)
+        stack.append(integers(func(a.data)))
+
+    return apply
+
+
+def vctr_mk(stack):
+    x = stack.pop()
+    y = stack.pop()
+    z = stack.pop()
+    for column in (x, y, z):
+        require(column, NUMBER, INTEGER)
+    components = np.broadcast_arrays(z.data, y.data, x.data)
+    stack.append(Column(VECTOR, np.stack(components, axis=-1)))
+
+
+def vctr_unmk(stack):
+    a = stack.pop()
+    require(a, VECTOR)
+    for i in range(3):
+        stack.append(Column(NUMBER, a.data[..., i]))
+
+
+def axis(stack):
+    a = stack.pop()
+    require(a, NUMBER, INTEGER, VECTOR)
+    if a.kind != VECTOR:
+        # The sign, as an int
+        stack.append(integers(np.sign(a.data)))
+        return
+    closest = AXES[np.argmax(a.data @ AXES.T, axis=-1)]
+    is_zero = ~np.any(a.data, axis=-1)
+    stack.append(Column(VECTOR, np.where(np.asarray(is_zero)[..., None], a.data, closest)))
+
+
+def comparison(func):
+    def apply(stack):
+        a = stack.pop()
+        b = stack.pop()
+        require(a, NUMBER, INTEGER)
+        require(b, NUMBER, INTEGER)
+        # Comparisons take the top of the stack as their left operand, like the interpreter
+        stack.append(Column(BOOLEAN, func(a.data, b.data)))
+
+    return apply
+
+
+def equality(func):
+    def apply(stack):
+        a = stack.pop()
+        b = stack.pop()
+        numbers = (NUMBER, INTEGER)
+        if not (a.kind == b.kind == BOOLEAN or (a.kind in numbers and b.kind in numbers)):
+            raise NotVectorizable("equality is only vectorized for numbers and booleans")
+        stack.append(Column(BOOLEAN, func(b.data, a.data)))
+
+    return apply
+
+
+def constant(kind, value):
+    def apply(stack):
+        stack.append(Column(kind, value))
+
+    return apply
+
+
+def shuffle(new_top):
+    """Build a stack shuffle from a function mapping the old top items to the new ones."""
+    depth = new_top.__code__.co_argcount
+
+    def apply(stack):
+        if len(stack) < depth:
+            raise NotVectorizable("stack underflow")
+        top = stack[len(stack) - depth:]
+        del stack[len(stack) - depth:]
+        stack.extend(new_top(*top))
+
+    return apply
+
+
+def drop_keep(stack, instruction):
+    drop_order = instruction.drop_order
+    if len(drop_order) > len(stack):
+        raise NotVectorizable("stack underflow")
+    for i, drop in enumerate(drop_order):
+        if drop:
+            stack[len(stack) - 1 - i] = None
+    stack[:] = [column for column in stack if column is not None]
+
+
+def stack_permutation(stack, instruction):
+    if instruction.depth > len(stack):
+        raise NotVectorizable("stack underflow")
+    top = stack[len(stack) - instruction.depth:]
+    del stack[len(stack) - instruction.depth:]
+    stack.extend(top[i] for i in instruction.order)
+
+
+BATCH_OPERATIONS = {
+    Operator.ADD: add,
+    Operator.SUB: sub,
+    Operator.MUL: mul,
+    Operator.DIV: div,
+    Operator.MAG: mag,
+    Operator.PWR: pwr,
+    Operator.FLR: rounding(np.floor),
+    Operator.CEIL: rounding(np.ceil),
+    Operator.VCTR_MK: vctr_mk,
+    Operator.VCTR_UNMK: vctr_unmk,
+    Operator.AXIS: axis,
+    Operator.SIN: unary(np.sin),
+    Operator.COS: unary(np.cos),
+    Operator.TAN: unary(np.tan),
+
+    Operator.EQ: equality(np.equal),
+    Operator.NOT_EQ: equality(np.not_equal),
+    Operator.GT: comparison(np.greater),
+    Operator.LT: comparison(np.less),
+    Operator.GE: comparison(np.greater_equal),
+    Operator.LE: comparison(np.less_equal),
+
+    Operator.TRUE: constant(BOOLEAN, True),
+    Operator.FALSE: constant(BOOLEAN, False),
+    Operator.ZERO_VEC: constant(VECTOR, np.array([0, 0, 0], dtype=float)),
+    Operator.VEC_X_PLUS: constant(VECTOR, np.array([1, 0, 0], dtype=float)),
+    Operator.VEC_X_MINUS: constant(VECTOR, np.array([-1, 0, 0], dtype=float)),
+    Operator.VEC_Y_PLUS: constant(VECTOR, np.array([0, 1, 0], dtype=float)),
+    Operator.VEC_Y_MINUS: constant(VECTOR, np.array([0, -1, 0], dtype=float)),
+    Operator.VEC_Z_PLUS: constant(VECTOR, np.array([0, 0, 1], dtype=float)),
+    Operator.VEC_Z_MINUS: constant(VECTOR, np.array([0, 0, -1], dtype=float)),
+    Operator.TAU: constant(NUMBER, np.pi * 2),
+    Operator.PI: constant(NUMBER, np.pi),
+    Operator.E: constant(NUMBER, np.e),
+
+    Operator.SWAP: shuffle(lambda b, a: (a, b)),
+    Operator.ROTATE_LFT: shuffle(lambda c, b, a: (b, a, c)),
+    Operator.ROTATE_RIGHT: shuffle(lambda c, b, a: (a, c, b)),
+    Operator.DUP: shuffle(lambda a: (a, a)),
+    Operator.DUP_SECOND: shuffle(lambda b, a: (b, a, b)),
+    Operator.DUP_TOP_DOWN: shuffle(lambda b, a: (a, b, a)),
+    Operator.DUP_2: shuffle(lambda b, a: (b, a, b, a)),
+}
+
+
+class BatchExecutor:
+    """Runs one spell over many initial stacks.
+
+    Spells made only of numeric and vector operators, constants, literals and stack
+    shuffles run with every stack slot held as a numpy column, so each operator is a
+    single vectorized call over the whole batch. Anything else, including stacks whose
+    slots do not line up or any floating point error, falls back to running one
+    Executor per stack, so results always match the interpreter.
+    """
+
+    def __init__(self, spell):
+        self.spell = Compiler.compile(spell)
+        self.vectorizable = all(BatchExecutor.is_vectorizable(instruction) for instruction in self.spell)
+
+    @staticmethod
+    def is_vectorizable(instruction):
+        if isinstance(instruction, (NumberLiteral, DropKeep, StackPermutation)):
+            return type(instruction) in (NumberLiteral, VectorLiteral, DropKeep, StackPermutation)
+        if isinstance(instruction, Operator):
+            return instruction in BATCH_OPERATIONS
+        return instruction == "EOF"
+
+    def run(self, stacks):
+        stacks = [list(stack) for stack in stacks]
+        if not stacks:
+            return []
+        if self.vectorizable:
+            try:
+                return self.run_vectorized(stacks)
+            except NotVectorizable:
+                pass
+        return self.run_each(stacks)
+
+    def run_each(self, stacks):
+        results = []
+        for index, stack in enumerate(stacks):
+            executor = Executor()
+            executor.stack = Stack(stack)
+            try:
+                executor.execute_instructions(self.spell)
+            except StackUnderflowError as e:
+                # The spell doesn't start on a stack too shallow for it, so only that stack is reported
+                executor.output(f"Error running spell on stack {index}")
+                executor.output("    " + str(e))
+            results.append(list(executor.stack))
+        return results
+
+    def run_vectorized(self, stacks):
+        depth = len(stacks[0])
+        if any(len(stack) != depth for stack in stacks):
+            raise NotVectorizable("stacks have different depths")
+        columns = [input_column([stack[i] for stack in stacks]) for i in range(depth)]
+
+        with np.errstate(all="raise"):
+            try:
+                for instruction in self.spell:
+                    if isinstance(instruction, NumberLiteral):
+                        if isinstance(instruction, VectorLiteral):
+                            columns.append(Column(VECTOR, np.array(instruction.value)))
+                        else:
+                            columns.append(Column(NUMBER, instruction.value))
+                    elif isinstance(instruction, DropKeep):
+                        drop_keep(columns, instruction)
+                    elif isinstance(instruction, StackPermutation):
+                        stack_permutation(columns, instruction)
+                    elif instruction != "EOF":
+                        BATCH_OPERATIONS[instruction](columns)
+            except (IndexError, FloatingPointError) as e:
+                # Let the interpreter report underflows and math errors per stack
+                raise NotVectorizable(str(e))
+
+        values = [column.to_values(len(stacks)) for column in columns]
+        return [[column_values[i] for column_values in values] for i in range(len(stacks))]
@@ -0,0 +1,149 @@
+from array import array
+
+from errors.PyHexCastError import PyHexCastError
+from token_types.DropKeep import DropKeep
+from token_types.ListLiteral import ListLiteral
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from token_types.VectorLiteral import VectorLiteral
+from util.StackEffects import analyze, stack_effect
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+OPERATORS = list(Operator)
+# Token types that carry an operand. Each one gets its own opcode after the operators
+# and its own deduplicated pool that the operand indexes into.
+TOKEN_TYPES = [NumberLiteral, VectorLiteral, ListLiteral, DropKeep, StackPermutation, str]
+
+OPCODE_KEYS = tuple(OPERATORS + TOKEN_TYPES)
+OPERATOR_OPCODES = {op: i for i, op in enumerate(OPERATORS)}
+TOKEN_TYPE_OPCODES = {token_type: len(OPERATORS) + i for i, token_type in enumerate(TOKEN_TYPES)}
+
+
+def value_key(value):
+    """Return a hashable key that is equal for structurally equal literal values."""
+    if isinstance(value, (list, IotaList)):
+        return tuple(value_key(item) for item in value)
+    if isinstance(value, Vec3):
+        return ("vec",) + tuple(component.hex() for component in value)
+    if isinstance(value, float):
+        # float.hex keeps 0.0 and -0.0 apart
+        return value.hex()
+    return value
+
+
+def pool_key(token):
+    """Return the key used to deduplicate a token in its constant pool."""
+    if isinstance(token, NumberLiteral):
+        return value_key(token.value)
+    if isinstance(token, DropKeep):
+        return token.value
+    if isinstance(token, StackPermutation):
+        return (token.depth, token.order) + tuple(pool_key(instruction) for instruction in token.instructions)
+    return token
+
+
+class CompiledSpell:
+    """A parsed spell stored as a compact opcode stream.
+
+    Every instruction is one byte in ``opcodes`` and one operand in ``operands``. Operators
+    have no operand, while literals, drop_keeps and EOF markers index into the pool that
+    belongs to their opcode, so equal constants are only stored once.
+    """
+
+    def __init__(self, opcodes, operands, pools):
+        self.opcodes = opcodes
+        self.operands = operands
+        self.pools = pools
+        # Per opcode lookup table, so that tables[opcode][operand] is the instruction
+        self.tables = [(op,) for op in OPERATORS] + [pools[token_type] for token_type in TOKEN_TYPES]
+        self.stack_analysis = None
+        self.instructions = None
+        # Each instruction's handler, along with the handlers by opcode they came from
+        self.position_handlers = None
+        self.position_handlers_from = None
+        # Steps for the verified fast path, along with the handlers they were bound to
+        self.steps = None
+        self.steps_handlers = None
+        # Times the spell has run, and its translated function once it is hot (False if it can't be translated)
+        self.runs = 0
+        self.jit_function = None
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __iter__(self):
+        tables = self.tables
+        for opcode, operand in zip(self.opcodes, self.operands):
+            yield tables[opcode][operand]
+
+    def instruction_at(self, index):
+        return self.tables[self.opcodes[index]][self.operands[index]]
+
+    def decode(self):
+        """Return the spell as a list of instructions, which is shared and must not be modified."""
+        if self.instructions is None:
+            self.instructions = list(self)
+        return self.instructions
+
+    def bind_handlers(self, handlers):
+        """Return the handler for each instruction, given the handlers indexed by opcode."""
+        if self.position_handlers_from is not handlers:
+            self.position_handlers = [handlers[opcode] for opcode in self.opcodes]
+            self.position_handlers_from = handlers
+        return self.position_handlers
+
+    def analyze(self):
+        """Return the spell's StackAnalysis, computing it the first time."""
+        if self.stack_analysis is None:
+            # Work out each distinct instruction's effect once
+            effect_tables = [[stack_effect(instruction) for instruction in table] for table in self.tables]
+            effects = [effect_tables[opcode][operand] for opcode, operand in zip(self.opcodes, self.operands)]
+            self.stack_analysis = analyze(self.decode(), effects)
+        return self.stack_analysis
+
+    def copy(self):
+        """Return a spell sharing this one's code and analysis, with its own handlers, run count and translation."""
+        spell = CompiledSpell.__new__(CompiledSpell)
+        spell.__dict__.update(self.__dict__)
+        spell.position_handlers = None
+        spell.position_handlers_from = None
+        spell.steps = None
+        spell.steps_handlers = None
+        spell.runs = 0
+        spell.jit_function = None
+        return spell
+
+
+class Compiler:
+    @staticmethod
+    def compile(instructions):
+        if isinstance(instructions, (PyHexCastError, CompiledSpell)):
+            return instructions
+
+        opcodes = array("B")
+        operands = array("I")
+        pools = {token_type: [] for token_type in TOKEN_TYPES}
+        indices = {token_type: {} for token_type in TOKEN_TYPES}
+
+        for instruction in instructions:
+            if isinstance(instruction, Operator):
+                opcodes.append(OPERATOR_OPCODES[instruction])
+                operands.append(0)
+                continue
+
+            token_type = type(instruction)
+            if token_type not in TOKEN_TYPE_OPCODES:
+                raise ValueError(f"\"{instruction}\" cannot be compiled")
+
+            key = pool_key(instruction)
+            index = indices[token_type].get(key)
+            if index is None:
+                index = len(pools[token_type])
+                indices[token_type][key] = index
+                pools[token_type].append(instruction)
+            opcodes.append(TOKEN_TYPE_OPCODES[token_type])
+            operands.append(index)
+
+        return CompiledSpell(opcodes, operands, pools)
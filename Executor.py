@@ -1,45 +1,344 @@
-import math
-import random
-
-import numpy as np
+import contextlib
+import os
+import time
 
+from Compiler import OPCODE_KEYS, OPERATOR_OPCODES, CompiledSpell
+from Jit import Jit
 from errors.PyHexCastError import PyHexCastError
+from errors.StackUnderflowError import StackUnderflowError
+from operations.ListOperations import LIST_OPERATIONS
+from operations.LogicOperations import LOGIC_OPERATIONS
+from operations.MathOperations import CONSTANT_OPERATIONS, MATH_OPERATIONS
+from operations.MetaOperations import META_OPERATIONS, STORAGE_OPERATIONS
+from operations.SetOperations import SET_OPERATIONS
+from operations.StackOperations import STACK_OPERATIONS
 from token_types.ExecutionMode import ExecutionMode
-from token_types.DropKeep import DropKeep
 from token_types.EscapeMode import EscapeMode
-from token_types.NumberLiteral import NumberLiteral
 from token_types.Operator import Operator
-from util.InputParser import InputParser
-from util.LehrerDecoder import permute_end_of_list
+from util.DispatchTable import DispatchTable
+from util.Escapes import read_escape_seq
+from util.Frames import EvalFrame, Frame, ListEvalFrame
+from util.MemoryBudget import ACTIVE_BUDGET
+from util.ProcessPool import get_process_pool
+from util.Purity import is_pure_body
+from util.Stack import Stack
+from values.IotaList import IotaList, stored_items
+from values.NumericList import make_list
+
+# Smaller maps are not worth the cost of sending the stack to the workers
+PARALLEL_MIN_ITEMS = 1024
+# Items of a map run here first to time the body, before deciding whether to use the workers
+PARALLEL_SAMPLE_ITEMS = 64
+# Measured cost of sending an item to a worker and its results back, in seconds. Bodies that
+# take less than this per item run faster here, however many workers there are
+PARALLEL_ITEM_OVERHEAD = 1e-6
+# Measured cost of handing the shards of one map to the workers and collecting them, in seconds
+PARALLEL_MAP_OVERHEAD = 5e-3
+# Shards handed to each worker per parallel lst_eval, so uneven items still balance out
+SHARDS_PER_WORKER = 4
+
+DISPATCH_TABLE = DispatchTable()
+DISPATCH_TABLE.register_category("math", MATH_OPERATIONS)
+DISPATCH_TABLE.register_category("constant", CONSTANT_OPERATIONS)
+DISPATCH_TABLE.register_category("stack", STACK_OPERATIONS)
+DISPATCH_TABLE.register_category("logic", LOGIC_OPERATIONS)
+DISPATCH_TABLE.register_category("list", LIST_OPERATIONS)
+DISPATCH_TABLE.register_category("storage", STORAGE_OPERATIONS)
+DISPATCH_TABLE.register_category("set", SET_OPERATIONS)
+DISPATCH_TABLE.register_category("meta", META_OPERATIONS)
+
+
+def run_list_eval_shard(stack, instructions, items, output=print):
+    """Run a Thoth's gambit body over some of its items, in a worker process or to time it."""
+    executor = Executor()
+    executor.output = output
+    executor.stack.extend(stack)
+    executor.run_frames(ListEvalFrame(tuple(instructions), items))
+    return executor.stack.pop()
+
+
+def push_escaped(executor, value):
+    executor.stack.append(value)
+
+
+def bind_steps(spell, handlers):
+    """Return the (handler, instruction, next index) steps that run a verified spell.
+
+    Escapes are resolved ahead of time into steps that push what they escape, and the
+    next index is where the spell carries on after the step. Returns None if an
+    instruction has no handler.
+    """
+    instructions = spell.decode()
+    opcodes = spell.opcodes
+    step_handlers = spell.bind_handlers(handlers)
+    if None in step_handlers:
+        return None
+    if (OPERATOR_OPCODES[Operator.ESCAPE] not in opcodes
+            and OPERATOR_OPCODES[Operator.START_ESCAPE_SEQ] not in opcodes):
+        return list(zip(step_handlers, instructions, range(1, len(instructions) + 1)))
+
+    steps = []
+    i = 0
+    while i < len(instructions):
+        instruction = instructions[i]
+        if instruction == Operator.ESCAPE and i + 1 == len(instructions):
+            # Only past a halt, since the spell passed verification
+            break
+        if instruction == Operator.ESCAPE:
+            steps.append((push_escaped, instructions[i + 1], i + 2))
+            i += 2
+        elif instruction == Operator.START_ESCAPE_SEQ:
+            items, end = read_escape_seq(instructions, i)
+            if end is None:
+                break
+            steps.append((push_escaped, IotaList(items), end + 1))
+            i = end + 1
+        else:
+            steps.append((step_handlers[i], instruction, i + 1))
+            i += 1
+    return steps
 
 
 class Executor:
-    def __init__(self):
-        self.stack = []
+    def __init__(self, dispatch_table=DISPATCH_TABLE, parallel_workers=None, jit_threshold=None):
+        self.stack = Stack()
+        self.temporary = None
+        self.execution_mode = ExecutionMode.NORMAL
+        self.escape_mode = EscapeMode.NORMAL
+        self.escaped_many = []
+        self.dispatch_table = dispatch_table
+        # Number of worker processes pure lst_eval bodies may be spread across, None to disable
+        self.parallel_workers = parallel_workers
+        # Runs after which a static compiled spell is translated to Python, None to disable
+        self.jit_threshold = jit_threshold
+        # Optional Profiler that records every instruction run
+        self.profiler = None
+        # Optional EvalCache that remembers the results of evals of pure spells
+        self.eval_cache = None
+        # Optional MemoryBudget that bounds what the running spell may allocate
+        self.memory_budget = None
+        # How many eval and lst_eval frames deep the running spell is
+        self.frame_depth = 0
+        # Where printed iotas and error reports go, and where input comes from
+        self.output = print
+        self.input = input
+
+    def reset(self):
+        """Clear the stack, the temporary and any escape in progress, leaving the configuration."""
+        self.stack = Stack()
         self.temporary = None
         self.execution_mode = ExecutionMode.NORMAL
         self.escape_mode = EscapeMode.NORMAL
         self.escaped_many = []
+        self.frame_depth = 0
+
+    def escaping(self):
+        """Return whether an escape left open by an earlier spell will push the next instructions instead of running them."""
+        return self.escape_mode is not EscapeMode.NORMAL or self.execution_mode is ExecutionMode.ESCAPE_MANY
+
+    def live_size(self):
+        """Return how many items the stack and the temporary keep in memory."""
+        return self.stack.live_size() + stored_items(self.temporary)
+
+    def report_error(self, instruction, error):
+        if self.eval_cache is not None:
+            # A cached result would skip the report
+            self.eval_cache.taints += 1
+        self.output(f"Error at \"{instruction}\"")
+        self.output("    " + str(error))
+
+    def worker_count(self):
+        """Return how many workers a parallel map can keep busy at once, which is at most one per CPU."""
+        if self.parallel_workers is None:
+            return 0
+        return min(self.parallel_workers, os.cpu_count() or 1)
+
+    def can_map_in_parallel(self, instructions, items):
+        # Workers always use the default dispatch table, as handlers may not be picklable
+        # Workers don't profile, so profiled runs keep every item in this process
+        # Workers can't charge the memory budget either, so budgeted runs do the same
+        return (self.worker_count() > 1
+                and self.profiler is None
+                and self.memory_budget is None
+                and self.dispatch_table is DISPATCH_TABLE
+                and isinstance(instructions, (list, IotaList))
+                and isinstance(items, IotaList)
+                and len(items) >= PARALLEL_MIN_ITEMS
+                and is_pure_body(instructions, self.stack, items))
+
+    def map_in_parallel(self, instructions, items):
+        """Run a lst_eval body over the items, across the process pool if it pays off, keeping item order.
+
+        The first items are run here to time the body. The rest go to the workers only if
+        what the workers save running them exceeds the cost of sending them there and back.
+        """
+        stack = list(self.stack)
+        start = time.perf_counter()
+        finished_stacks = list(run_list_eval_shard(stack, instructions, items[:PARALLEL_SAMPLE_ITEMS], self.output))
+        item_cost = (time.perf_counter() - start) / PARALLEL_SAMPLE_ITEMS
+        items = items[PARALLEL_SAMPLE_ITEMS:]
+
+        workers = self.worker_count()
+        saved = len(items) * item_cost * (1 - 1 / workers)
+        if saved <= len(items) * PARALLEL_ITEM_OVERHEAD + PARALLEL_MAP_OVERHEAD:
+            finished_stacks.extend(run_list_eval_shard(stack, instructions, items, self.output))
+            return make_list(finished_stacks)
+
+        pool = get_process_pool(workers)
+        shard_size = -(-len(items) // (workers * SHARDS_PER_WORKER))
+        shards = [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+        stacks = [stack] * len(shards)
+        bodies = [instructions] * len(shards)
+        for finished in pool.map(run_list_eval_shard, stacks, bodies, shards):
+            finished_stacks.extend(finished)
+        return make_list(finished_stacks)
+
+    def budgeted(self):
+        """Return a context in which the executor's memory budget, if it has one, is charged."""
+        if self.memory_budget is None:
+            return contextlib.nullcontext()
+        return self.memory_budget.run(self)
 
     def execute_instructions(self, instructions):
+        if self.memory_budget is not None and ACTIVE_BUDGET.get() is not self.memory_budget:
+            with self.memory_budget.run(self):
+                return self.execute_instructions(instructions)
         if isinstance(instructions, PyHexCastError):
             raise instructions
+        if isinstance(instructions, CompiledSpell):
+            return self.execute_compiled(instructions)
+        if not isinstance(instructions, (list, tuple)):
+            instructions = tuple(instructions)
+        return self.run_frames(Frame(instructions))
 
-        did_halt = False
-        for instruction in instructions:
-            stop = False
-            try:
-                stop = self.execute_instruction(instruction)
-            except Exception as e:
-                print(f"Error at \"{instruction}\"")
-                print("    " + str(e))
-            if stop or self.execution_mode == ExecutionMode.STOP:
-                did_halt = True
-                break
-        self.execution_mode = ExecutionMode.NORMAL
-        return did_halt
+    def execute_compiled(self, spell):
+        handlers = self.dispatch_table.handlers_for(OPCODE_KEYS)
+        if self.profiler is not None:
+            handlers = self.profiler.handlers_for(handlers, OPCODE_KEYS, self.frame_depth)
+
+        start = 0
+        if self.escape_mode is EscapeMode.NORMAL and self.execution_mode is ExecutionMode.NORMAL:
+            analysis = spell.analyze()
+            if analysis.is_static:
+                if len(self.stack) < analysis.required_depth:
+                    raise StackUnderflowError(analysis.required_depth, len(self.stack))
+                function = self.translated(spell)
+                if function is not None:
+                    try:
+                        return function(self)
+                    except Exception:
+                        # The stack is untouched, so the interpreter runs it again and reports the error
+                        spell.jit_function = False
+                if spell.steps_handlers is not handlers:
+                    spell.steps = bind_steps(spell, handlers)
+                    spell.steps_handlers = handlers
+                if spell.steps is not None:
+                    start = self.execute_verified(spell.steps)
+                    if start is None:
+                        self.execution_mode = ExecutionMode.NORMAL
+                        return True
+
+        return self.run_frames(Frame(spell.decode(), spell.bind_handlers(handlers), start))
+
+    def run_frames(self, frame):
+        """Run the frame, and every frame pushed while it runs, returning whether it halted.
+
+        Handlers for eval and lst_eval return the frame for the spell they run, which is
+        pushed on an explicit frame stack instead of running inside the handler, so nested
+        spells use no Python stack. An eval that is the last instruction of an eval frame
+        replaces that frame, so tail calls don't grow the frame stack either.
+        """
+        frames = [frame]
+        frame.enter(self)
+        halted = False
+        while True:
+            frame = frames[-1]
+            pushed = None
+            if not halted:
+                instructions = frame.instructions
+                handlers = frame.handlers
+                for i in frame.positions:
+                    instruction = instructions[i]
+                    stop = None
+                    try:
+                        if (handlers is not None and self.escape_mode is EscapeMode.NORMAL
+                                and self.execution_mode is ExecutionMode.NORMAL):
+                            handler = handlers[i]
+                            if handler is None:
+                                raise RuntimeError(f"\"{instruction}\" is an invalid operator")
+                            stop = handler(self, instruction)
+                        else:
+                            stop = self.step(instruction)
+                    except Exception as e:
+                        self.report_error(instruction, e)
+                    if stop is True or self.execution_mode == ExecutionMode.STOP:
+                        halted = True
+                        break
+                    if stop:
+                        pushed = stop
+                        break
+
+            if pushed is not None:
+                if type(pushed) is EvalFrame and type(frame) is EvalFrame and frame.is_finished():
+                    pushed.replace(frame, self)
+                    frames[-1] = pushed
+                else:
+                    pushed.enter(self)
+                    frames.append(pushed)
+                continue
+            if frame.restart(self):
+                halted = False
+                continue
+            frames.pop()
+            halted = frame.exit(self, halted)
+            if not frames:
+                return halted
+
+    def translated(self, spell):
+        """Return the spell's translated function if it is hot enough to have one, or else None."""
+        if self.jit_threshold is None or self.profiler is not None or self.dispatch_table is not DISPATCH_TABLE or spell.jit_function is False:
+            return None
+        if spell.jit_function is None:
+            spell.runs += 1
+            if spell.runs < self.jit_threshold:
+                return None
+            spell.jit_function = Jit.translate(spell, self.dispatch_table) or False
+        return spell.jit_function or None
+
+    def execute_verified(self, steps):
+        """Run steps bound from a spell that passed stack verification.
+
+        The stack is known to be deep enough, so steps run back to back with no checks in
+        between. Returns None if the spell halted, or else the index the checked loop should
+        carry on from, which is the end of the spell unless an instruction raised.
+        """
+        index = 0
+        try:
+            for handler, instruction, index in steps:
+                stop = handler(self, instruction)
+                # lst_eval has a fixed stack effect, so it can hand back a frame here too
+                if stop and (stop is True or self.run_frames(stop)):
+                    return None
+        except Exception as e:
+            self.report_error(instruction, e)
+            if self.execution_mode == ExecutionMode.STOP:
+                return None
+        return index
 
     def execute_instruction(self, instruction):
+        if self.memory_budget is not None and ACTIVE_BUDGET.get() is not self.memory_budget:
+            with self.memory_budget.run(self):
+                return self.execute_instruction(instruction)
+        stop = self.step(instruction)
+        if not isinstance(stop, Frame):
+            return stop
+        # Runs the eval or lst_eval in full, as there's no loop to hand the frame to
+        if self.run_frames(stop):
+            self.execution_mode = ExecutionMode.STOP
+            return True
+
+    def step(self, instruction):
+        """Run one instruction, returning True to halt or a Frame to run next."""
         # Skip and stop if somehow we got here in a stopped execution mode
         if self.execution_mode == ExecutionMode.STOP:
             return True
@@ -57,7 +356,7 @@ class Executor:
         if self.execution_mode == ExecutionMode.ESCAPE_MANY:
             if instruction == Operator.END_ESCAPE_SEQ:
                 self.execution_mode = ExecutionMode.NORMAL
-                self.stack.append(self.escaped_many)
+                self.stack.append(IotaList(self.escaped_many))
                 self.escaped_many = []
             elif instruction == Operator.ESCAPE:
                 self.escape_mode = EscapeMode.ESCAPE_NEXT
@@ -65,469 +364,9 @@ class Executor:
                 self.escaped_many.append(instruction)
             return
 
-        if isinstance(instruction, NumberLiteral):
-            self.stack.append(instruction.value)
-            return
-
-        # Simple math
-        if instruction == Operator.ADD:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a + b)
-        elif instruction == Operator.SUB:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(b - a)
-        elif instruction == Operator.MUL:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            if isinstance(a, np.ndarray) and isinstance(a, np.ndarray):
-                self.stack.append(b.dot(a))
-            else:
-                self.stack.append(b * a)
-        elif instruction == Operator.DIV:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            if isinstance(a, np.ndarray) and isinstance(a, np.ndarray):
-                self.stack.append(b.cross(a))
-            else:
-                self.stack.append(b / a)
-        elif instruction == Operator.MAG:
-            a = self.stack.pop()
-            if isinstance(a, np.ndarray):
-                self.stack.append(np.linalg.norm(a))
-            else:
-                self.stack.append(abs(a))
-        elif instruction == Operator.PWR:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            if isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
-                self.stack.append(a * np.dot(b, a) / np.dot(b, b))
-            else:
-                self.stack.append(b ** a)
-        elif instruction == Operator.FLR:
-            a = self.stack.pop()
-            self.stack.append(math.floor(a))
-        elif instruction == Operator.CEIL:
-            a = self.stack.pop()
-            self.stack.append(math.ceil(a))
-        elif instruction == Operator.VCTR_MK:
-            x = self.stack.pop()
-            y = self.stack.pop()
-            z = self.stack.pop()
-            self.stack.append(np.array([x, y, z][::-1]))
-        elif instruction == Operator.VCTR_UNMK:
-            a = self.stack.pop()
-            self.stack.extend([a[0], a[1], a[2]])
-        elif instruction == Operator.MOD:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(b % a)
-        elif instruction == Operator.AXIS:
-            a = self.stack.pop()
-            if isinstance(a, np.ndarray):
-                if np.array_equal(a, np.array([0, 0, 0])):
-                    self.stack.append(a)
-                    return
-
-                axes_vectors = [
-                    np.array([1, 0, 0]),
-                    np.array([0, 1, 0]),
-                    np.array([0, 0, 1]),
-                    np.array([-1, 0, 0]),
-                    np.array([0, -1, 0]),
-                    np.array([0, 0, -1])
-                ]
-                dot_products = [np.dot(a.flatten(), axis_vector) for axis_vector in axes_vectors]
-                closest_axis_index = np.argmax(dot_products)
-                self.stack.append(axes_vectors[closest_axis_index])
-            else:
-                if a == 0:
-                    self.stack.append(0)
-                else:
-                    self.stack.append(-1 if a < 0 else 1)
-        elif instruction == Operator.RANDOM:
-            self.stack.append(random.random())
-
-        # Constants
-        elif instruction == Operator.TRUE:
-            self.stack.append(True)
-        elif instruction == Operator.FALSE:
-            self.stack.append(False)
-        elif instruction == Operator.NULL:
-            self.stack.append(None)
-        elif instruction == Operator.ZERO_VEC:
-            self.stack.append(np.array([0, 0, 0]))
-        elif instruction == Operator.VEC_X_PLUS:
-            self.stack.append(np.array([1, 0, 0]))
-        elif instruction == Operator.VEC_X_MINUS:
-            self.stack.append(np.array([-1, 0, 0]))
-        elif instruction == Operator.VEC_Y_PLUS:
-            self.stack.append(np.array([0, 1, 0]))
-        elif instruction == Operator.VEC_Y_MINUS:
-            self.stack.append(np.array([0, -1, 0]))
-        elif instruction == Operator.VEC_Z_PLUS:
-            self.stack.append(np.array([0, 0, 1]))
-        elif instruction == Operator.VEC_Z_MINUS:
-            self.stack.append(np.array([0, 0, -1]))
-        elif instruction == Operator.TAU:
-            self.stack.append(math.tau)
-        elif instruction == Operator.PI:
-            self.stack.append(math.pi)
-        elif instruction == Operator.E:
-            self.stack.append(math.e)
-
-        # Stack manip
-        elif instruction == Operator.SWAP:
-            stack = self.stack
-            self.stack = stack[:-2] + [stack[-1], stack[-2]]
-        elif instruction == Operator.ROTATE_LFT:
-            stack = self.stack
-            self.stack = stack[:-3] + [stack[-2], stack[-1], stack[-3]]
-        elif instruction == Operator.ROTATE_RIGHT:
-            stack = self.stack
-            self.stack = stack[:-3] + [stack[-1], stack[-3], stack[-2]]
-        elif instruction == Operator.DUP:
-            self.stack.append(self.stack[-1])
-        elif instruction == Operator.DUP_SECOND:
-            self.stack.append(self.stack[-2])
-        elif instruction == Operator.DUP_TOP_DOWN:
-            stack = self.stack
-            self.stack = stack[:-2] + [stack[-1]] + stack[-2:]
-        elif instruction == Operator.DUP_N:
-            times = self.stack.pop()
-            element = self.stack.pop()
-            if not times.is_integer():
-                raise ValueError("argument must be integer")
-            times = int(times)
-            self.stack.extend([element] * times)
-        elif instruction == Operator.DUP_2:
-            stack = self.stack
-            self.stack = stack + stack[-2:]
-        elif instruction == Operator.STACK_LEN:
-            self.stack.append(len(self.stack))
-        elif instruction == Operator.YANK_N:
-            stack = self.stack
-            last_index = stack.pop()
-            if last_index >= 0:
-                stack.append(stack.pop(-1 * (last_index + 1)))
-            else:
-                stack.insert(last_index, stack.pop())
-            self.stack = stack
-        elif instruction == Operator.COPY_N:
-            stack = self.stack
-            last_index = stack.pop()
-            if last_index >= 0:
-                stack.append(stack[-1 * (last_index + 1)])
-            else:
-                stack.insert(last_index, stack[-1])
-            self.stack = stack
-        elif instruction == Operator.LEHMER_PERMUTE:
-            code = self.stack.pop()
-            self.stack = permute_end_of_list(self.stack, code)
-        elif isinstance(instruction, DropKeep):
-            drop_order = instruction.get_drop_order()
-            if len(drop_order) > len(self.stack):
-                raise RuntimeError("stack too small for dropkeep")
-
-            padding = len(self.stack) - len(drop_order)
-            drop_order = [False] * padding + drop_order[::-1]
-            self.stack = [item for item, drop in zip(self.stack, drop_order) if not drop]
-
-        # Logical operators
-        elif instruction == Operator.BOOL_COERCE:
-            item = self.stack.pop()
-            if item == 0 or item is None or item == []:
-                self.stack.append(False)
-            else:
-                self.stack.append(True)
-        elif instruction == Operator.BOOL_TO_NUM:
-            item = self.stack.pop()
-            # Prevents truthy things from qualifying
-            if not isinstance(item, bool):
-                raise ValueError("value must be boolean")
-            if item:
-                self.stack.append(1)
-            else:
-                self.stack.appent(0)
-        elif instruction == Operator.NOT:
-            item = self.stack.pop()
-            if not isinstance(item, bool):
-                raise ValueError("value must be boolean")
-            self.stack.append(not item)
-        elif instruction == Operator.OR:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            if not (isinstance(a, bool) and isinstance(a, bool)):
-                raise ValueError("values must be boolean")
-            self.stack.append(a or b)
-        elif instruction == Operator.AND:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            if not (isinstance(a, bool) and isinstance(a, bool)):
-                raise ValueError("values must be boolean")
-            self.stack.append(a and b)
-        elif instruction == Operator.XOR:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            if not (isinstance(a, bool) and isinstance(a, bool)):
-                raise ValueError("values must be boolean")
-            self.stack.append(a ^ b)
-        elif instruction == Operator.CONDITIONAL_REMOVE:
-            a = self.stack.pop()
-            if not isinstance(a, bool):
-                raise ValueError("value must be boolean")
-            if a:
-                self.stack.pop(-2)
-            else:
-                self.stack.pop()
-        elif instruction == Operator.EQ:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a == b)
-        elif instruction == Operator.NOT_EQ:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a != b)
-        elif instruction == Operator.GT:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a > b)
-        elif instruction == Operator.LT:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a < b)
-        elif instruction == Operator.GE:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a >= b)
-        elif instruction == Operator.LE:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(a >= b)
-
-        # List manip
-        elif instruction == Operator.INDEX:
-            index = self.stack.pop()
-            lst = self.stack.pop()
-            self.stack.appent(lst[index])
-        elif instruction == Operator.SUBLIST:
-            lower = self.stack.pop()
-            upper = self.stack.pop()
-            lst = self.stack.pop()
-            self.stack.append(lst[lower:upper])
-        elif instruction == Operator.APPEND:
-            app = self.stack.pop()
-            lst = self.stack.pop()
-            self.stack.appent(lst.append(app))
-        elif instruction == Operator.EXTEND:
-            ext = self.stack.pop()
-            lst = self.stack.pop()
-            self.stack.appent(lst.extend(ext))
-        elif instruction == Operator.EMPTY_LST:
-            self.stack.appent([])
-        elif instruction == Operator.SINGLET:
-            item = self.stack.pop()
-            self.stack.append([item])
-        elif instruction == Operator.LENGTH:
-            lst = self.stack.pop()
-            self.stack.append(len(lst))
-        elif instruction == Operator.REVERSE:
-            lst = self.stack.pop()
-            self.stack.append(lst[::-1])
-        elif instruction == Operator.FIND:
-            num = self.stack.pop()
-            lst = self.stack.pop()
-            self.stack.append(lst.find(num))
-        elif instruction == Operator.DELETE_INDEX:
-            index = self.stack.pop()
-            lst = self.stack.pop()
-            self.stack.append(lst.pop(index))
-        elif instruction == Operator.SET_INDEX:
-            try:
-                item = self.stack.pop()
-                index = self.stack.pop()
-                lst = self.stack.pop()
-                lst[index] = item
-                self.stack.append(lst)
-            except IndexError:
-                pass
-        elif instruction == Operator.MK_LST:
-            count = self.stack.pop()
-            if not count.is_integer():
-                raise ValueError("Argument must be integer")
-            count = int(count)
-            lst = []
-            for i in range(count):
-                lst.append(self.stack.pop())
-            self.stack.append(lst[::-1])
-        elif instruction == Operator.UNMK_LST:
-            lst = self.stack.pop()
-            self.stack.extend(lst)
-        elif instruction == Operator.ENQUEUE:
-            item = self.stack.pop()
-            lst = self.stack.pop()
-            lst.insert(0, item)
-            self.stack.append(lst)
-        elif instruction == Operator.DEQUEUE:
-            lst = self.stack.pop()
-            item = lst.pop(0)
-            self.stack.extend([lst, item])
-
-        # Operator manip
-        elif instruction == Operator.ESCAPE:
-            self.escape_mode = EscapeMode.ESCAPE_NEXT
-        elif instruction == Operator.START_ESCAPE_SEQ:
-            self.execution_mode = ExecutionMode.ESCAPE_MANY
-        elif instruction == Operator.END_ESCAPE_SEQ:
-            # This can only happen if end escape seq was processed before
-            # start escape seq, and as such, is an error
-            raise RuntimeError(')" executed before "("')
-
-        # Storage
-        elif instruction == Operator.PRINT:
-            a = self.stack.pop()
-            print(f'"{a}"')
-        elif instruction == Operator.STORE_TEMP:
-            a = self.stack.pop()
-            self.temporary = a
-        elif instruction == Operator.READ_TEMP:
-            self.stack.append(self.temporary)
-
-        # Advanced math
-        elif instruction == Operator.SIN:
-            a = self.stack.pop()
-            self.stack.append(math.sin(a))
-        elif instruction == Operator.COS:
-            a = self.stack.pop()
-            self.stack.append(math.cos(a))
-        elif instruction == Operator.TAN:
-            a = self.stack.pop()
-            self.stack.append(math.tan(a))
-        elif instruction == Operator.ARCSIN:
-            a = self.stack.pop()
-            self.stack.append(math.asin(a))
-        elif instruction == Operator.ARCCOS:
-            a = self.stack.pop()
-            self.stack.append(math.acos(a))
-        elif instruction == Operator.ARCTAN:
-            a = self.stack.pop()
-            self.stack.append(math.atan(a))
-        elif instruction == Operator.ARCTAN2:
-            a = self.stack.pop()
-            b = self.stack.pop()
-            self.stack.append(math.atan2(a, b))
-        elif instruction == Operator.LOG:
-            log = self.stack.pop()
-            base = self.stack.pop()
-            self.stack.append(math.log(log, base))
-
-        # Sets
-        elif instruction == Operator.UNIFY:
-            a = self.stack.pop()
-            b = self.stack.pop()
-
-            if isinstance(a, float) and isinstance(b, float):
-                if not (a.is_integer() and b.is_integer()):
-                    raise ValueError("Arguments must be integers, not floats")
-                a = int(a)
-                b = int(b)
-                self.stack.append(a | b)
-            elif isinstance(a, list) and isinstance(b, list):
-                set_a = set(a)
-                set_b = set(b)
-                self.stack.append(set_a | set_b)
-            else:
-                raise ValueError("Arguments must either both be sets or both be integers")
-        elif instruction == Operator.INTERSECT:
-            a = self.stack.pop()
-            b = self.stack.pop()
-
-            if isinstance(a, float) and isinstance(b, float):
-                if not (a.is_integer() and b.is_integer()):
-                    raise ValueError("Arguments must be integers, not floats")
-                a = int(a)
-                b = int(b)
-                self.stack.append(a & b)
-            elif isinstance(a, list) and isinstance(b, list):
-                set_a = set(a)
-                set_b = set(b)
-                self.stack.append(list(set_a & set_b))
-            else:
-                raise ValueError("Arguments must either both be sets or both be integers")
-        elif instruction == Operator.DISJUNCT:
-            a = self.stack.pop()
-            b = self.stack.pop()
-
-            if isinstance(a, float) and isinstance(b, float):
-                if not (a.is_integer() and b.is_integer()):
-                    raise ValueError("Arguments must be integers, not floats")
-                a = int(a)
-                b = int(b)
-                self.stack.append(a ^ b)
-            elif isinstance(a, list) and isinstance(b, list):
-                set_a = set(a)
-                set_b = set(b)
-                self.stack.append(list(set_a ^ set_b))
-            else:
-                raise ValueError("Arguments must either both be sets or both be integers")
-        elif instruction == Operator.INVERT:
-            a = self.stack.pop()
-
-            if isinstance(a, float):
-                if not a.is_integer():
-                    raise ValueError("Argument must be integer, not float")
-                a = int(a)
-                self.stack.append(~a)
-            else:
-                raise ValueError("Argument must be integer")
-        elif instruction == Operator.UNIQUE:
-            a = self.stack.pop()
-
-            if isinstance(a, list):
-                self.stack.append(list(set(a)))
-            else:
-                raise ValueError("Argument must be list")
-
-        # Meta eval
-        elif instruction == Operator.EVAL:
-            to_execute = self.stack.pop()
-            if not isinstance(to_execute, list):
-                to_execute = [to_execute]
-
-            executor = Executor()
-            executor.stack = self.stack
-            executor.temporary = self.temporary
-            stop = executor.execute_instructions(to_execute)
-            self.stack = executor.stack
-            if stop:
-                self.execution_mode = ExecutionMode.STOP
-                return True
-        elif instruction == Operator.LIST_EVAL:
-            items = self.stack.pop()
-            instructions = self.stack.pop()
-            finished_stacks = []
-            for item in items:
-                executor = Executor()
-                executor.temporary = self.temporary
-                executor.stack = self.stack + [item]
-                executor.execute_instructions(instructions)
-                finished_stacks.extend(executor.stack)
-                self.temporary = executor.temporary
-            self.stack.append(finished_stacks)
-        elif instruction == Operator.HALT:
-            self.execution_mode = ExecutionMode.STOP
-            return True
-
-        # Convenience
-        elif instruction == Operator.CLEAR:
-            self.stack.clear()
-            self.temporary = None
-        elif instruction == Operator.INPUT:
-            a = input("Input: ")
-            self.stack.append(InputParser.parse_input(a))
-
-        elif instruction == "EOF":
-            pass
-        else:
+        handler = self.dispatch_table.lookup(instruction)
+        if handler is None:
             raise RuntimeError(f"\"{instruction}\" is an invalid operator")
+        if self.profiler is not None:
+            return self.profiler.call(self, handler, instruction)
+        return handler(self, instruction)
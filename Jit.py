@@ -0,0 +1,218 @@
+import math
+
+from token_types.DropKeep import DropKeep
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from util.Escapes import read_escape_seq
+from util.StackEffects import SHUFFLES, stack_effect
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+# Longer spells take longer to compile than they would ever save
+MAX_JIT_INSTRUCTIONS = 4096
+
+# Python expressions for operators, in terms of the top of the stack ``a`` and the items
+# below it, ``b`` and ``c``. Each one matches what the operator's handler computes.
+INLINE_OPERATIONS = {
+    Operator.ADD: "{a} + {b}",
+    Operator.SUB: "{b} - {a}",
+    Operator.MUL: "{b} * {a}",
+    Operator.DIV: "{b} / {a}",
+    Operator.MAG: "abs({a})",
+    Operator.PWR: "{a}.project({b}) if type({a}) is Vec3 and type({b}) is Vec3 else {b} ** {a}",
+    Operator.FLR: "math.floor({a})",
+    Operator.CEIL: "math.ceil({a})",
+    Operator.VCTR_MK: "Vec3({c}, {b}, {a})",
+    Operator.VCTR_UNMK: "{a}[0], {a}[1], {a}[2]",
+    Operator.MOD: "{b} % {a}",
+    Operator.AXIS: "{a}.axis() if type({a}) is Vec3 else 0 if {a} == 0 else -1 if {a} < 0 else 1",
+
+    Operator.EQ: "{a} == {b}",
+    Operator.NOT_EQ: "{a} != {b}",
+    Operator.GT: "{a} > {b}",
+    Operator.LT: "{a} < {b}",
+    Operator.GE: "{a} >= {b}",
+    Operator.LE: "{a} <= {b}",
+
+    Operator.INDEX: "{b}[int({a})]",
+    Operator.APPEND: "{b}.push({a})",
+    Operator.EXTEND: "{b}.concat({a})",
+    Operator.EMPTY_LST: "IotaList.EMPTY",
+    Operator.SINGLET: "IotaList(({a},))",
+    Operator.LENGTH: "len({a})",
+    Operator.REVERSE: "{a}.reverse()",
+    Operator.ENQUEUE: "{b}.push_front({a})",
+
+    Operator.READ_TEMP: "executor.temporary",
+
+    Operator.SIN: "math.sin({a})",
+    Operator.COS: "math.cos({a})",
+    Operator.TAN: "math.tan({a})",
+    Operator.ARCSIN: "math.asin({a})",
+    Operator.ARCCOS: "math.acos({a})",
+    Operator.ARCTAN: "math.atan({a})",
+    Operator.ARCTAN2: "math.atan2({a}, {b})",
+    Operator.LOG: "math.log({a}, {b})",
+}
+
+# Operators with a known stack effect that still can't be translated. Translated spells
+# run again in the interpreter if they raise, so they can't have side effects, and they
+# only see the part of the stack they use.
+UNSUPPORTED = frozenset([
+    Operator.RANDOM,
+    Operator.PRINT,
+    Operator.INPUT,
+    Operator.STORE_TEMP,
+    Operator.LIST_EVAL,
+    Operator.LEHMER_PERMUTE,
+])
+
+
+class HandlerExecutor:
+    """Just enough of an executor to run a stack-only handler on a few values."""
+    __slots__ = ("stack",)
+
+
+def run_handler(handler, instruction, values):
+    executor = HandlerExecutor()
+    executor.stack = list(values)
+    handler(executor, instruction)
+    return executor.stack
+
+
+class Jit:
+    """Translates straight-line compiled spells into Python functions.
+
+    Stack slots become local variables, shuffles are resolved while translating and
+    operators become inline expressions, or calls to their handlers when there is no
+    expression for them. The function reads the items it needs off the stack and only
+    writes its results back once everything has run, so if anything raises, the stack
+    is untouched and the spell can run in the interpreter instead to report the error.
+    """
+
+    @staticmethod
+    def translate(spell, dispatch_table):
+        """Return a function that runs the spell on an executor and returns whether it halted,
+        or None if the spell can't be translated."""
+        analysis = spell.analyze()
+        if not analysis.is_static or len(spell) > MAX_JIT_INSTRUCTIONS:
+            return None
+        return Translation(dispatch_table, analysis.required_depth).translate(spell.decode())
+
+
+class Translation:
+    def __init__(self, dispatch_table, inputs):
+        self.dispatch_table = dispatch_table
+        self.inputs = inputs
+        self.namespace = {"math": math, "Vec3": Vec3, "IotaList": IotaList, "run_handler": run_handler}
+        self.lines = []
+        self.names = 0
+        # Names of the values on the stack, from the bottom of the inputs up
+        self.stack = [f"v{i}" for i in range(inputs)]
+        self.uses_length = False
+
+    def new_name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def constant(self, value):
+        name = self.new_name("k")
+        self.namespace[name] = value
+        return name
+
+    def pop_args(self, count):
+        args = self.stack[len(self.stack) - count:]
+        del self.stack[len(self.stack) - count:]
+        return args
+
+    def translate(self, instructions):
+        halts = False
+        i = 0
+        while i < len(instructions):
+            instruction = instructions[i]
+            if instruction is Operator.ESCAPE:
+                self.stack.append(self.constant(instructions[i + 1]))
+                i += 2
+                continue
+            if instruction is Operator.START_ESCAPE_SEQ:
+                items, end = read_escape_seq(instructions, i)
+                self.stack.append(self.constant(IotaList(items)))
+                i = end + 1
+                continue
+            i += 1
+            if instruction is Operator.HALT:
+                halts = True
+                break
+            if not self.translate_instruction(instruction):
+                return None
+        return self.build(halts)
+
+    def translate_instruction(self, instruction):
+        if instruction == "EOF":
+            return True
+        if isinstance(instruction, NumberLiteral):
+            self.stack.append(self.constant(instruction.value))
+            return True
+
+        handler = self.dispatch_table.lookup(instruction)
+        pops, pushes = stack_effect(instruction)
+        if isinstance(instruction, (DropKeep, StackPermutation)) or instruction in SHUFFLES:
+            # Shuffles only rename slots, so work out where each one ends up now
+            args = self.pop_args(pops)
+            self.stack.extend(args[i] for i in run_handler(handler, instruction, range(pops)))
+            return True
+        if instruction is Operator.STACK_LEN:
+            self.uses_length = True
+            name = self.new_name("t")
+            self.lines.append(f"{name} = base + {len(self.stack)}")
+            self.stack.append(name)
+            return True
+        if self.dispatch_table.category_of(instruction) == "constant":
+            self.stack.append(self.constant(run_handler(handler, instruction, [])[0]))
+            return True
+        if instruction in UNSUPPORTED:
+            return False
+
+        args = self.pop_args(pops)
+        targets = [self.new_name("t") for _ in range(pushes)]
+        expression = INLINE_OPERATIONS.get(instruction)
+        if expression is not None:
+            top = dict(zip("abc", reversed(args)))
+            expression = expression.format(**top)
+        else:
+            handler_name = self.constant(handler)
+            instruction_name = self.constant(instruction)
+            expression = f"run_handler({handler_name}, {instruction_name}, ({', '.join(args)},))"
+            # Unpacking checks the handler pushed as many values as expected
+            targets.append("")
+        if pushes:
+            self.lines.append(f"{', '.join(targets)} = {expression}")
+        else:
+            self.lines.append(expression)
+        self.stack.extend(target for target in targets if target)
+        return True
+
+    def build(self, halts):
+        inputs = self.inputs
+        # Inputs still in their place at the bottom don't need to be popped and pushed back
+        kept = 0
+        while kept < min(inputs, len(self.stack)) and self.stack[kept] == f"v{kept}":
+            kept += 1
+
+        body = ["stack = executor.stack"]
+        if self.uses_length:
+            body.append(f"base = len(stack) - {inputs}")
+        if inputs:
+            body.append(f"{', '.join(f'v{i}' for i in range(inputs))}, = {', '.join(f'stack[{i - inputs}]' for i in range(inputs))},")
+        body.extend(self.lines)
+        if inputs > kept:
+            body.append("pop = stack.pop")
+            body.extend(["pop()"] * (inputs - kept))
+        if len(self.stack) > kept:
+            body.append(f"stack.extend(({', '.join(self.stack[kept:])},))")
+        body.append(f"return {halts}")
+
+        source = "def spell(executor):\n" + "".join(f"    {line}\n" for line in body)
+        exec(compile(source, "<spell>", "exec"), self.namespace)
+        return self.namespace["spell"]
@@ -1,10 +1,61 @@
+import io
+
+
 class Lexer:
+    """Splits a program into whitespace separated tokens.
+
+    The program may be a string or a file-like object. Tokens are produced lazily, one
+    line at a time, and the line and column (both 1-based) of the last token returned by
+    next_token are kept in ``line`` and ``column``. Whitespace inside square brackets does
+    not split tokens, so list and vector literals may contain spaces.
+    """
+
     def __init__(self, program):
-        self.tokens = str(program).split(" ")
+        if not hasattr(program, "read"):
+            program = io.StringIO(str(program))
+        self.tokens = self.tokenize(program)
+        self.line = 0
+        self.column = 0
+
+    @staticmethod
+    def tokenize(source):
+        # Parts of a list or vector literal that was split on whitespace, with its position
+        pending = []
+        pending_line = pending_column = depth = 0
+
+        for line_number, line in enumerate(source, start=1):
+            # str.split does the scanning in C; find only walks forward, so columns stay linear
+            position = 0
+            for token in line.split():
+                column = line.find(token, position)
+                position = column + len(token)
+
+                if pending:
+                    pending.append(token)
+                    depth += token.count("[") - token.count("]")
+                    if depth <= 0:
+                        yield " ".join(pending), pending_line, pending_column
+                        pending = []
+                    continue
+
+                if "[" in token:
+                    depth = token.count("[") - token.count("]")
+                    if depth > 0:
+                        pending = [token]
+                        pending_line, pending_column = line_number, column + 1
+                        continue
+
+                yield token, line_number, column + 1
+
+        if pending:
+            yield " ".join(pending), pending_line, pending_column
+
+    def __iter__(self):
+        return self.tokens
 
     def next_token(self):
-        if len(self.tokens) > 0:
-            return self.tokens.pop(0)
-        else:
+        token = next(self.tokens, None)
+        if token is None:
             return "\n"
-
+        text, self.line, self.column = token
+        return text
@@ -0,0 +1,217 @@
+import itertools
+
+from Compiler import CompiledSpell
+from Executor import DISPATCH_TABLE, Executor
+from errors.PyHexCastError import PyHexCastError
+from operations.ListOperations import LIST_OPERATIONS
+from operations.LogicOperations import LOGIC_OPERATIONS
+from operations.MathOperations import CONSTANT_OPERATIONS, MATH_OPERATIONS
+from operations.SetOperations import SET_OPERATIONS
+from operations.StackOperations import STACK_OPERATIONS
+from token_types.DropKeep import DropKeep
+from token_types.ListLiteral import ListLiteral
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from token_types.VectorLiteral import VectorLiteral
+from util.Escapes import read_escape_seq, walk_escapes
+from util.Stack import Stack
+from util.StackEffects import SHUFFLES, stack_effect
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+# Only this many constants below an operator are used when folding it
+FOLD_WINDOW = 16
+
+# Instructions that only depend on the top of the stack and touch nothing else, so they
+# can run ahead of time on constants. Operators that look at the stack's length or
+# anything outside the stack are left out.
+FOLDABLE = (frozenset(MATH_OPERATIONS) | frozenset(CONSTANT_OPERATIONS) | frozenset(LOGIC_OPERATIONS)
+            | frozenset(LIST_OPERATIONS) | frozenset(SET_OPERATIONS) | frozenset(STACK_OPERATIONS)) - {
+    Operator.RANDOM,
+    Operator.STACK_LEN,
+    Operator.YANK_N,
+    Operator.COPY_N,
+    Operator.LEHMER_PERMUTE,
+    StackPermutation,
+}
+
+def instruction_key(instruction):
+    return type(instruction) if isinstance(instruction, (NumberLiteral, DropKeep, StackPermutation)) else instruction
+
+
+def to_literal(value):
+    """Return an instruction that pushes the value, or None if there is none."""
+    if value is True:
+        return Operator.TRUE
+    if value is False:
+        return Operator.FALSE
+    if value is None:
+        return Operator.NULL
+    if type(value) is float:
+        return NumberLiteral(value)
+    if type(value) is Vec3:
+        return VectorLiteral(value)
+    if isinstance(value, IotaList):
+        return ListLiteral(value)
+    return None
+
+
+class Optimizer:
+    """Rewrites parsed spells into shorter equivalent ones before they are run.
+
+    The passes run in order:
+
+    - ``hoist_escapes`` turns each complete ``( ... )`` sequence into one list literal.
+    - ``fold_constants`` runs pure operators whose inputs are all constants ahead of time.
+    - ``fuse_shuffles`` merges each run of shuffles into one StackPermutation. Runs that
+      leave the stack as it was become a plain depth check, since on a stack that is too
+      small they still have an effect, and runs that need no items at all are dropped.
+
+    ``stats`` maps each pass to how many rewrites it made and how many instructions it
+    removed in total.
+
+    Spells are rewritten as if no escape is open when they start, so spells for an
+    executor that is still escaping from an earlier one must not be optimized.
+    """
+
+    def __init__(self, dispatch_table=DISPATCH_TABLE):
+        self.dispatch_table = dispatch_table
+        self.stats = {}
+
+    @staticmethod
+    def optimize(instructions):
+        return Optimizer().run(instructions)
+
+    def run(self, instructions):
+        if isinstance(instructions, (PyHexCastError, CompiledSpell)):
+            return instructions
+
+        instructions = list(instructions)
+        for name, optimization in (("hoist_escapes", self.hoist_escapes),
+                                   ("fold_constants", self.fold_constants),
+                                   ("fuse_shuffles", self.fuse_shuffles)):
+            length = len(instructions)
+            instructions, rewrites = optimization(instructions)
+            stats = self.stats.setdefault(name, {"rewrites": 0, "removed": 0})
+            stats["rewrites"] += rewrites
+            stats["removed"] += length - len(instructions)
+        return instructions
+
+    def hoist_escapes(self, instructions):
+        hoisted = []
+        rewrites = 0
+        i = 0
+        while i < len(instructions):
+            instruction = instructions[i]
+            if instruction == Operator.ESCAPE:
+                hoisted.extend(instructions[i:i + 2])
+                i += 2
+                continue
+            if instruction != Operator.START_ESCAPE_SEQ:
+                hoisted.append(instruction)
+                i += 1
+                continue
+
+            items, end = read_escape_seq(instructions, i)
+            if end is None:
+                # Never closed, so nothing is pushed
+                hoisted.extend(instructions[i:])
+                break
+            hoisted.append(ListLiteral(IotaList(items)))
+            rewrites += 1
+            i = end + 1
+        return hoisted, rewrites
+
+    def fold_constants(self, instructions):
+        folded = []
+        # Values pushed by the constant instructions at the end of folded, one each
+        constants = []
+        rewrites = 0
+        for escaped, instruction in walk_escapes(instructions):
+            results = None
+            if not escaped and instruction_key(instruction) in FOLDABLE:
+                window = constants[-FOLD_WINDOW:]
+                # An operator that needs items below the constants can't run ahead of time,
+                # even if it doesn't raise when they're missing
+                effect = stack_effect(instruction)
+                if effect is None or effect[0] <= len(window):
+                    results = self.evaluate(instruction, window)
+            if results is None:
+                folded.append(instruction)
+                constants = []
+                continue
+
+            # Values the instruction left in place keep their original instructions
+            kept = 0
+            while kept < min(len(window), len(results)) and results[kept] is window[kept]:
+                kept += 1
+            if kept == len(window) and len(results) == kept + 1:
+                # Pushed a single constant
+                folded.append(instruction)
+                constants.append(results[-1])
+            else:
+                del folded[len(folded) - len(window) + kept:]
+                del constants[len(constants) - len(window) + kept:]
+                folded.extend(to_literal(value) for value in results[kept:])
+                constants.extend(results[kept:])
+                rewrites += 1
+            if len(constants) > 2 * FOLD_WINDOW:
+                del constants[:-FOLD_WINDOW]
+        return folded, rewrites
+
+    def evaluate(self, instruction, values):
+        """Run the instruction on a stack of the values, returning the new stack or None if it can't be folded."""
+        executor = Executor(self.dispatch_table)
+        executor.stack = Stack(values)
+        handler = self.dispatch_table.lookup(instruction)
+        try:
+            handler(executor, instruction)
+        except Exception:
+            # Left for the executor to report when the spell runs
+            return None
+        # Checked before copying, as dup_n can leave far more items than it stores
+        if len(executor.stack) > FOLD_WINDOW:
+            return None
+        results = list(executor.stack)
+        if any(to_literal(value) is None for value in results):
+            return None
+        return results
+
+    def fuse_shuffles(self, instructions):
+        fused = []
+        shuffles = []
+        rewrites = 0
+        for escaped, instruction in itertools.chain(walk_escapes(instructions), [(True, None)]):
+            if not escaped and isinstance(instruction, StackPermutation):
+                shuffles.extend(instruction.instructions)
+                continue
+            if not escaped and instruction_key(instruction) in SHUFFLES:
+                shuffles.append(instruction)
+                continue
+
+            if shuffles:
+                depth, order = self.compose(shuffles)
+                if depth == 0:
+                    rewrites += 1
+                elif len(shuffles) == 1 and order != tuple(range(depth)):
+                    fused.append(shuffles[0])
+                else:
+                    fused.append(StackPermutation(depth, order, shuffles))
+                    rewrites += 1
+                shuffles = []
+            if instruction is not None:
+                fused.append(instruction)
+        return fused, rewrites
+
+    def compose(self, shuffles):
+        """Return how many items the shuffles need and where each of those items ends up."""
+        executor = Executor(self.dispatch_table)
+        for depth in itertools.count():
+            executor.stack = Stack(range(depth))
+            try:
+                for shuffle in shuffles:
+                    self.dispatch_table.lookup(shuffle)(executor, shuffle)
+            except (IndexError, RuntimeError):
+                continue
+            return depth, tuple(executor.stack)
@@ -1,11 +1,52 @@
-import numpy as np
+import functools
 
 from errors.HexCastSyntaxError import HexCastSyntaxError
 from errors.PyHexCastError import PyHexCastError
 from token_types.DropKeep import DropKeep
+from token_types.ListLiteral import ListLiteral
 from token_types.NumberLiteral import NumberLiteral
 from token_types.Operator import Operator
 from token_types.VectorLiteral import VectorLiteral
+from util.Interner import intern
+from util.LiteralParser import LiteralParser
+from values.IotaList import IotaList
+
+TOKEN_CACHE_SIZE = 4096
+# Longer tokens (big list literals) are rarely repeated and would pin a lot of memory
+MAX_CACHED_TOKEN_LENGTH = 256
+
+# Some common replacements applied to operator spellings
+REPLACEMENTS = [
+    ("list", "lst"),
+    ("vector", "vec"),
+    ("make", "mk"),
+    ("clear", "clr"),
+]
+
+ALIASES = {
+    "add": "+",
+    "sub": "-",
+    "mul": "*",
+    "div": "/",
+    "abs": "|",
+    "mag": "|",
+    "pwr": "^",
+    "power": "^",
+    "eq": "=",
+    "==": "=",
+    "not_eq": "!=",
+    "neq": "!=",
+    "gt": ">",
+    "lt": "<",
+    "ge": ">=",
+    "geq": ">=",
+    "le": "<=",
+    "leq": "<="
+}
+
+# Every accepted spelling (after normalization) of every operator
+OPERATOR_SPELLINGS = {op.value: op for op in Operator}
+OPERATOR_SPELLINGS.update({alias: Operator(value) for alias, value in ALIASES.items()})
 
 
 class Parser:
@@ -18,8 +59,7 @@ class Parser:
             token = self.lexer.next_token()
             parsed_token, is_next = self.parse_token(token)
             if isinstance(parsed_token, PyHexCastError):
-                tokens = parsed_token
-                return tokens
+                return HexCastSyntaxError(parsed_token.message, self.lexer.line, self.lexer.column)
 
             if tokens != "EOF":
                 tokens.append(parsed_token)
@@ -28,60 +68,74 @@ class Parser:
                 break
         return tokens
 
+    @staticmethod
+    def to_literal(value):
+        # Equal literals share one value, so comparing them is an identity check
+        value = intern(value)
+        if isinstance(value, IotaList):
+            return ListLiteral(value)
+        if isinstance(value, float):
+            return NumberLiteral(value)
+        return VectorLiteral(value)
+
+    @staticmethod
+    def resolve_word(word):
+        """Resolve a word inside a list literal to the value it stands for."""
+        parsed = Parser.parse_token_text(word)
+        if isinstance(parsed, NumberLiteral):
+            return parsed.value
+        return parsed
+
+    @staticmethod
+    def cache_info():
+        return cached_parse_token_text.cache_info()
+
+    @staticmethod
+    def cache_clear():
+        cached_parse_token_text.cache_clear()
+
+    @staticmethod
+    def parse_token_text(token):
+        """Parse a single token, raising HexCastSyntaxError if it is invalid.
+
+        Results for short tokens come from a bounded LRU cache shared by all parsers, so
+        parsed tokens must be treated as immutable.
+        """
+        if len(token) <= MAX_CACHED_TOKEN_LENGTH:
+            return cached_parse_token_text(token)
+        return uncached_parse_token_text(token)
+
     def parse_token(self, token):
         token = str(token)
         if token == "\n":
             return "EOF", False
-        if token.replace('.', '').isnumeric():
-            return NumberLiteral(float(token)), True
-
-        token = token.replace("vector", "vec")
-        if "vec([" in token or "np.array" in token:
-            token = token.replace("vector", "vec")
-            token = token.replace("vec", "np.array")
-            return VectorLiteral(eval(token)), True
-
-        # Operators are not case sensitive and some common replacements
-        token = token.lower()
-        token = token.replace("list", "lst")
-        token = token.replace("vector", "vec")
-        token = token.replace("make", "mk")
-        token = token.replace("clear", "clr")
-
-        mapping = {
-            "add": "+",
-            "sub": "-",
-            "mul": "*",
-            "div": "/",
-            "abs": "|",
-            "mag": "|",
-            "pwr": "^",
-            "power": "^",
-            "eq": "=",
-            "==": "=",
-            "not_eq": "!=",
-            "neq": "!=",
-            "gt": ">",
-            "lt": "<",
-            "ge": ">=",
-            "geq": ">=",
-            "le": "<=",
-            "leq": "<="
-        }
-
-        mapped = mapping.get(token, token)
-        token = mapped
-
-        # Handle drop_keep specifically
-        if token[:3] == "dk_":
-            try:
-                to_ret = DropKeep(token)
-            except ValueError:
-                return HexCastSyntaxError(f"\"{token}\" is invalid drop_keep syntax"), False
-            return to_ret, True
+        try:
+            return Parser.parse_token_text(token), True
+        except HexCastSyntaxError as e:
+            return e, False
+
+
+def uncached_parse_token_text(token):
+    if LiteralParser.is_literal(token):
+        return Parser.to_literal(LiteralParser.parse(token, Parser.resolve_word))
 
+    # Operators are not case sensitive
+    token = token.lower()
+    for old, new in REPLACEMENTS:
+        token = token.replace(old, new)
+
+    # Handle drop_keep specifically
+    if token[:3] == "dk_":
         try:
-            to_ret = Operator(token)
+            return DropKeep(token)
         except ValueError:
-            return HexCastSyntaxError(f"\"{token}\" is an invalid operator"), False
-        return to_ret, True
+            raise HexCastSyntaxError(f"\"{token}\" is invalid drop_keep syntax")
+
+    operator = OPERATOR_SPELLINGS.get(token)
+    if operator is None:
+        raise HexCastSyntaxError(f"\"{token}\" is an invalid operator")
+    return operator
+
+
+# Invalid tokens raise, so they are never cached
+cached_parse_token_text = functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)(uncached_parse_token_text)
@@ -0,0 +1,285 @@
+"""Serves spells to many clients from one warm interpreter over a TCP or Unix socket.
+
+Clients send one JSON request per line and get JSON lines back, each carrying the
+request's ``id``:
+
+- ``{"op": "open"}`` opens a session, answered with ``{"type": "opened", "session": ...}``.
+- ``{"op": "run", "spell": ..., "session": ..., "inputs": [...]}`` runs a spell. Anything
+  it prints is streamed back as ``{"type": "output", "text": ...}`` while it runs, and it
+  finishes with ``{"type": "result", ...}`` holding the stack and temporary. Without a
+  session it runs in the connection's own session. ``inputs`` answer the spell's input
+  operators in order.
+- ``{"op": "close", "session": ...}`` closes a session, answered with ``{"type": "closed"}``.
+
+Sessions belong to the connection that opened them, and are closed when it goes away.
+
+Bad requests are answered with ``{"type": "error", "error": ...}``, as are results too
+large to build within the memory budget, if the server has one. Each session's spells
+may hold up to that budget at once, and going over it is reported like any other error.
+
+Run from the repository root with ``python Server.py --port 8765`` or ``--unix PATH``.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Compiler import CompiledSpell, Compiler
+from Executor import Executor
+from Lexer import Lexer
+from Optimizer import Optimizer
+from Parser import Parser
+from util.IotaJson import to_json
+from util.MemoryBudget import MemoryBudget, charge
+
+# Longest request line accepted, which bounds the size of a submitted spell
+MAX_REQUEST_SIZE = 1 << 24
+# Compiled spells kept by source, so spells clients send again skip parsing and can get hot
+SPELL_CACHE_SIZE = 1024
+
+
+class Session:
+    """An executor that keeps its stack and temporary between the spells run on it."""
+    __slots__ = ("id", "executor", "lock")
+
+    def __init__(self, session_id, executor):
+        self.id = session_id
+        self.executor = executor
+        # Spells on one session run one at a time, in the order they arrive
+        self.lock = asyncio.Lock()
+
+
+class ExecutorPool:
+    """Keeps up to ``size`` idle executors around so sessions start on a warm one."""
+
+    def __init__(self, size, jit_threshold=None, memory_budget=None):
+        self.size = size
+        self.jit_threshold = jit_threshold
+        self.memory_budget = memory_budget
+        self.idle = [self.new_executor() for _ in range(size)]
+
+    def new_executor(self):
+        executor = Executor(jit_threshold=self.jit_threshold)
+        if self.memory_budget is not None:
+            executor.memory_budget = MemoryBudget(self.memory_budget)
+        return executor
+
+    def acquire(self):
+        return self.idle.pop() if self.idle else self.new_executor()
+
+    def release(self, executor):
+        if len(self.idle) < self.size:
+            executor.reset()
+            executor.output = print
+            executor.input = input
+            self.idle.append(executor)
+
+
+class SpellCache:
+    """Keeps the most recently used ``size`` spells that compiled, by source.
+
+    Spells are compiled once and shared, but each worker thread runs its own copy, since
+    running a spell counts its runs and translates it once it is hot. Spells that don't
+    compile aren't kept, so they're reported afresh each time they're sent.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.spells = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def get(self, source, optimize):
+        key = (source, optimize)
+        copies = getattr(self.local, "copies", None)
+        if copies is None:
+            copies = self.local.copies = collections.OrderedDict()
+        spell = copies.get(key)
+        if spell is not None:
+            copies.move_to_end(key)
+            return spell
+
+        with self.lock:
+            spell = self.spells.get(key)
+            if spell is not None:
+                self.spells.move_to_end(key)
+        if spell is None:
+            spell = compile_spell(source, optimize)
+            if not isinstance(spell, CompiledSpell):
+                return spell
+            # Analysed before it's shared, so the copies don't each work it out again
+            spell.analyze()
+            with self.lock:
+                spell = self.spells.setdefault(key, spell)
+                self.spells.move_to_end(key)
+                if len(self.spells) > self.size:
+                    self.spells.popitem(last=False)
+
+        spell = copies[key] = spell.copy()
+        if len(copies) > self.size:
+            copies.popitem(last=False)
+        return spell
+
+
+def compile_spell(source, optimize):
+    parsed = Parser(Lexer(source)).process_all_tokens()
+    if optimize:
+        parsed = Optimizer.optimize(parsed)
+    return Compiler.compile(parsed)
+
+
+def run_spell(executor, spells, source, inputs, optimize, emit):
+    """Run a spell on the executor, sending anything it prints to ``emit``. Runs on a worker thread."""
+    inputs = iter(inputs)
+
+    def read_input(prompt):
+        for value in inputs:
+            return str(value)
+        raise RuntimeError("no input left for the spell")
+
+    executor.output = emit
+    executor.input = read_input
+    start = time.perf_counter()
+    # The result is built under the budget too, so lazily repeated items can't blow up in it
+    with executor.budgeted():
+        # A spell that starts out escaped, which the optimizer can't see, is run as written
+        halted = executor.execute_instructions(spells.get(source, optimize and not executor.escaping()))
+        elapsed = time.perf_counter() - start
+        charge(len(executor.stack))
+        return {
+            "type": "result",
+            "halted": halted,
+            "time": elapsed,
+            "stack": [to_json(value) for value in executor.stack],
+            "temporary": to_json(executor.temporary),
+        }
+
+
+class SpellServer:
+    """Runs submitted spells on pooled sessions.
+
+    The event loop only reads requests and writes responses. Spells run on a pool of
+    worker threads, so a long spell never holds up other clients.
+    """
+
+    def __init__(self, pool_size=8, workers=4, optimize=False, jit_threshold=None, memory_budget=None):
+        self.pool = ExecutorPool(pool_size, jit_threshold, memory_budget)
+        self.workers = ThreadPoolExecutor(max_workers=workers)
+        self.optimize = optimize
+        self.spells = SpellCache(SPELL_CACHE_SIZE)
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+
+    def open_session(self):
+        session = Session(next(self.session_ids), self.pool.acquire())
+        self.sessions[session.id] = session
+        return session
+
+    def close_session(self, session):
+        if self.sessions.pop(session.id, None) is not None:
+            self.pool.release(session.executor)
+
+    async def handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        # Sessions the connection opened, closed once it goes away
+        owned = {}
+
+        def owned_session(session_id):
+            # Connections can only reach the sessions they opened themselves
+            return owned.get(session_id) if type(session_id) is int else None
+
+        def send(response):
+            if not writer.is_closing():
+                writer.write(json.dumps(response).encode() + b"\n")
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                    op = request.get("op")
+                except (ValueError, AttributeError):
+                    send({"type": "error", "error": "requests must be JSON objects"})
+                    continue
+
+                if op == "open":
+                    session = self.open_session()
+                    owned[session.id] = session
+                    send({"id": request_id, "type": "opened", "session": session.id})
+                elif op == "close":
+                    session = owned_session(request.get("session"))
+                    if session is None:
+                        send({"id": request_id, "type": "error", "error": "unknown session"})
+                        continue
+                    async with session.lock:
+                        self.close_session(session)
+                    owned.pop(session.id, None)
+                    send({"id": request_id, "type": "closed"})
+                elif op == "run":
+                    if "session" in request:
+                        session = owned_session(request["session"])
+                    else:
+                        session = owned.get(None)
+                        if session is None:
+                            session = owned[None] = self.open_session()
+                    if session is None:
+                        send({"id": request_id, "type": "error", "error": "unknown session"})
+                        continue
+
+                    def emit(text, request_id=request_id):
+                        loop.call_soon_threadsafe(send, {"id": request_id, "type": "output", "text": text})
+
+                    async with session.lock:
+                        try:
+                            response = await loop.run_in_executor(
+                                self.workers, run_spell, session.executor, self.spells, str(request.get("spell", "")),
+                                request.get("inputs", []), self.optimize, emit)
+                        except Exception as e:
+                            response = {"type": "error", "error": str(e)}
+                    send({"id": request_id, **response})
+                else:
+                    send({"id": request_id, "type": "error", "error": f"unknown op {op!r}"})
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            for session in owned.values():
+                async with session.lock:
+                    self.close_session(session)
+            writer.close()
+
+    async def serve(self, host=None, port=None, path=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path, limit=MAX_REQUEST_SIZE)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_REQUEST_SIZE)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--unix", help="serve on a Unix socket at this path instead of TCP")
+    arg_parser.add_argument("--sessions", type=int, default=8, help="warm executors kept ready for new sessions")
+    arg_parser.add_argument("--workers", type=int, default=4, help="threads spells run on")
+    arg_parser.add_argument("--optimize", action="store_true", help="run the peephole optimizer over each spell")
+    arg_parser.add_argument("--jit-threshold", type=int, help="runs after which hot spells are translated to Python")
+    arg_parser.add_argument("--memory-budget", type=float, help="MiB of memory each session's spells may hold at once")
+    args = arg_parser.parse_args()
+
+    memory_budget = int(args.memory_budget * (1 << 20)) if args.memory_budget is not None else None
+    server = SpellServer(args.sessions, args.workers, args.optimize, args.jit_threshold, memory_budget)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
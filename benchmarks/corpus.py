@@ -0,0 +1,56 @@
+"""Representative spells for the benchmark suite.
+
+Each spell leaves the stack as deep as it found it (or documents what it needs), so it
+can be run over and over on the same executor.
+"""
+
+# Straight-line numeric work on one number
+ARITHMETIC_LOOP = "dup dup * swap 2 * + 1 + sin dup cos * 3 / 1 + " * 4
+
+# Vector math on one vector
+VECTOR_LOOP = "dup vec_y+ / + dup dup * 1 + / vec_z+ ^ vec_x+ + " * 4
+
+# Shuffles deep into a large stack, which the spell leaves as deep as it found it
+DEEP_SHUFFLES = ("swap 50000 yank 99990 cpyank dk_d 1000 yank dk_kkdk dup 123456789 permute "
+                 "rotate_left dup_2 dk_kkd dk_kd dup_2nd dk_kdk 25000 yank -25000 yank")
+DEEP_STACK_SIZE = 100_000
+
+# Counts the number on top of the stack down to 0 by having the spell in the temporary
+# eval itself, so it needs that spell stored first
+RECURSIVE_BODY = "( 1 - dup 0 < empty_lst read rotate_left cond_remove eval ) store"
+RECURSIVE_EVAL = "read eval"
+RECURSIVE_BODY_LENGTH = 10
+
+# Evaled with itself and a number on the stack, replaces both with that Fibonacci number.
+# Each call evals itself twice, so it takes exponential time without an EvalCache
+FIBONACCI_BODY = ("( dup 1 < \\ ( swap dk_d \\ ) "
+                  "\\ ( dup_2 1 - dup_2nd eval rotate_right 2 - dup_2nd eval + \\ ) "
+                  "rotate_left cond_remove eval )")
+FIBONACCI_EVAL = "dup_2nd eval"
+
+# Body mapped over a large list by lst_eval
+MAP_BODY = "( dup * 1 + ) "
+MAP_BODY_LENGTH = 3
+
+# Body that costs enough per item for lst_eval to spread it across worker processes
+HEAVY_MAP_BODY = f"( {ARITHMETIC_LOOP}) "
+HEAVY_MAP_BODY_LENGTH = len(ARITHMETIC_LOOP.split())
+
+# Math on a whole list of numbers at once, the same as mapping MAP_BODY and then sin over it
+LIST_MATH = "dup * 1 + sin"
+
+# Duplicates the number on top of the stack a million times, packs the copies into a list
+# and back out again, then drops them. None of the copies are ever stored one by one
+LAZY_REPEATS = "dup 1000000 dup_n 1000000 mk_lst unmk_lst 1000000 mk_lst len 1000000 - +"
+
+# Runs each set operation on the two lists on top of the stack, leaving their disjunction
+SET_OPERATIONS = "dup_2 unify dk_d dup_2 intersect dk_d disjunct"
+
+# A bit of everything the lexer and parser see, repeated to build large programs
+PROGRAM_SNIPPET = ("1 2.5 + vec([1, 2, 3]) dup * swap [1, 2, [3, vec([0, 0, 1])]] append "
+                   "( dup * ) \\ swap dk_kdk 3 permute 0.25 yank unify rotate_left\n")
+
+
+def program_source(size):
+    """Return a program of about ``size`` characters."""
+    return PROGRAM_SNIPPET * max(1, size // len(PROGRAM_SNIPPET))
@@ -0,0 +1,83 @@
+"""Measures the per-instruction cost of dispatching operators from different positions
+in the Operator enum. With table-driven dispatch the cost should not depend on where
+the operator is declared, though operators still differ in how much work their
+handlers do, so the spread between the cheapest and dearest one is reported too.
+
+Run from the repository root with ``python -m benchmarks.dispatch_benchmark`` or
+``python benchmarks/dispatch_benchmark.py``.
+"""
+import argparse
+import os
+import sys
+import time
+
+if __package__ in (None, ""):
+    # Run as a script, so the repository root isn't on the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Executor import Executor
+from token_types.Operator import Operator
+from values.IotaList import IotaList
+
+EMPTY = IotaList()
+ONE = IotaList((1.0,))
+TWO = IotaList((2.0,))
+
+# Operators spread from the top to the bottom of the enum, with the items each one is
+# given. The stack is cleared after every run
+OPERATORS = [
+    (Operator.TRUE, ()),
+    (Operator.ZERO_VEC, ()),
+    (Operator.PI, ()),
+    (Operator.STACK_LEN, ()),
+    (Operator.EMPTY_LST, ()),
+    (Operator.READ_TEMP, ()),
+    (Operator.UNIFY, (ONE, TWO)),
+    (Operator.INTERSECT, (ONE, TWO)),
+    (Operator.DISJUNCT, (ONE, TWO)),
+    (Operator.INVERT, (1.0,)),
+    (Operator.UNIQUE, (ONE,)),
+    (Operator.EVAL, (EMPTY,)),
+    (Operator.LIST_EVAL, (EMPTY, EMPTY)),
+    (Operator.CLEAR, ()),
+]
+
+
+def time_operator(instruction, inputs, iterations):
+    executor = Executor()
+    stack = executor.stack
+    start = time.perf_counter()
+    for _ in range(iterations):
+        stack.extend(inputs)
+        executor.execute_instruction(instruction)
+        stack.clear()
+    return (time.perf_counter() - start) / iterations
+
+
+def time_overhead(inputs, iterations):
+    """Time the same loop without running the operator, to take it out of the results."""
+    stack = Executor().stack
+    start = time.perf_counter()
+    for _ in range(iterations):
+        stack.extend(inputs)
+        stack.clear()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("-n", "--iterations", type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    positions = {op: i for i, op in enumerate(Operator)}
+    print(f"{'operator':<14}{'position':>10}{'ns/op':>10}")
+    costs = []
+    for instruction, inputs in OPERATORS:
+        per_op = time_operator(instruction, inputs, args.iterations) - time_overhead(inputs, args.iterations)
+        costs.append(per_op)
+        print(f"{instruction.value:<14}{positions[instruction]:>10}{per_op * 1e9:>10.1f}")
+    print(f"spread: {min(costs) * 1e9:.1f} to {max(costs) * 1e9:.1f} ns/op ({max(costs) / min(costs):.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
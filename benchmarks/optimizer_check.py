@@ -0,0 +1,59 @@
+"""Checks that optimized spells leave the same stack and output as unoptimized ones.
+
+Runs every spell in the corpus, along with spells that the optimizer once got wrong, both
+ways on fresh executors, and exits with status 1 if any of them differ.
+
+Run from the repository root with ``python -m benchmarks.optimizer_check``.
+"""
+import sys
+
+from Compiler import Compiler
+from Executor import Executor
+from Lexer import Lexer
+from Optimizer import Optimizer
+from Parser import Parser
+from benchmarks import corpus
+
+# Spells the optimizer once changed the meaning of
+REGRESSIONS = [
+    # set_index on only two constants needs the list below them, which isn't a constant
+    "stack_len singlet 0 9 set_index",
+]
+
+SPELLS = REGRESSIONS + [
+    corpus.ARITHMETIC_LOOP,
+    corpus.VECTOR_LOOP,
+    corpus.PROGRAM_SNIPPET,
+    corpus.LIST_MATH,
+    corpus.LAZY_REPEATS,
+]
+
+
+def run(source, optimize):
+    """Return the stack and output the spell leaves on a new executor with 1.5 on its stack."""
+    parsed = Parser(Lexer(source)).process_all_tokens()
+    if optimize:
+        parsed = Optimizer.optimize(parsed)
+    executor = Executor()
+    output = []
+    executor.output = output.append
+    executor.stack.append(1.5)
+    executor.execute_instructions(Compiler.compile(parsed))
+    return list(executor.stack), output
+
+
+def main():
+    failures = 0
+    for source in SPELLS:
+        plain = run(source, False)
+        optimized = run(source, True)
+        if plain != optimized:
+            failures += 1
+            print(f"Mismatch in {source.strip()!r}:\n    plain     {plain}\n    optimized {optimized}")
+    print(f"{len(SPELLS) - failures} of {len(SPELLS)} spells match")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
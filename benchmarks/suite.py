@@ -0,0 +1,334 @@
+"""Runs the benchmark suite over the corpus and stores the results as JSON.
+
+Every case reports operations per second (instructions run, or tokens for lexing and
+parsing), latency percentiles over its repetitions and the peak memory one repetition
+allocates. Passing ``--baseline`` with an earlier results file compares against it and
+exits with status 1 if any case got slower or used more memory than the threshold allows.
+
+Run from the repository root with ``python -m benchmarks.suite``.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from Compiler import Compiler
+from Executor import Executor
+from Lexer import Lexer
+from Parser import Parser
+from benchmarks import corpus
+from util.EvalCache import EvalCache
+from util.MemoryBudget import MemoryBudget
+from util.SpellCache import SpellCache
+from values.IotaList import IotaList
+from values.NumericList import NumericList
+from values.Vec3 import Vec3
+
+RESULTS_VERSION = 1
+
+
+def parse(source):
+    return Parser(Lexer(source)).process_all_tokens()
+
+
+def compile_spell(source):
+    return Compiler.compile(parse(source))
+
+
+def repeated(spell, executor, runs):
+    def run():
+        for _ in range(runs):
+            executor.execute_instructions(spell)
+
+    return run
+
+
+# Each case takes the scale and returns a setup function, which builds a fresh run
+# function and the number of operations it does. Only the run function is measured.
+def lex_parse(scale):
+    source = corpus.program_source(int(2_000_000 * scale))
+    tokens = len(source.split())
+    return lambda: (lambda: parse(source), tokens)
+
+
+def spell_cache_load(scale):
+    sources = [f"{corpus.PROGRAM_SNIPPET * 4}{i}\n" for i in range(max(1, int(2000 * scale)))]
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "spells.cache")
+    with SpellCache(path) as spell_cache:
+        for source in sources:
+            spell_cache.compile(source)
+        spell_cache.save()
+
+    def run():
+        with SpellCache(path) as spell_cache:
+            for source in sources:
+                spell_cache.get(source)
+
+    return lambda: (run, len(sources))
+
+
+def arithmetic_loop(scale, jit_threshold=None):
+    spell = compile_spell(corpus.ARITHMETIC_LOOP)
+    runs = max(1, int(2000 * scale))
+
+    def setup():
+        executor = Executor(jit_threshold=jit_threshold)
+        executor.stack.append(1.5)
+        return repeated(spell, executor, runs), len(spell) * runs
+
+    return setup
+
+
+def vector_loop(scale):
+    spell = compile_spell(corpus.VECTOR_LOOP)
+    runs = max(1, int(2000 * scale))
+
+    def setup():
+        executor = Executor()
+        executor.stack.append(Vec3(1, 2, 3))
+        return repeated(spell, executor, runs), len(spell) * runs
+
+    return setup
+
+
+def deep_shuffles(scale):
+    spell = compile_spell(corpus.DEEP_SHUFFLES)
+    runs = max(1, int(200 * scale))
+    items = [float(i) for i in range(corpus.DEEP_STACK_SIZE)]
+
+    def setup():
+        executor = Executor()
+        executor.stack.extend(items)
+        return repeated(spell, executor, runs), len(spell) * runs
+
+    return setup
+
+
+def recursive_eval(scale):
+    store = parse(corpus.RECURSIVE_BODY)
+    spell = compile_spell(corpus.RECURSIVE_EVAL)
+    # Eval runs on the executor's frame stack, not Python's, so the recursion goes as deep as the scale asks
+    depth = max(1, int(3000 * scale))
+
+    def setup():
+        executor = Executor()
+        executor.execute_instructions(store)
+
+        def run():
+            executor.stack.append(float(depth))
+            executor.execute_instructions(spell)
+            executor.stack.pop()
+
+        return run, depth * corpus.RECURSIVE_BODY_LENGTH
+
+    return setup
+
+
+def memo_fibonacci(scale):
+    body = compile_spell(corpus.FIBONACCI_BODY)
+    spell = compile_spell(corpus.FIBONACCI_EVAL)
+    n = max(2, int(500 * scale))
+
+    def setup():
+        executor = Executor()
+        executor.eval_cache = EvalCache()
+        executor.execute_instructions(body)
+
+        def run():
+            executor.stack.append(float(n))
+            executor.execute_instructions(spell)
+            executor.stack.pop()
+
+        return run, n
+
+    return setup
+
+
+def list_eval_map(scale, body=corpus.MAP_BODY, body_length=corpus.MAP_BODY_LENGTH, size=100_000, workers=None):
+    spell = compile_spell(body + "swap lst_eval")
+    items = IotaList(float(i) for i in range(int(size * scale)))
+
+    def setup():
+        executor = Executor(parallel_workers=workers)
+        executor.stack.append(items)
+        return lambda: executor.execute_instructions(spell), len(items) * body_length
+
+    return setup
+
+
+def list_eval_heavy(scale, workers=None):
+    return list_eval_map(scale, corpus.HEAVY_MAP_BODY, corpus.HEAVY_MAP_BODY_LENGTH, 5_000, workers)
+
+
+def list_math(scale):
+    spell = compile_spell(corpus.LIST_MATH)
+    items = NumericList(np.arange(int(100_000 * scale), dtype=float))
+
+    def setup():
+        executor = Executor()
+        executor.stack.append(items)
+        return lambda: executor.execute_instructions(spell), len(items) * 4
+
+    return setup
+
+
+def lazy_repeats(scale):
+    spell = compile_spell(corpus.LAZY_REPEATS)
+    runs = max(1, int(1000 * scale))
+
+    def setup():
+        executor = Executor()
+        # Far less than the copies would take if they were stored
+        executor.memory_budget = MemoryBudget(1 << 20)
+        executor.stack.append(1.5)
+        return repeated(spell, executor, runs), len(spell) * runs
+
+    return setup
+
+
+def set_operations(scale, list_type=IotaList):
+    spell = compile_spell(corpus.SET_OPERATIONS)
+    size = int(50_000 * scale)
+    first = list_type([float(i) for i in range(size)])
+    second = list_type([float(i) for i in range(size // 2, size + size // 2)])
+
+    def setup():
+        executor = Executor()
+        executor.stack.extend([first, second])
+        return lambda: executor.execute_instructions(spell), 3 * 2 * size
+
+    return setup
+
+
+CASES = {
+    "lex_parse": lex_parse,
+    "spell_cache_load": spell_cache_load,
+    "arithmetic_loop": arithmetic_loop,
+    "arithmetic_loop_jit": lambda scale: arithmetic_loop(scale, jit_threshold=1),
+    "vector_loop": vector_loop,
+    "deep_shuffles": deep_shuffles,
+    "recursive_eval": recursive_eval,
+    "memo_fibonacci": memo_fibonacci,
+    "list_eval_map": list_eval_map,
+    # Against the cases above, these show what spreading a cheap and a costly body across a
+    # worker per CPU gains. lst_eval only uses the workers when the body's measured cost per
+    # item pays for sending the items there, and never with a single CPU
+    "list_eval_map_parallel": lambda scale: list_eval_map(scale, workers=os.cpu_count()),
+    "list_eval_heavy": list_eval_heavy,
+    "list_eval_heavy_parallel": lambda scale: list_eval_heavy(scale, workers=os.cpu_count()),
+    "list_math": list_math,
+    "lazy_repeats": lazy_repeats,
+    "set_operations": set_operations,
+    "set_operations_numeric": lambda scale: set_operations(scale, NumericList),
+}
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(setup, repeat, warmup):
+    for _ in range(warmup):
+        run, ops = setup()
+        run()
+
+    latencies = []
+    for _ in range(repeat):
+        run, ops = setup()
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+
+    # Traced separately, as tracing slows everything down
+    run, ops = setup()
+    tracemalloc.start()
+    try:
+        run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    median = statistics.median(latencies)
+    return {
+        "ops": ops,
+        "ops_per_sec": ops / median if median else float("inf"),
+        "latency": {
+            "min": latencies[0],
+            "p50": median,
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+        },
+        "peak_memory": peak_memory,
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """Return a message for each case that got slower or used more memory than the threshold allows."""
+    regressions = []
+    for name, case in results["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if before is None:
+            continue
+        if case["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: {before['ops_per_sec']:.0f} -> {case['ops_per_sec']:.0f} ops/sec")
+        if case["peak_memory"] > before["peak_memory"] * (1 + threshold):
+            regressions.append(f"{name}: {before['peak_memory']} -> {case['peak_memory']} bytes peak memory")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("cases", nargs="*", help=f"cases to run, all by default: {', '.join(CASES)}")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=10)
+    arg_parser.add_argument("-w", "--warmup", type=int, default=1)
+    arg_parser.add_argument("-s", "--scale", type=float, default=1.0, help="multiplies the size of every case")
+    arg_parser.add_argument("-o", "--output", help="file to write the results to")
+    arg_parser.add_argument("-b", "--baseline", help="earlier results to compare against")
+    arg_parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                            help="fraction a case may get worse by before it counts as a regression")
+    args = arg_parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            arg_parser.error(f"unknown case {name!r}")
+
+    results = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "cases": {},
+    }
+    print(f"{'case':<26}{'ops/sec':>14}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak KiB':>12}")
+    for name in args.cases or CASES:
+        case = measure(CASES[name](args.scale), args.repeat, args.warmup)
+        results["cases"][name] = case
+        latency = case["latency"]
+        print(f"{name:<26}{case['ops_per_sec']:>14.0f}{latency['p50'] * 1000:>10.2f}{latency['p90'] * 1000:>10.2f}"
+              f"{latency['p99'] * 1000:>10.2f}{case['peak_memory'] / 1024:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,9 @@ from errors.PyHexCastError import PyHexCastError
 
 
 class HexCastSyntaxError(PyHexCastError):
-    pass
+    def __init__(self, message, line=None, column=None):
+        if line is not None:
+            message = f"{message} at line {line}, column {column}"
+        super().__init__(message)
+        self.line = line
+        self.column = column
@@ -0,0 +1,8 @@
+from errors.PyHexCastError import PyHexCastError
+
+
+class MemoryBudgetError(PyHexCastError):
+    def __init__(self, limit, needed):
+        super().__init__(f"spell needs {needed} bytes of memory, but its budget is {limit}")
+        self.limit = limit
+        self.needed = needed
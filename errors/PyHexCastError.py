@@ -1,3 +1,4 @@
 class PyHexCastError(Exception):
     def __init__(self, message):
+        super().__init__(message)
         self.message = message
@@ -0,0 +1,8 @@
+from errors.PyHexCastError import PyHexCastError
+
+
+class StackUnderflowError(PyHexCastError):
+    def __init__(self, required, available):
+        super().__init__(f"spell needs {required} items on the stack, but there are only {available}")
+        self.required = required
+        self.available = available
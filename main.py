@@ -1,31 +1,155 @@
+import argparse
+import contextlib
+import io
+import json
+import os
 import re
+import sys
+import time
 
 import numpy as np
 
+from Compiler import Compiler
 from Executor import Executor
 from Parser import Parser
 from Lexer import Lexer
+from Optimizer import Optimizer
+from errors.MemoryBudgetError import MemoryBudgetError
 from token_types.Operator import Operator
+from util.EvalCache import EvalCache
+from util.IotaJson import to_json
+from util.MemoryBudget import MemoryBudget, charge
+from util.Profiler import Profiler
+from util.SpellCache import SpellCache
+
+# Buffer for batch results, so that thousands of small records are written in few calls
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+
+def spell_paths(paths):
+    """Yield the spell files named by the paths, walking directories in sorted order."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            for file in sorted(files):
+                yield os.path.join(directory, file)
+
+
+def run_spell(path, executor, optimizer, profile, spell_cache=None):
+    """Run the spell in a file and return its result as a dict."""
+    record = {"file": path}
+    output = io.StringIO()
+    if executor.escaping():
+        # The spell starts out escaped, which the optimizer can't see
+        optimizer = None
+    start = time.perf_counter()
+    try:
+        with open(path) as file, contextlib.redirect_stdout(output):
+            if spell_cache is not None:
+                spell = spell_cache.compile(file.read(), optimizer)
+            else:
+                parsed = Parser(Lexer(file)).process_all_tokens()
+                if optimizer is not None:
+                    parsed = optimizer.run(parsed)
+                spell = Compiler.compile(parsed)
+            if profile:
+                executor.profiler = Profiler()
+            record["halted"] = executor.execute_instructions(spell)
+    except Exception as e:
+        record["error"] = str(e)
+    record["time"] = time.perf_counter() - start
+    record["output"] = output.getvalue()
+    try:
+        # Built under the budget, so lazily repeated items can't blow up in the record
+        with executor.budgeted():
+            charge(len(executor.stack))
+            record["stack"] = [to_json(value) for value in executor.stack]
+            record["temporary"] = to_json(executor.temporary)
+    except MemoryBudgetError as e:
+        record["error"] = str(e)
+    if profile:
+        record["profile"] = executor.profiler.results()
+    return record
+
+
+def new_executor(args):
+    executor = Executor()
+    if args.memo:
+        executor.eval_cache = EvalCache()
+    if args.memory_budget is not None:
+        executor.memory_budget = MemoryBudget(int(args.memory_budget * (1 << 20)))
+    return executor
+
+
+def run_batch(args):
+    """Run every spell file, writing one JSON line per spell."""
+    optimizer = Optimizer() if args.optimize else None
+    executor = new_executor(args) if args.shared else None
+    if args.output:
+        out = open(args.output, "w", buffering=OUTPUT_BUFFER_SIZE)
+    else:
+        out = io.TextIOWrapper(open(sys.stdout.fileno(), "wb", buffering=OUTPUT_BUFFER_SIZE, closefd=False))
+    spell_cache = SpellCache(args.cache) if args.cache else None
+    with out:
+        for path in spell_paths(args.paths):
+            record = run_spell(path, executor or new_executor(args), optimizer, args.profile, spell_cache)
+            out.write(json.dumps(record) + "\n")
+    if spell_cache is not None:
+        spell_cache.save()
+        spell_cache.close()
 
 
 def main():
     # a = Operator("=")
     # print(a)
-    executor = Executor()
+    arg_parser = argparse.ArgumentParser(description="Run hex casting spells line by line, or from files.")
+    arg_parser.add_argument("paths", nargs="*",
+                            help="spell files or directories of them to run in batch, writing a JSON line per spell")
+    arg_parser.add_argument("--shared", action="store_true", help="run batch spells on one shared executor")
+    arg_parser.add_argument("-o", "--output", help="file to write batch results to instead of stdout")
+    arg_parser.add_argument("--cache", help="file to keep compiled batch spells in between runs")
+    arg_parser.add_argument("--optimize", action="store_true", help="run the peephole optimizer over each line")
+    arg_parser.add_argument("--stats", action="store_true", help="print optimizer statistics after each line")
+    arg_parser.add_argument("--memo", action="store_true", help="cache the results of evals of pure spells")
+    arg_parser.add_argument("--memory-budget", type=float, help="MiB of memory each spell may hold at once")
+    arg_parser.add_argument("--profile", action="store_true", help="print per-operator timings after each line")
+    args = arg_parser.parse_args()
+    if args.paths:
+        run_batch(args)
+        return
+
+    executor = new_executor(args)
+    optimizer = Optimizer()
     while True:
         instructions = input()
         try:
             lexer = Lexer(instructions)
             parsed = Parser(lexer).process_all_tokens()
-            executor.execute_instructions(parsed)
+            # A line that starts out escaped, which the optimizer can't see, is run as written
+            if args.optimize and not executor.escaping():
+                parsed = optimizer.run(parsed)
+            if args.profile:
+                executor.profiler = Profiler()
+            executor.execute_instructions(Compiler.compile(parsed))
         except Exception as e:
             print("Exception at parsing")
             print("    " + str(e))
             continue
 
+        if args.optimize and args.stats:
+            for name, stats in optimizer.stats.items():
+                print(f"{name} - {stats['rewrites']} rewrites, {stats['removed']} instructions removed")
+
+        if args.profile:
+            for line in executor.profiler.report():
+                print(line)
+
         if executor.temporary is not None:
             print(f"Temp - {executor.temporary}")
-        for i in executor.stack[::-1]:
+        for i in reversed(executor.stack):
             print(f"{i}")
 
 
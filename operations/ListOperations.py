@@ -0,0 +1,120 @@
+from token_types.ListLiteral import ListLiteral
+from token_types.Operator import Operator
+from util.Stack import LAZY_ITEMS
+from values.IotaList import IotaList
+from values.NumericList import make_list
+
+
+def push_list_literal(executor, instruction):
+    executor.stack.append(instruction.value)
+
+
+def index(executor, instruction):
+    index = int(executor.stack.pop())
+    lst = executor.stack.pop()
+    executor.stack.append(lst[index])
+
+
+def sublist(executor, instruction):
+    lower = int(executor.stack.pop())
+    upper = int(executor.stack.pop())
+    lst = executor.stack.pop()
+    executor.stack.append(lst[lower:upper])
+
+
+def append(executor, instruction):
+    app = executor.stack.pop()
+    lst = executor.stack.pop()
+    executor.stack.append(lst.push(app))
+
+
+def extend(executor, instruction):
+    ext = executor.stack.pop()
+    lst = executor.stack.pop()
+    executor.stack.append(lst.concat(ext))
+
+
+def empty_lst(executor, instruction):
+    executor.stack.append(IotaList.EMPTY)
+
+
+def singlet(executor, instruction):
+    item = executor.stack.pop()
+    executor.stack.append(IotaList((item,)))
+
+
+def length(executor, instruction):
+    lst = executor.stack.pop()
+    executor.stack.append(len(lst))
+
+
+def reverse(executor, instruction):
+    lst = executor.stack.pop()
+    executor.stack.append(lst.reverse())
+
+
+def find(executor, instruction):
+    num = executor.stack.pop()
+    lst = executor.stack.pop()
+    executor.stack.append(lst.index(num) if num in lst else -1)
+
+
+def delete_index(executor, instruction):
+    index = int(executor.stack.pop())
+    lst = executor.stack.pop()
+    executor.stack.append(lst[index])
+
+
+def set_index(executor, instruction):
+    # Errors are reported rather than swallowed, as SET_INDEX is declared to always push a list
+    item = executor.stack.pop()
+    index = int(executor.stack.pop())
+    lst = executor.stack.pop()
+    executor.stack.append(lst.set(index, item))
+
+
+def mk_lst(executor, instruction):
+    count = executor.stack.pop()
+    if not count.is_integer():
+        raise ValueError("Argument must be integer")
+    lst = executor.stack.pop_list(int(count))
+    # Long lists keep sharing the stack's structure, and only become arrays once math needs them
+    executor.stack.append(make_list(lst) if len(lst) <= LAZY_ITEMS else lst)
+
+
+def unmk_lst(executor, instruction):
+    lst = executor.stack.pop()
+    executor.stack.push_list(lst)
+
+
+def enqueue(executor, instruction):
+    item = executor.stack.pop()
+    lst = executor.stack.pop()
+    executor.stack.append(lst.push_front(item))
+
+
+def dequeue(executor, instruction):
+    lst = executor.stack.pop()
+    item, lst = lst.pop_front()
+    executor.stack.extend([lst, item])
+
+
+LIST_OPERATIONS = {
+    ListLiteral: push_list_literal,
+
+    Operator.INDEX: index,
+    Operator.SUBLIST: sublist,
+    Operator.APPEND: append,
+    Operator.EXTEND: extend,
+    Operator.EMPTY_LST: empty_lst,
+    Operator.SINGLET: singlet,
+    Operator.LENGTH: length,
+    Operator.REVERSE: reverse,
+    Operator.FIND: find,
+    Operator.DELETE_INDEX: delete_index,
+    Operator.SET_INDEX: set_index,
+    Operator.MK_LST: mk_lst,
+    Operator.UNMK_LST: unmk_lst,
+    Operator.ENQUEUE: enqueue,
+    Operator.DEQUEUE: dequeue,
+}
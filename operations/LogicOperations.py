@@ -0,0 +1,76 @@
+import operator
+
+from token_types.Operator import Operator
+
+
+def bool_coerce(executor, instruction):
+    item = executor.stack.pop()
+    if item == 0 or item is None or item == []:
+        executor.stack.append(False)
+    else:
+        executor.stack.append(True)
+
+
+def bool_to_num(executor, instruction):
+    item = executor.stack.pop()
+    # Prevents truthy things from qualifying
+    if not isinstance(item, bool):
+        raise ValueError("value must be boolean")
+    if item:
+        executor.stack.append(1)
+    else:
+        executor.stack.append(0)
+
+
+def logical_not(executor, instruction):
+    item = executor.stack.pop()
+    if not isinstance(item, bool):
+        raise ValueError("value must be boolean")
+    executor.stack.append(not item)
+
+
+def boolean(func):
+    def apply(executor, instruction):
+        a = executor.stack.pop()
+        b = executor.stack.pop()
+        if not (isinstance(a, bool) and isinstance(b, bool)):
+            raise ValueError("values must be boolean")
+        executor.stack.append(func(a, b))
+
+    return apply
+
+
+def conditional_remove(executor, instruction):
+    a = executor.stack.pop()
+    if not isinstance(a, bool):
+        raise ValueError("value must be boolean")
+    if a:
+        executor.stack.pop(-2)
+    else:
+        executor.stack.pop()
+
+
+def comparison(func):
+    def apply(executor, instruction):
+        a = executor.stack.pop()
+        b = executor.stack.pop()
+        executor.stack.append(func(a, b))
+
+    return apply
+
+
+LOGIC_OPERATIONS = {
+    Operator.BOOL_COERCE: bool_coerce,
+    Operator.BOOL_TO_NUM: bool_to_num,
+    Operator.NOT: logical_not,
+    Operator.OR: boolean(lambda a, b: a or b),
+    Operator.AND: boolean(lambda a, b: a and b),
+    Operator.XOR: boolean(operator.xor),
+    Operator.CONDITIONAL_REMOVE: conditional_remove,
+    Operator.EQ: comparison(operator.eq),
+    Operator.NOT_EQ: comparison(operator.ne),
+    Operator.GT: comparison(operator.gt),
+    Operator.LT: comparison(operator.lt),
+    Operator.GE: comparison(operator.ge),
+    Operator.LE: comparison(operator.le),
+}
@@ -0,0 +1,184 @@
+import math
+import random
+
+import numpy as np
+
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.VectorLiteral import VectorLiteral
+from values.IotaList import IotaList
+from values.NumericList import LOG, elementwise, map_numbers
+from values.Vec3 import Vec3
+
+
+def push_literal(executor, instruction):
+    executor.stack.append(instruction.value)
+
+
+# Simple math
+def add(executor, instruction):
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    executor.stack.append(a + b)
+
+
+def sub(executor, instruction):
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    executor.stack.append(b - a)
+
+
+def mul(executor, instruction):
+    # Dot product for two vectors
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    executor.stack.append(b * a)
+
+
+def div(executor, instruction):
+    # Cross product for two vectors
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    executor.stack.append(b / a)
+
+
+def mag(executor, instruction):
+    a = executor.stack.pop()
+    executor.stack.append(abs(a))
+
+
+def pwr(executor, instruction):
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    if type(a) is Vec3 and type(b) is Vec3:
+        # Projects the top vector onto the second
+        executor.stack.append(a.project(b))
+    else:
+        executor.stack.append(b ** a)
+
+
+def flr(executor, instruction):
+    a = executor.stack.pop()
+    executor.stack.append(math.floor(a))
+
+
+def ceil(executor, instruction):
+    a = executor.stack.pop()
+    executor.stack.append(math.ceil(a))
+
+
+def vctr_mk(executor, instruction):
+    x = executor.stack.pop()
+    y = executor.stack.pop()
+    z = executor.stack.pop()
+    executor.stack.append(Vec3(z, y, x))
+
+
+def vctr_unmk(executor, instruction):
+    a = executor.stack.pop()
+    executor.stack.extend([a[0], a[1], a[2]])
+
+
+def mod(executor, instruction):
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    executor.stack.append(b % a)
+
+
+def axis(executor, instruction):
+    a = executor.stack.pop()
+    if type(a) is Vec3:
+        executor.stack.append(a.axis())
+    else:
+        if a == 0:
+            executor.stack.append(0)
+        else:
+            executor.stack.append(-1 if a < 0 else 1)
+
+
+def rand(executor, instruction):
+    executor.stack.append(random.random())
+
+
+# Constants
+def constant(value):
+    def push_constant(executor, instruction):
+        executor.stack.append(value)
+
+    return push_constant
+
+
+# Advanced math
+def unary(func, array_func=None):
+    # Lists of numbers have array_func applied to every item
+    def apply(executor, instruction):
+        a = executor.stack.pop()
+        if array_func is not None and isinstance(a, IotaList):
+            executor.stack.append(map_numbers(array_func, a))
+        else:
+            executor.stack.append(func(a))
+
+    return apply
+
+
+def arctan2(executor, instruction):
+    a = executor.stack.pop()
+    b = executor.stack.pop()
+    executor.stack.append(math.atan2(a, b))
+
+
+def log(executor, instruction):
+    log = executor.stack.pop()
+    base = executor.stack.pop()
+    if isinstance(log, IotaList) or isinstance(base, IotaList):
+        result = elementwise(LOG, log, base)
+        if result is NotImplemented:
+            raise TypeError("logarithms need numbers or lists of numbers")
+        executor.stack.append(result)
+    else:
+        executor.stack.append(math.log(log, base))
+
+
+MATH_OPERATIONS = {
+    NumberLiteral: push_literal,
+    VectorLiteral: push_literal,
+
+    Operator.ADD: add,
+    Operator.SUB: sub,
+    Operator.MUL: mul,
+    Operator.DIV: div,
+    Operator.MAG: mag,
+    Operator.PWR: pwr,
+    Operator.FLR: flr,
+    Operator.CEIL: ceil,
+    Operator.VCTR_MK: vctr_mk,
+    Operator.VCTR_UNMK: vctr_unmk,
+    Operator.MOD: mod,
+    Operator.AXIS: axis,
+    Operator.RANDOM: rand,
+
+    Operator.SIN: unary(math.sin, np.sin),
+    Operator.COS: unary(math.cos, np.cos),
+    Operator.TAN: unary(math.tan, np.tan),
+    Operator.ARCSIN: unary(math.asin, np.arcsin),
+    Operator.ARCCOS: unary(math.acos, np.arccos),
+    Operator.ARCTAN: unary(math.atan, np.arctan),
+    Operator.ARCTAN2: arctan2,
+    Operator.LOG: log,
+}
+
+CONSTANT_OPERATIONS = {
+    Operator.TRUE: constant(True),
+    Operator.FALSE: constant(False),
+    Operator.NULL: constant(None),
+    Operator.ZERO_VEC: constant(Vec3.ZERO),
+    Operator.VEC_X_PLUS: constant(Vec3.X_PLUS),
+    Operator.VEC_X_MINUS: constant(Vec3.X_MINUS),
+    Operator.VEC_Y_PLUS: constant(Vec3.Y_PLUS),
+    Operator.VEC_Y_MINUS: constant(Vec3.Y_MINUS),
+    Operator.VEC_Z_PLUS: constant(Vec3.Z_PLUS),
+    Operator.VEC_Z_MINUS: constant(Vec3.Z_MINUS),
+    Operator.TAU: constant(math.tau),
+    Operator.PI: constant(math.pi),
+    Operator.E: constant(math.e),
+}
@@ -0,0 +1,114 @@
+from token_types.EscapeMode import EscapeMode
+from token_types.ExecutionMode import ExecutionMode
+from token_types.Operator import Operator
+from util.Frames import EvalFrame, ListEvalFrame
+from util.InputParser import InputParser
+from util.MemoryBudget import charge
+from values.IotaList import IotaList
+
+
+# Operator manip
+def escape(executor, instruction):
+    executor.escape_mode = EscapeMode.ESCAPE_NEXT
+
+
+def start_escape_seq(executor, instruction):
+    executor.execution_mode = ExecutionMode.ESCAPE_MANY
+
+
+def end_escape_seq(executor, instruction):
+    # This can only happen if end escape seq was processed before
+    # start escape seq, and as such, is an error
+    raise RuntimeError(')" executed before "("')
+
+
+# Storage
+def print_top(executor, instruction):
+    a = executor.stack.pop()
+    executor.output(f'"{a}"')
+
+
+def store_temp(executor, instruction):
+    a = executor.stack.pop()
+    executor.temporary = a
+
+
+def read_temp(executor, instruction):
+    executor.stack.append(executor.temporary)
+
+
+# Meta eval
+# These return the frame for the executor to run next, rather than running the spell themselves
+def evaluate(executor, instruction):
+    to_execute = executor.stack.pop()
+    if isinstance(to_execute, IotaList):
+        # Only lazily repeated items are new once the spell is copied out of the list
+        charge(len(to_execute) - to_execute.stored_size())
+    if executor.eval_cache is not None:
+        if isinstance(to_execute, IotaList):
+            return executor.eval_cache.evaluate(executor, to_execute)
+        executor.eval_cache.check(to_execute if isinstance(to_execute, list) else [to_execute])
+    if isinstance(to_execute, IotaList):
+        to_execute = tuple(to_execute)
+    elif not isinstance(to_execute, list):
+        to_execute = [to_execute]
+    return EvalFrame(to_execute)
+
+
+def list_evaluate(executor, instruction):
+    items = executor.stack.pop()
+    instructions = executor.stack.pop()
+    if executor.eval_cache is not None:
+        executor.eval_cache.check(instructions)
+    if executor.can_map_in_parallel(instructions, items):
+        executor.stack.append(executor.map_in_parallel(instructions, items))
+        return
+    # The items are copied, and most bodies leave a result for each, so they are charged up
+    # front. The spell was already counted on the stack
+    charge(len(items))
+    items = tuple(items)
+    if not items:
+        executor.stack.append(IotaList())
+        return
+    return ListEvalFrame(tuple(instructions), items)
+
+
+def halt(executor, instruction):
+    executor.execution_mode = ExecutionMode.STOP
+    return True
+
+
+# Convenience
+def clear(executor, instruction):
+    executor.stack.clear()
+    executor.temporary = None
+
+
+def read_input(executor, instruction):
+    a = executor.input("Input: ")
+    executor.stack.append(InputParser.parse_input(a))
+
+
+def end_of_file(executor, instruction):
+    if instruction != "EOF":
+        raise RuntimeError(f"\"{instruction}\" is an invalid operator")
+
+
+META_OPERATIONS = {
+    str: end_of_file,
+
+    Operator.ESCAPE: escape,
+    Operator.START_ESCAPE_SEQ: start_escape_seq,
+    Operator.END_ESCAPE_SEQ: end_escape_seq,
+    Operator.EVAL: evaluate,
+    Operator.LIST_EVAL: list_evaluate,
+    Operator.HALT: halt,
+}
+
+STORAGE_OPERATIONS = {
+    Operator.PRINT: print_top,
+    Operator.STORE_TEMP: store_temp,
+    Operator.READ_TEMP: read_temp,
+    Operator.CLEAR: clear,
+    Operator.INPUT: read_input,
+}
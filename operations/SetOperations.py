@@ -0,0 +1,104 @@
+import operator
+
+import numpy as np
+
+from token_types.Operator import Operator
+from values.IotaList import IotaList
+from values.NumericList import NumericList
+
+
+# List versions of the set operators. ``first`` is the list lower on the stack, and results
+# keep items in the order they first appear in it, then in ``second``
+def unify_lists(first, second):
+    members = dict(first.distinct())
+    members.update(second.distinct())
+    return IotaList(members)
+
+
+def intersect_lists(first, second):
+    members = second.distinct()
+    return IotaList(item for item in first.distinct() if item in members)
+
+
+def disjunct_lists(first, second):
+    first_members = first.distinct()
+    second_members = second.distinct()
+    return IotaList([item for item in first_members if item not in second_members]
+                    + [item for item in second_members if item not in first_members])
+
+
+def unique_numbers(array):
+    _, indices = np.unique(array, return_index=True, equal_nan=False)
+    return array[np.sort(indices)]
+
+
+# The same operators over lists of numbers, done with NumPy. Vector lists use the generic
+# versions, as NumPy compares rows by their bytes, which tells 0.0 and -0.0 apart
+def unify_numbers(first, second):
+    first, second = unique_numbers(first), unique_numbers(second)
+    return np.concatenate([first, second[~np.isin(second, first)]])
+
+
+def intersect_numbers(first, second):
+    first = unique_numbers(first)
+    return first[np.isin(first, second)]
+
+
+def disjunct_numbers(first, second):
+    first, second = unique_numbers(first), unique_numbers(second)
+    return np.concatenate([first[~np.isin(first, second)], second[~np.isin(second, first)]])
+
+
+def is_number_list(value):
+    return isinstance(value, NumericList) and not value.is_vectors
+
+
+def set_operation(func, list_func, numbers_func):
+    def apply(executor, instruction):
+        a = executor.stack.pop()
+        b = executor.stack.pop()
+
+        if isinstance(a, float) and isinstance(b, float):
+            if not (a.is_integer() and b.is_integer()):
+                raise ValueError("Arguments must be integers, not floats")
+            executor.stack.append(func(int(a), int(b)))
+        elif is_number_list(a) and is_number_list(b):
+            executor.stack.append(NumericList.wrap(numbers_func(b.array, a.array)))
+        elif isinstance(a, IotaList) and isinstance(b, IotaList):
+            executor.stack.append(list_func(b, a))
+        else:
+            raise ValueError("Arguments must either both be sets or both be integers")
+
+    return apply
+
+
+def invert(executor, instruction):
+    a = executor.stack.pop()
+
+    if isinstance(a, float):
+        if not a.is_integer():
+            raise ValueError("Argument must be integer, not float")
+        a = int(a)
+        executor.stack.append(~a)
+    else:
+        raise ValueError("Argument must be integer")
+
+
+def unique(executor, instruction):
+    a = executor.stack.pop()
+
+    if is_number_list(a):
+        executor.stack.append(NumericList.wrap(unique_numbers(a.array)))
+    elif isinstance(a, IotaList):
+        executor.stack.append(IotaList(a.distinct()))
+    else:
+        raise ValueError("Argument must be list")
+
+
+SET_OPERATIONS = {
+    Operator.UNIFY: set_operation(operator.or_, unify_lists, unify_numbers),
+    Operator.INTERSECT: set_operation(operator.and_, intersect_lists, intersect_numbers),
+    Operator.DISJUNCT: set_operation(operator.xor, disjunct_lists, disjunct_numbers),
+    Operator.INVERT: invert,
+    Operator.UNIQUE: unique,
+}
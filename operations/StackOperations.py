@@ -0,0 +1,140 @@
+from token_types.DropKeep import DropKeep
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from util.LehrerDecoder import decode_suffix
+
+
+# Shuffles read their deepest item before popping any, so a stack that is too shallow is
+# reported and left as it was
+def swap(executor, instruction):
+    stack = executor.stack
+    b = stack[-2]
+    a = stack.pop()
+    stack.pop()
+    stack.extend([a, b])
+
+
+def rotate_left(executor, instruction):
+    stack = executor.stack
+    c = stack[-3]
+    a = stack.pop()
+    b = stack.pop()
+    stack.pop()
+    stack.extend([b, a, c])
+
+
+def rotate_right(executor, instruction):
+    stack = executor.stack
+    c = stack[-3]
+    a = stack.pop()
+    b = stack.pop()
+    stack.pop()
+    stack.extend([a, c, b])
+
+
+def dup(executor, instruction):
+    executor.stack.append(executor.stack[-1])
+
+
+def dup_second(executor, instruction):
+    executor.stack.append(executor.stack[-2])
+
+
+def dup_top_down(executor, instruction):
+    stack = executor.stack
+    b = stack[-2]
+    a = stack.pop()
+    stack.pop()
+    stack.extend([a, b, a])
+
+
+def dup_n(executor, instruction):
+    times = executor.stack.pop()
+    element = executor.stack.pop()
+    if not times.is_integer():
+        raise ValueError("argument must be integer")
+    executor.stack.repeat(element, int(times))
+
+
+def dup_2(executor, instruction):
+    stack = executor.stack
+    stack.extend([stack[-2], stack[-1]])
+
+
+def stack_len(executor, instruction):
+    executor.stack.append(len(executor.stack))
+
+
+def yank_n(executor, instruction):
+    stack = executor.stack
+    last_index = int(stack.pop())
+    if last_index >= 0:
+        stack.append(stack.pop(-1 * (last_index + 1)))
+    else:
+        stack.insert(last_index, stack.pop())
+
+
+def copy_n(executor, instruction):
+    stack = executor.stack
+    last_index = int(stack.pop())
+    if last_index >= 0:
+        stack.append(stack[-1 * (last_index + 1)])
+    else:
+        stack.insert(last_index, stack[-1])
+
+
+def pop_top(stack, count):
+    """Pop the top count items, returned in stack order."""
+    top = [stack.pop() for _ in range(count)]
+    top.reverse()
+    return top
+
+
+def lehmer_permute(executor, instruction):
+    stack = executor.stack
+    code = stack.pop()
+    # Only the part of the stack the code actually moves is touched
+    permutation = decode_suffix(len(stack), code)
+    end_part = pop_top(stack, len(permutation))
+    stack.extend([end_part[i] for i in permutation])
+
+
+def drop_keep(executor, instruction):
+    stack = executor.stack
+    drop_order = instruction.drop_order
+    if len(drop_order) > len(stack):
+        raise RuntimeError("stack too small for dropkeep")
+
+    # drop_order starts at the top of the stack
+    top = pop_top(stack, len(drop_order))
+    stack.extend(item for item, drop in zip(top, reversed(drop_order)) if not drop)
+
+
+def stack_permutation(executor, instruction):
+    stack = executor.stack
+    if instruction.depth > len(stack):
+        # Run the original shuffles, so underflows are reported the same way
+        return executor.execute_instructions(instruction.instructions)
+    if instruction.is_identity:
+        return
+    top = pop_top(stack, instruction.depth)
+    stack.extend([top[i] for i in instruction.order])
+
+
+STACK_OPERATIONS = {
+    DropKeep: drop_keep,
+    StackPermutation: stack_permutation,
+
+    Operator.SWAP: swap,
+    Operator.ROTATE_LFT: rotate_left,
+    Operator.ROTATE_RIGHT: rotate_right,
+    Operator.DUP: dup,
+    Operator.DUP_SECOND: dup_second,
+    Operator.DUP_TOP_DOWN: dup_top_down,
+    Operator.DUP_N: dup_n,
+    Operator.DUP_2: dup_2,
+    Operator.STACK_LEN: stack_len,
+    Operator.YANK_N: yank_n,
+    Operator.COPY_N: copy_n,
+    Operator.LEHMER_PERMUTE: lehmer_permute,
+}
@@ -7,15 +7,20 @@ class DropKeep:
         if match is None:
             raise ValueError(f"{value} is not valid drop_keep syntax")
         self.value = value
+        self.drop_order = self.decode_drop_order(value)
 
-    def get_drop_order(self):
-        drop_keep = self.value.replace("dk_", "")
+    @staticmethod
+    def decode_drop_order(value):
+        drop_keep = value.replace("dk_", "")
         drop_keep = [True if i == "d" else False for i in drop_keep]
         # Makes a dropkeep of all drop_keeps act as nop
         if not any(drop_keep):
             return []
         return drop_keep
 
+    def get_drop_order(self):
+        return list(self.drop_order)
+
     def __str__(self):
         return f"DropKeep.{self.value}"
 
@@ -0,0 +1,7 @@
+from token_types.NumberLiteral import NumberLiteral
+
+
+class ListLiteral(NumberLiteral):
+    def __init__(self, lst):
+        super().__init__(0)
+        self.value = lst
@@ -0,0 +1,20 @@
+class StackPermutation:
+    """A run of stack shuffles fused into a single step.
+
+    Running it pops the top ``depth`` items and pushes ``order``, which lists indices into
+    those items (in stack order), so items can be moved, duplicated or dropped at once.
+    ``instructions`` keeps the shuffles it replaced. An identity permutation leaves the
+    stack as it is and only checks that the stack is deep enough.
+    """
+
+    def __init__(self, depth, order, instructions):
+        self.depth = depth
+        self.order = tuple(order)
+        self.instructions = list(instructions)
+        self.is_identity = self.order == tuple(range(depth))
+
+    def __str__(self):
+        return "StackPermutation(" + ", ".join(str(instruction) for instruction in self.instructions) + ")"
+
+    def __repr__(self):
+        return f"<{self.__str__()}>"
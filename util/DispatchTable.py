@@ -0,0 +1,50 @@
+class DispatchTable:
+    """Maps instructions straight to their handlers.
+
+    Operator members are looked up by value, while token types such as NumberLiteral
+    and DropKeep are looked up by their class. Handlers take the executor and the
+    instruction, and return True if execution should stop.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.type_handlers = {}
+        self.categories = {}
+        self.opcode_keys = None
+        self.opcode_handlers = None
+
+    def register(self, category, key, handler):
+        self.opcode_keys = None
+        if isinstance(key, type):
+            self.type_handlers[key] = handler
+        else:
+            self.handlers[key] = handler
+        self.categories.setdefault(category, []).append(key)
+
+    def register_category(self, category, handlers):
+        for key, handler in handlers.items():
+            self.register(category, key, handler)
+
+    def lookup(self, instruction):
+        handler = self.type_handlers.get(type(instruction))
+        if handler is not None:
+            return handler
+        try:
+            return self.handlers.get(instruction)
+        except TypeError:
+            # Unhashable values (such as lists) are never valid instructions
+            return None
+
+    def handlers_for(self, keys):
+        """Return the handlers for a sequence of opcode keys, indexed by opcode."""
+        if self.opcode_keys is not keys:
+            self.opcode_handlers = [self.type_handlers.get(key) if isinstance(key, type) else self.handlers.get(key)
+                                    for key in keys]
+            self.opcode_keys = keys
+        return self.opcode_handlers
+
+    def category_of(self, key):
+        for category, keys in self.categories.items():
+            if key in keys:
+                return category
+        return None
@@ -0,0 +1,46 @@
+from token_types.Operator import Operator
+
+
+def walk_escapes(instructions):
+    """Yield each instruction along with whether it is escaped, meaning it is pushed rather than run.
+
+    Escape operators themselves count as escaped, so escaped code is never rewritten.
+    """
+    escape_next = False
+    escape_many = False
+    for instruction in instructions:
+        if escape_next:
+            escape_next = False
+            yield True, instruction
+        elif instruction == Operator.ESCAPE:
+            escape_next = True
+            yield True, instruction
+        elif escape_many:
+            if instruction == Operator.END_ESCAPE_SEQ:
+                escape_many = False
+            yield True, instruction
+        elif instruction == Operator.START_ESCAPE_SEQ:
+            escape_many = True
+            yield True, instruction
+        else:
+            yield False, instruction
+
+
+def read_escape_seq(instructions, start):
+    """Collect the escape sequence opened at ``start`` the same way the executor does.
+
+    Returns the escaped items and the index of the closing operator, or None for the index
+    if the sequence is never closed.
+    """
+    items = []
+    end = start + 1
+    while end < len(instructions) and instructions[end] != Operator.END_ESCAPE_SEQ:
+        if instructions[end] == Operator.ESCAPE:
+            end += 1
+            if end == len(instructions):
+                break
+        items.append(instructions[end])
+        end += 1
+    if end >= len(instructions):
+        return items, None
+    return items, end
@@ -0,0 +1,238 @@
+import itertools
+from collections import OrderedDict
+
+from token_types.Operator import Operator
+from util.FrameStack import FrameStack
+from util.Frames import EvalFrame
+from util.Purity import SIDE_EFFECT_OPERATORS, uses_any
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+# Spells using any of these are never cached: their result depends on more than the
+# stack items they read, or running them does more than change the stack. Lehmer codes
+# and out of range yank and cpyank indices are read against the whole stack's depth
+IMPURE_OPERATORS = SIDE_EFFECT_OPERATORS | {
+    Operator.HALT,
+    Operator.STACK_LEN,
+    Operator.LEHMER_PERMUTE,
+    Operator.YANK_N,
+    Operator.COPY_N,
+}
+# Most stack items a cached spell may read or leave, so each entry stays small
+MAX_MEMO_ITEMS = 64
+# Read depths remembered per spell, tried in turn when looking a call up
+MAX_READ_DEPTHS = 4
+
+
+def input_key(value):
+    """Return a key for a stack item that tells apart values that compare equal but behave differently."""
+    if isinstance(value, float):
+        # Keeps 0.0 and -0.0 apart, and floats apart from booleans
+        return value.hex()
+    if isinstance(value, Vec3):
+        return (Vec3,) + tuple(component.hex() for component in value)
+    if isinstance(value, IotaList):
+        # Keyed item by item, as lists compare their items with ==
+        if len(value) > MAX_MEMO_ITEMS:
+            raise TypeError("list too long to key")
+        return (IotaList,) + tuple(map(input_key, value))
+    return (type(value), value)
+
+
+def body_key(body):
+    """Return a key for a spell that is keyed item by item like a list input, however long it is."""
+    return (IotaList,) + tuple(map(input_key, body))
+
+
+class TrackingFrameStack(FrameStack):
+    """A FrameStack that records the lowest base item the frame has read."""
+
+    def __init__(self, base):
+        super().__init__(base)
+        self.start_depth = self.base_depth
+        self.lowest_read = self.base_depth
+
+    def __iter__(self):
+        self.lowest_read = 0
+        return super().__iter__()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self.absolute_index(index)
+        if index < self.base_depth:
+            if index < self.lowest_read:
+                self.lowest_read = index
+            return self.base[index]
+        return self.items[index - self.base_depth]
+
+    def read_depth(self):
+        """Return how many of the items the frame started with it has read or removed."""
+        return self.start_depth - min(self.lowest_read, self.base_depth)
+
+
+class MemoEvalFrame(EvalFrame):
+    """An eval of a pure spell whose effect on the stack is stored in the cache once it is done.
+
+    The spell runs on a TrackingFrameStack, so the frame knows how many stack items it
+    read and which items it left, and commits them to the stack below when it exits.
+    """
+    __slots__ = ("spell", "cache", "taints", "base")
+
+    def __init__(self, instructions, spell, cache):
+        super().__init__(instructions)
+        # The spell's number in the cache, which its entries are stored under
+        self.spell = spell
+        self.cache = cache
+        self.taints = None
+        self.base = None
+
+    def enter(self, executor):
+        super().enter(executor)
+        self.taints = self.cache.taints
+        self.base = executor.stack
+        executor.stack = TrackingFrameStack(self.base)
+
+    def exit(self, executor, halted):
+        stack = executor.stack
+        read_depth = stack.read_depth()
+        if not halted and self.cache.taints == self.taints:
+            self.cache.store(self.spell, self.base[len(self.base) - read_depth:] if read_depth else (),
+                             stack.start_depth - stack.base_depth, stack.items)
+        for _ in range(stack.start_depth - stack.base_depth):
+            self.base.pop()
+        self.base.extend(stack.items)
+        executor.stack = self.base
+        return super().exit(executor, halted)
+
+
+class EvalCache:
+    """Remembers what evals of pure spells did to the stack, so repeated calls are looked up.
+
+    Entries are keyed by the spell and the stack items it read, and hold how many items it
+    popped and what it pushed. Anything that could make a result depend on more than that,
+    like an error report or a nested eval of an impure spell, taints the evals running at
+    the time, which then aren't stored. The least recently used entries are evicted once
+    there are more than ``max_entries``.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Stack depths each spell has been seen to read, most recent first
+        self.read_depths = {}
+        self.purity = {}
+        # A number for each distinct spell by its body_key, which stands in for it in the other
+        # tables, so looking a spell up doesn't hash it again. Numbers are never reused
+        self.spells = {}
+        self.spell_numbers = itertools.count()
+        # Each spell list's number by id, along with the list, which keeps the id from being reused
+        self.spell_ids = {}
+        # Bumped whenever something happens that a cached result couldn't reproduce
+        self.taints = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self.entries),
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.read_depths.clear()
+        self.purity.clear()
+        self.spells.clear()
+        self.spell_ids.clear()
+
+    def spell_id(self, body):
+        """Return the number of the spell in the list, which is the same for lists that only differ in identity."""
+        known = self.spell_ids.get(id(body))
+        if known is not None and known[0] is body:
+            return known[1]
+        key = body_key(body)
+        spell = self.spells.get(key)
+        if spell is None:
+            if len(self.spells) >= self.max_entries:
+                self.clear()
+            spell = self.spells[key] = next(self.spell_numbers)
+        if len(self.spell_ids) >= self.max_entries:
+            self.spell_ids.clear()
+        self.spell_ids[id(body)] = (body, spell)
+        return spell
+
+    def is_pure(self, body, spell):
+        pure = self.purity.get(spell)
+        if pure is None:
+            if len(self.purity) >= self.max_entries:
+                self.purity.clear()
+            pure = self.purity[spell] = not uses_any(body, IMPURE_OPERATORS)
+        return pure
+
+    def check(self, instructions):
+        """Taint the running evals if the instructions, run by something other than eval, are impure."""
+        if not isinstance(instructions, (list, IotaList)) or uses_any(instructions, IMPURE_OPERATORS):
+            self.taints += 1
+
+    def evaluate(self, executor, body):
+        """Run eval on a list, from the cache if the same call was seen before."""
+        # Spells are told apart by type as well as value, so ones that compare equal but push
+        # different items don't share entries
+        try:
+            spell = self.spell_id(body)
+            pure = self.is_pure(body, spell)
+        except TypeError:
+            pure = False
+        if not pure:
+            self.taints += 1
+            return EvalFrame(tuple(body))
+
+        stack = executor.stack
+        length = len(stack)
+        for depth in self.read_depths.get(spell, ()):
+            if depth > length:
+                continue
+            try:
+                key = (spell, tuple(map(input_key, stack[length - depth:] if depth else ())))
+                entry = self.entries.get(key)
+            except TypeError:
+                break
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                popped, pushed = entry
+                for _ in range(popped):
+                    stack.pop()
+                stack.extend(pushed)
+                return None
+        self.misses += 1
+        return MemoEvalFrame(tuple(body), spell, self)
+
+    def store(self, spell, inputs, popped, pushed):
+        if len(inputs) > MAX_MEMO_ITEMS or len(pushed) > MAX_MEMO_ITEMS:
+            return
+        try:
+            key = (spell, tuple(map(input_key, inputs)))
+            self.entries[key] = (popped, tuple(pushed))
+        except TypeError:
+            return
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+        depths = self.read_depths.get(spell, ())
+        if len(inputs) not in depths:
+            if len(self.read_depths) >= self.max_entries:
+                self.read_depths.clear()
+            self.read_depths[spell] = (len(inputs),) + depths[:MAX_READ_DEPTHS - 1]
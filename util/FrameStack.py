@@ -0,0 +1,112 @@
+import itertools
+
+from util.MemoryBudget import charge
+from values.IotaList import IotaList, stored_items
+
+
+class FrameStack:
+    """A stack that sits on top of another stack without copying it.
+
+    The first ``base_depth`` items of ``base`` are visible through the frame but never
+    modified. Pushes go to ``items``. Popping below the base just lowers ``base_depth``,
+    and writing below it first copies the affected base items up into ``items``, so the
+    base stack is left untouched either way. At any point ``items`` holds everything
+    above the lowest point the frame has changed.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.base_depth = len(base)
+        self.items = []
+
+    def __len__(self):
+        return self.base_depth + len(self.items)
+
+    def __iter__(self):
+        return itertools.chain(itertools.islice(self.base, self.base_depth), self.items)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def lower_base(self, depth):
+        """Copy the base items from ``depth`` upwards into the frame's own items."""
+        if depth < self.base_depth:
+            charge(self.base_depth - depth)
+            self.items[:0] = [self.base[i] for i in range(depth, self.base_depth)]
+            self.base_depth = depth
+
+    def absolute_index(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("stack index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self.absolute_index(index)
+        if index < self.base_depth:
+            return self.base[index]
+        return self.items[index - self.base_depth]
+
+    def __setitem__(self, index, value):
+        index = self.absolute_index(index)
+        self.lower_base(index)
+        self.items[index - self.base_depth] = value
+
+    def append(self, value):
+        self.items.append(value)
+
+    def extend(self, values):
+        self.items.extend(values)
+
+    def repeat(self, value, count):
+        """Push ``count`` copies of the value."""
+        if count > 0:
+            charge(count)
+            self.extend([value] * count)
+
+    def push_list(self, lst):
+        charge(len(lst))
+        self.extend(lst)
+
+    def pop_list(self, count):
+        """Pop the top ``count`` items as an IotaList in stack order."""
+        if count > len(self):
+            raise IndexError("pop from empty list")
+        items = [self.pop() for _ in range(count)]
+        items.reverse()
+        return IotaList(items)
+
+    def stored_size(self):
+        return len(self)
+
+    def live_size(self):
+        # The whole base counts, as the frame can't tell what else still holds it
+        return self.base.live_size() + sum(map(stored_items, self.items))
+
+    def pop(self, index=-1):
+        if index == -1 and self.items:
+            return self.items.pop()
+        if index == -1 and self.base_depth > 0:
+            self.base_depth -= 1
+            return self.base[self.base_depth]
+        if not len(self):
+            raise IndexError("pop from empty list")
+        index = self.absolute_index(index)
+        self.lower_base(index)
+        return self.items.pop(index - self.base_depth)
+
+    def insert(self, index, value):
+        length = len(self)
+        if index < 0:
+            index = max(index + length, 0)
+        index = min(index, length)
+        self.lower_base(index)
+        self.items.insert(index - self.base_depth, value)
+
+    def clear(self):
+        self.base_depth = 0
+        self.items.clear()
@@ -0,0 +1,121 @@
+import operator
+
+from token_types.EscapeMode import EscapeMode
+from token_types.ExecutionMode import ExecutionMode
+from token_types.Operator import Operator
+from util.FrameStack import FrameStack
+from util.MemoryBudget import hold
+from values.NumericList import make_list
+
+
+class Frame:
+    """A spell on the executor's frame stack, and how far it has got.
+
+    ``handlers``, when given, has the handler for each instruction, as compiled spells
+    know them ahead of time. The executor runs the instruction at each of ``positions``
+    in turn. Once they run out or the spell halts, it asks the frame to restart, and
+    lets it exit if it doesn't. This base frame is the spell the executor was handed.
+    """
+    __slots__ = ("instructions", "handlers", "positions")
+
+    def __init__(self, instructions, handlers=None, start=0):
+        self.instructions = instructions
+        self.handlers = handlers
+        self.positions = iter(range(start, len(instructions)))
+
+    def is_finished(self):
+        return operator.length_hint(self.positions) == 0
+
+    def enter(self, executor):
+        pass
+
+    def restart(self, executor):
+        """Set the frame up to run its spell again, returning False if it is done."""
+        return False
+
+    def exit(self, executor, halted):
+        """Clean up once the frame is done, returning whether the frame below it halts too."""
+        executor.execution_mode = ExecutionMode.NORMAL
+        return halted
+
+
+class EvalFrame(Frame):
+    """A spell run by eval. It shares the stack, but any escapes it leaves open and any
+    changes to the temporary are dropped once it is done. Halting halts the frame below."""
+    __slots__ = ("temporary", "escaped_many")
+
+    def __init__(self, instructions):
+        super().__init__(instructions)
+        self.temporary = None
+        self.escaped_many = None
+
+    def enter(self, executor):
+        self.temporary = executor.temporary
+        self.escaped_many = executor.escaped_many
+        executor.escaped_many = []
+        executor.frame_depth += 1
+
+    def replace(self, frame, executor):
+        """Take the place of an eval frame that has nothing left to run, as a tail call."""
+        self.temporary = frame.temporary
+        self.escaped_many = frame.escaped_many
+        executor.escaped_many = []
+
+    def exit(self, executor, halted):
+        executor.temporary = self.temporary
+        executor.escaped_many = self.escaped_many
+        executor.escape_mode = EscapeMode.NORMAL
+        executor.execution_mode = ExecutionMode.NORMAL
+        executor.frame_depth -= 1
+        return halted
+
+
+class ListEvalFrame(Frame):
+    """A lst_eval, which runs its spell once per item on a FrameStack over the stack and
+    collects what each run leaves. Halting only ends the run for that item."""
+    __slots__ = ("items", "results", "base", "escaped_many", "held")
+
+    def __init__(self, instructions, items):
+        super().__init__(instructions)
+        # The items and the results they leave are off the stack until the frame is done
+        self.held = len(instructions) + 2 * len(items)
+        self.items = iter(items)
+        self.results = []
+        self.base = None
+        self.escaped_many = None
+
+    def enter(self, executor):
+        self.base = executor.stack
+        self.escaped_many = executor.escaped_many
+        executor.frame_depth += 1
+        hold(self.held)
+        self.start_next(executor)
+
+    def start_next(self, executor):
+        for item in self.items:
+            executor.stack = FrameStack(self.base)
+            executor.stack.append(item)
+            executor.escaped_many = []
+            executor.escape_mode = EscapeMode.NORMAL
+            executor.execution_mode = ExecutionMode.NORMAL
+            self.positions = iter(range(len(self.instructions)))
+            return True
+        return False
+
+    def restart(self, executor):
+        self.results.extend(executor.stack.items)
+        return self.start_next(executor)
+
+    def exit(self, executor, halted):
+        executor.stack = self.base
+        executor.escaped_many = self.escaped_many
+        executor.escape_mode = EscapeMode.NORMAL
+        executor.execution_mode = ExecutionMode.NORMAL
+        executor.frame_depth -= 1
+        hold(-self.held)
+        # The frame is already off the frame stack, so an error building the results is reported here
+        try:
+            executor.stack.append(make_list(self.results))
+        except Exception as e:
+            executor.report_error(Operator.LIST_EVAL, e)
+        return False
@@ -0,0 +1,74 @@
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+# Canonical values kept at once. The table is emptied when it fills up, which only costs
+# sharing between values interned before and after
+MAX_INTERNED = 1 << 16
+# Bigger lists (counting the items of nested lists) are rarely repeated and would pin a
+# lot of memory, so they are left alone
+MAX_INTERNED_ITEMS = 256
+
+
+def is_small(value, limit=MAX_INTERNED_ITEMS):
+    """Return whether the value holds at most ``limit`` items, counting nested lists' items."""
+    pending = [value]
+    while pending:
+        lst = pending.pop()
+        limit -= len(lst)
+        if limit < 0:
+            return False
+        pending.extend(item for item in lst if isinstance(item, IotaList))
+    return True
+
+
+def same_value(a, b):
+    """Return whether two values are equal and behave the same, with floats compared by their bits."""
+    if type(a) is not type(b):
+        return False
+    if type(a) is float:
+        # float.hex keeps 0.0 and -0.0 apart
+        return a.hex() == b.hex()
+    if type(a) is Vec3:
+        return all(x.hex() == y.hex() for x, y in zip(a, b))
+    if isinstance(a, IotaList):
+        return len(a) == len(b) and all(map(same_value, a, b))
+    return a == b
+
+
+class Interner:
+    """Hands out one canonical instance of each distinct small list or vector value.
+
+    Values are looked up by their hash and then compared by structure, with floats
+    compared by their bits, so a value is never swapped for one that behaves differently
+    (such as 0.0 for -0.0). Equal interned values are the same object, so comparing them
+    is an identity check, and each list's hash is worked out once when it is interned, so
+    comparing it with a list whose hash differs is O(1) too.
+    """
+
+    def __init__(self, max_entries=MAX_INTERNED):
+        self.max_entries = max_entries
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, value):
+        if type(value) is not Vec3 and not (isinstance(value, IotaList) and is_small(value)):
+            return value
+        key = (type(value), hash(value))
+        canonical = self.table.get(key)
+        if canonical is not None and same_value(canonical, value):
+            self.hits += 1
+            return canonical
+        self.misses += 1
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        self.table[key] = value
+        return value
+
+
+INTERNER = Interner()
+
+
+def intern(value):
+    """Return the canonical instance of the value from the shared interner."""
+    return INTERNER.intern(value)
@@ -0,0 +1,15 @@
+from util.MemoryBudget import charge
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+
+def to_json(value):
+    """Convert an iota to something json can write."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Vec3):
+        return {"vector": list(value)}
+    if isinstance(value, (list, IotaList)):
+        charge(len(value))
+        return [to_json(item) for item in value]
+    return {"iota": str(value)}
@@ -1,5 +1,9 @@
+import functools
 import math
 
+# Decoded permutations kept around, keyed by their suffix length and code
+DECODE_CACHE_SIZE = 1024
+
 
 def static_var(varname, value):
     def decorate(func):
@@ -48,34 +52,83 @@ def encode(permutation):
     return sum(parial_result(i, permutation) for i in range(0, len(permutation)))
 
 def find_lehmer_length(lehmer):
-    if lehmer == 0:
-        return 1
-    if lehmer == 1:
-        return 2
-    length = 0
-    while lehmer < factorial(length):
+    """Return the length of the shortest permutation the Lehmer code can describe.
+
+    Decoding a code over a longer length leaves everything before the last
+    find_lehmer_length(lehmer) positions in place.
+    """
+    length = 1
+    while lehmer >= factorial(length):
         length += 1
-    return length - 1
+    return length
 
 
 def decode(length, lehmer):
     """Return permutation for the given Lehmer Code and permutation length. Result permutation contains
     number from 0 to length-1.
     """
-    # length = find_lehmer_length(lehmer)
-
-    result = [(lehmer % factorial(length - i)) // factorial(length - 1 - i) for i in range(length)]
-    used = [False] * length
-    for i in range(length):
-        counter = 0
-        for j in range(length):
-            if not used[j]:
-                counter += 1
-            if counter == result[i] + 1:
-                result[i] = j
-                used[j] = True
-                break
-    return result
+    suffix = decode_suffix(length, lehmer)
+    offset = length - len(suffix)
+    return list(range(offset)) + [offset + i for i in suffix]
+
+
+def decode_suffix(length, lehmer):
+    """Return the part of the permutation for the Lehmer code and length that moves anything.
+
+    This is a permutation of the last len(result) positions, which is at most length long
+    and only depends on the code, so permuting a long list only costs time for the part
+    that changes.
+    """
+    if isinstance(lehmer, float):
+        if not lehmer.is_integer():
+            raise ValueError("Lehmer code must be an integer")
+        lehmer = int(lehmer)
+    if lehmer < 0:
+        lehmer %= math.factorial(length)
+
+    suffix_length = 0
+    while suffix_length < length and lehmer >= factorial(suffix_length):
+        suffix_length += 1
+    if suffix_length == length:
+        lehmer %= factorial(length)
+    return decode_permutation(suffix_length, lehmer)
+
+
+@functools.lru_cache(maxsize=DECODE_CACHE_SIZE)
+def decode_permutation(length, lehmer):
+    """Decode a Lehmer code smaller than length! into a tuple, in O(length log length)."""
+    # Digits of the code in the factorial number system, most significant first
+    digits = [0] * length
+    for radix in range(1, length + 1):
+        lehmer, digits[length - radix] = divmod(lehmer, radix)
+
+    # Fenwick tree over the values still unused, so picking the digit-th smallest of
+    # them is a single descent instead of a scan
+    tree = [0] * (length + 1)
+    for i in range(1, length + 1):
+        tree[i] += 1
+        parent = i + (i & -i)
+        if parent <= length:
+            tree[parent] += tree[i]
+    highest_step = 1 << (length.bit_length() - 1) if length else 0
+
+    permutation = []
+    for digit in digits:
+        position = 0
+        remaining = digit + 1
+        step = highest_step
+        while step:
+            candidate = position + step
+            if candidate <= length and tree[candidate] < remaining:
+                position = candidate
+                remaining -= tree[candidate]
+            step >>= 1
+        permutation.append(position)
+        i = position + 1
+        while i <= length:
+            tree[i] -= 1
+            i += i & -i
+    return tuple(permutation)
 
 def lehmer_to_permutation(lehmer_code):
     """Convert Lehmer code to permutation."""
@@ -91,9 +144,10 @@ def lehmer_to_permutation(lehmer_code):
 
 def permute_end_of_list(lst, lehmer_code):
     """Permute the end of a list according to a Lehmer code."""
-    perm_lst = decode(len(lst), lehmer_code)
-    # permutation = lehmer_to_permutation(perm_lst)
+    perm_lst = decode_suffix(len(lst), lehmer_code)
     n = len(perm_lst)
+    if n == 0:
+        return lst
     end_part = lst[-n:]
 
     permuted_end_part = [end_part[i] for i in perm_lst]
@@ -0,0 +1,125 @@
+import re
+
+from errors.HexCastSyntaxError import HexCastSyntaxError
+from values.NumericList import make_list
+from values.Vec3 import Vec3
+
+NUMBER_PATTERN = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+WHITESPACE_PATTERN = re.compile(r"\s*")
+WORD_PATTERN = re.compile(r"[^\s,\[\]()'\"]+")
+# A bracket on its own is a word too, as it names the escape operators
+BRACKET_WORD_PATTERN = re.compile(r"[()](?=[\s,\]]|$)")
+VECTOR_PREFIX_PATTERN = re.compile(r"(?:vector|vec|np\.array)\s*\(")
+LITERAL_START_PATTERN = re.compile(r"[+-]?\.?\d|\[|(?:vector|vec|np\.array)\s*\(")
+
+
+class LiteralParser:
+    """Recursive-descent parser for number, vector and list literals.
+
+    Grammar::
+
+        literal := number | vector | list | string | word
+        number  := [+-] digits [. digits] [e [+-] digits]
+        vector  := ("vec" | "vector" | "np.array") "(" list ")"
+        list    := "[" [literal ("," literal)* [","]] "]"
+        string  := a single or double quoted run of characters
+        word    := any other run of characters, or a "(" or ")" on its own
+
+    Numbers become floats, vectors become Vec3s and lists become IotaLists
+    (NumericLists when they are long and hold only numbers or only vectors).
+    Strings and words are handed to ``resolve_word``, which by default returns them as is.
+    """
+
+    def __init__(self, text, resolve_word=None):
+        self.text = text
+        self.position = 0
+        self.resolve_word = resolve_word if resolve_word is not None else str
+
+    @staticmethod
+    def is_literal(text):
+        return LITERAL_START_PATTERN.match(text) is not None
+
+    @staticmethod
+    def parse(text, resolve_word=None):
+        parser = LiteralParser(text, resolve_word)
+        value = parser.parse_literal()
+        parser.skip_whitespace()
+        if parser.position != len(text):
+            parser.error("unexpected trailing characters")
+        return value
+
+    def error(self, message):
+        raise HexCastSyntaxError(f"\"{self.text}\" is an invalid literal: {message} (character {self.position + 1})")
+
+    def skip_whitespace(self):
+        self.position = WHITESPACE_PATTERN.match(self.text, self.position).end()
+
+    def peek(self):
+        if self.position < len(self.text):
+            return self.text[self.position]
+        return ""
+
+    def expect(self, char):
+        self.skip_whitespace()
+        if self.peek() != char:
+            self.error(f"expected \"{char}\"")
+        self.position += 1
+
+    def parse_literal(self):
+        self.skip_whitespace()
+        char = self.peek()
+        if char == "[":
+            return make_list(self.parse_list())
+        if char in ("'", '"'):
+            return self.parse_string()
+
+        match = VECTOR_PREFIX_PATTERN.match(self.text, self.position)
+        if match is not None:
+            self.position = match.end()
+            return self.parse_vector()
+
+        match = NUMBER_PATTERN.match(self.text, self.position)
+        if match is not None:
+            if WORD_PATTERN.match(self.text, match.end()):
+                self.error("invalid number")
+            self.position = match.end()
+            return float(match.group())
+
+        match = WORD_PATTERN.match(self.text, self.position) or BRACKET_WORD_PATTERN.match(self.text, self.position)
+        if match is None:
+            self.error("expected a literal")
+        self.position = match.end()
+        return self.resolve_word(match.group())
+
+    def parse_list(self):
+        self.expect("[")
+        items = []
+        self.skip_whitespace()
+        while self.peek() != "]":
+            items.append(self.parse_literal())
+            self.skip_whitespace()
+            if self.peek() == ",":
+                self.position += 1
+                self.skip_whitespace()
+            elif self.peek() != "]":
+                self.error("expected \",\" or \"]\"")
+        self.position += 1
+        return items
+
+    def parse_vector(self):
+        start = self.position
+        components = self.parse_list()
+        self.expect(")")
+        if len(components) != 3 or not all(isinstance(c, float) for c in components):
+            self.position = start
+            self.error("vectors must have exactly three numeric components")
+        return Vec3(*components)
+
+    def parse_string(self):
+        quote = self.peek()
+        end = self.text.find(quote, self.position + 1)
+        if end == -1:
+            self.error("unterminated string")
+        value = self.text[self.position + 1:end]
+        self.position = end + 1
+        return self.resolve_word(value)
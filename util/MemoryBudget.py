@@ -0,0 +1,94 @@
+"""Bounds how much memory a spell can make the interpreter allocate.
+
+An executor with a MemoryBudget makes it the active budget while it runs. Anything that
+builds many items at once, such as bulk pushes, lists built from other lists and
+arrays of list math, charges the active budget for them before or as it builds them,
+so a spell that would use too much memory raises a MemoryBudgetError, which is reported
+like any other error. Single pushes are not charged, as each instruction only pushes a
+few items. Large duplications are stored lazily and cost nothing until they are touched.
+
+The budget bounds what the executor holds at once, not what it allocates over a whole
+run. Dropped values aren't credited back as they go, so charges only ever add up, but
+before a charge fails the budget measures what the executor actually holds and carries on
+from there, so spells that keep building and dropping values can run for as long as they like.
+"""
+import contextlib
+import contextvars
+
+from errors.MemoryBudgetError import MemoryBudgetError
+
+# Rough bytes each item costs once built, as a pointer in a list or a float in an array.
+# The items themselves are usually shared, so they aren't counted
+ITEM_SIZE = 8
+# Rough bytes each item of a list costs when it is turned into text
+TEXT_ITEM_SIZE = 64
+
+ACTIVE_BUDGET = contextvars.ContextVar("active_budget", default=None)
+
+
+class MemoryBudget:
+    """A limit on the bytes a spell may hold, charged incrementally as values are built.
+
+    ``used`` starts each top level run at what the items already on the stack cost, so
+    values kept on a stack between runs still count against later ones. It only goes up
+    between measurements, so it is never less than what is really held. ``held`` is what
+    running frames keep off the stack, such as the items a lst_eval is working through.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.held = 0
+        self.executor = None
+
+    def charge(self, items, item_size=ITEM_SIZE):
+        used = self.used + items * item_size
+        if used > self.limit:
+            used = self.measure() + items * item_size
+            if used > self.limit:
+                raise MemoryBudgetError(self.limit, used)
+        self.used = used
+        if used > self.peak:
+            self.peak = used
+
+    def measure(self):
+        """Return the bytes the executor holds right now."""
+        if self.executor is None:
+            return self.used
+        return (self.executor.live_size() + self.held) * ITEM_SIZE
+
+    @contextlib.contextmanager
+    def run(self, executor):
+        """Make this the active budget for the executor while the block runs, unless it already is."""
+        if ACTIVE_BUDGET.get() is self:
+            yield
+            return
+        # Not charged, so a stack already over the budget fails on its next allocation instead
+        self.executor = executor
+        self.used = executor.stack.stored_size() * ITEM_SIZE
+        self.peak = max(self.peak, self.used)
+        self.held = 0
+        token = ACTIVE_BUDGET.set(self)
+        try:
+            yield
+        finally:
+            ACTIVE_BUDGET.reset(token)
+
+    def stats(self):
+        return {"limit": self.limit, "used": self.used, "peak": self.peak}
+
+
+def charge(items, item_size=ITEM_SIZE):
+    """Charge the active budget, if there is one, for building ``items`` items."""
+    budget = ACTIVE_BUDGET.get()
+    if budget is not None:
+        budget.charge(items, item_size)
+
+
+def hold(items):
+    """Count ``items`` already charged items as held off the stack by a running frame, or let
+    go of them again with a negative count."""
+    budget = ACTIVE_BUDGET.get()
+    if budget is not None:
+        budget.held += items
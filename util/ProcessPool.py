@@ -0,0 +1,20 @@
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+
+# Pools are expensive to start, so one is kept per worker count for the life of the process
+pools = {}
+
+
+def get_process_pool(workers):
+    pool = pools.get(workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        pools[workers] = pool
+    return pool
+
+
+@atexit.register
+def shutdown_process_pools():
+    for pool in pools.values():
+        pool.shutdown(cancel_futures=True)
+    pools.clear()
@@ -0,0 +1,112 @@
+import time
+
+from token_types.Operator import Operator
+
+
+def profile_key(instruction):
+    """Return the key an instruction is profiled under: operators by member, everything else by type."""
+    return instruction if isinstance(instruction, Operator) else type(instruction)
+
+
+def key_name(key):
+    if isinstance(key, Operator):
+        return key.name
+    if key is str:
+        return "EOF"
+    return key.__name__
+
+
+class OperatorStats:
+    __slots__ = ("count", "total_time", "max_time", "peak_stack")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.peak_stack = 0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_time": self.total_time,
+            "max_time": self.max_time,
+            "peak_stack": self.peak_stack,
+        }
+
+
+class Profiler:
+    """Records how often each kind of instruction runs and how long it takes.
+
+    Stats are kept per frame depth, where 0 is the spell the executor was given and each
+    eval or lst_eval body runs one frame deeper (a tail eval stays at the depth of the
+    frame it replaces), so nested spells are counted apart from the operators that ran
+    them. An eval's own time only covers setting up its frame, as the body runs after
+    the handler returns. ``peak_stack`` is the deepest the stack was right after the
+    instruction ran.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        # Profiled handler lists, by the handler list they wrap and the frame depth
+        self.wrapped_handlers = {}
+
+    def record(self, depth, key, elapsed, stack_depth):
+        frame = self.frames.get(depth)
+        if frame is None:
+            frame = self.frames[depth] = {}
+        stats = frame.get(key)
+        if stats is None:
+            stats = frame[key] = OperatorStats()
+        stats.count += 1
+        stats.total_time += elapsed
+        if elapsed > stats.max_time:
+            stats.max_time = elapsed
+        if stack_depth > stats.peak_stack:
+            stats.peak_stack = stack_depth
+
+    def wrap(self, handler, key, depth):
+        """Return a handler that runs the given one and records it under the key."""
+        perf_counter = time.perf_counter
+
+        def profiled(executor, instruction):
+            start = perf_counter()
+            try:
+                return handler(executor, instruction)
+            finally:
+                self.record(depth, key, perf_counter() - start, len(executor.stack))
+
+        return profiled
+
+    def handlers_for(self, handlers, keys, depth):
+        """Return the profiled version of a handler list indexed by opcode, with ``keys`` giving each opcode's key."""
+        cache_key = (id(handlers), depth)
+        cached = self.wrapped_handlers.get(cache_key)
+        if cached is not None and cached[0] is handlers:
+            return cached[1]
+        wrapped = [None if handler is None else self.wrap(handler, key, depth)
+                   for handler, key in zip(handlers, keys)]
+        self.wrapped_handlers[cache_key] = (handlers, wrapped)
+        return wrapped
+
+    def call(self, executor, handler, instruction):
+        start = time.perf_counter()
+        try:
+            return handler(executor, instruction)
+        finally:
+            self.record(executor.frame_depth, profile_key(instruction), time.perf_counter() - start,
+                        len(executor.stack))
+
+    def results(self):
+        """Return the stats as ``{frame depth: {instruction name: stats}}``, with the stats as dicts."""
+        return {depth: {key_name(key): stats.as_dict() for key, stats in frame.items()}
+                for depth, frame in sorted(self.frames.items())}
+
+    def report(self):
+        """Return the stats as lines of text, slowest first within each frame depth."""
+        lines = []
+        for depth, frame in sorted(self.frames.items()):
+            lines.append(f"Frame depth {depth}")
+            for key, stats in sorted(frame.items(), key=lambda item: -item[1].total_time):
+                lines.append(f"    {key_name(key)} - {stats.count} calls, {stats.total_time * 1000:.3f}ms total, "
+                             f"{stats.max_time * 1000:.3f}ms max, peak stack {stats.peak_stack}")
+        return lines
@@ -0,0 +1,45 @@
+from token_types.Operator import Operator
+from values.IotaList import IotaList
+from values.NumericList import NumericList
+
+# Operators whose result depends on, or changes, state outside of the stack
+SIDE_EFFECT_OPERATORS = frozenset([
+    Operator.RANDOM,
+    Operator.PRINT,
+    Operator.INPUT,
+    Operator.STORE_TEMP,
+    Operator.READ_TEMP,
+    Operator.CLEAR,
+])
+
+META_EVAL_OPERATORS = frozenset([Operator.EVAL, Operator.LIST_EVAL])
+
+
+def uses_any(values, operators):
+    """Return whether any of the values, or any list nested in them, contains one of the operators."""
+    pending = [] if isinstance(values, NumericList) else [values]
+    # Lists can be appended to themselves, so each one is only visited once
+    seen = {id(values)}
+    while pending:
+        for value in pending.pop():
+            # Lists of numbers or vectors can't hold operators
+            if isinstance(value, (list, IotaList)) and not isinstance(value, NumericList):
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    pending.append(value)
+            elif isinstance(value, Operator) and value in operators:
+                return True
+    return False
+
+
+def is_pure_body(instructions, *reachable):
+    """Return whether running the instructions can only affect the stack.
+
+    Bodies that evaluate other code may run any list they can reach, so those lists
+    (for example the stack and the items being mapped over) are checked as well.
+    """
+    if uses_any(instructions, SIDE_EFFECT_OPERATORS):
+        return False
+    if not uses_any(instructions, META_EVAL_OPERATORS):
+        return True
+    return not any(uses_any(values, SIDE_EFFECT_OPERATORS) for values in reachable)
@@ -0,0 +1,208 @@
+"""Persistent sequences stored as AVL-balanced trees of small tuples.
+
+A rope is either None (empty), a leaf or a Node. Leaves are non-empty tuples, or Repeats
+holding one value many times over without storing each copy. Ropes are never
+modified in place: every operation returns a new rope that shares all untouched
+subtrees with its input, so copies are free. Indexing, splitting, joining, insertion
+and deletion are all O(log n).
+"""
+
+import itertools
+
+LEAF_SIZE = 64
+
+
+class Repeat:
+    """A leaf of one value repeated ``count`` times, which is more than LEAF_SIZE.
+
+    It slices, indexes and iterates like a tuple, so it can stand in for one anywhere a
+    leaf is used, but takes the same memory however many times the value repeats.
+    """
+    __slots__ = ("value", "count")
+
+    def __init__(self, value, count):
+        self.value = value
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return repeat(self.value, len(range(*index.indices(self.count))))
+        if not -self.count <= index < self.count:
+            raise IndexError("repeat index out of range")
+        return self.value
+
+    def __iter__(self):
+        return itertools.repeat(self.value, self.count)
+
+    def __reversed__(self):
+        return itertools.repeat(self.value, self.count)
+
+
+def repeat(value, count):
+    """Return a rope of the value repeated ``count`` times."""
+    if count <= 0:
+        return None
+    if count <= LEAF_SIZE:
+        return (value,) * count
+    return Repeat(value, count)
+
+
+class Node:
+    __slots__ = ("left", "right", "size", "height")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.size = size(left) + size(right)
+        self.height = max(height(left), height(right)) + 1
+
+
+def size(rope):
+    if rope is None:
+        return 0
+    if type(rope) is Node:
+        return rope.size
+    return len(rope)
+
+
+def height(rope):
+    if type(rope) is Node:
+        return rope.height
+    return 0
+
+
+def balance(left, right):
+    """Join two ropes whose heights differ by at most two into one balanced node."""
+    left_height = height(left)
+    right_height = height(right)
+    if left_height > right_height + 1:
+        if height(left.left) >= height(left.right):
+            return Node(left.left, Node(left.right, right))
+        return Node(Node(left.left, left.right.left), Node(left.right.right, right))
+    if right_height > left_height + 1:
+        if height(right.right) >= height(right.left):
+            return Node(Node(left, right.left), right.right)
+        return Node(Node(left, right.left.left), Node(right.left.right, right.right))
+    return Node(left, right)
+
+
+def join(left, right):
+    """Concatenate two ropes."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if type(left) is tuple and type(right) is tuple and len(left) + len(right) <= LEAF_SIZE:
+        return left + right
+    if type(left) is Repeat and type(right) is Repeat and left.value is right.value:
+        return Repeat(left.value, left.count + right.count)
+
+    left_height = height(left)
+    right_height = height(right)
+    if left_height > right_height + 1:
+        return balance(left.left, join(left.right, right))
+    if right_height > left_height + 1:
+        return balance(join(left, right.left), right.right)
+    return Node(left, right)
+
+
+def split(rope, index):
+    """Split a rope into its first ``index`` items and the rest."""
+    if rope is None or index <= 0:
+        return None, rope
+    if index >= size(rope):
+        return rope, None
+    if type(rope) is not Node:
+        return rope[:index], rope[index:]
+
+    left_size = size(rope.left)
+    if index < left_size:
+        left, right = split(rope.left, index)
+        return left, join(right, rope.right)
+    if index > left_size:
+        left, right = split(rope.right, index - left_size)
+        return join(rope.left, left), right
+    return rope.left, rope.right
+
+
+def get(rope, index):
+    while type(rope) is Node:
+        left_size = size(rope.left)
+        if index < left_size:
+            rope = rope.left
+        else:
+            index -= left_size
+            rope = rope.right
+    return rope[index]
+
+
+def replace(rope, index, value):
+    if type(rope) is tuple:
+        return rope[:index] + (value,) + rope[index + 1:]
+    if type(rope) is Repeat:
+        return join(join(rope[:index], (value,)), rope[index + 1:])
+    left_size = size(rope.left)
+    if index < left_size:
+        return Node(replace(rope.left, index, value), rope.right)
+    return Node(rope.left, replace(rope.right, index - left_size, value))
+
+
+def insert(rope, index, value):
+    left, right = split(rope, index)
+    return join(join(left, (value,)), right)
+
+
+def delete(rope, index):
+    left, right = split(rope, index)
+    _, right = split(right, 1)
+    return join(left, right)
+
+
+def from_iterable(items):
+    """Build a balanced rope from the items."""
+    items = tuple(items)
+    ropes = [items[i:i + LEAF_SIZE] for i in range(0, len(items), LEAF_SIZE)]
+    if not ropes:
+        return None
+    while len(ropes) > 1:
+        paired = [Node(ropes[i], ropes[i + 1]) for i in range(0, len(ropes) - 1, 2)]
+        if len(ropes) % 2:
+            paired[-1] = join(paired[-1], ropes[-1])
+        ropes = paired
+    return ropes[0]
+
+
+def leaves(rope):
+    """Yield the leaves of the rope from left to right."""
+    pending = [rope] if rope is not None else []
+    while pending:
+        rope = pending.pop()
+        if type(rope) is not Node:
+            yield rope
+        else:
+            pending.append(rope.right)
+            pending.append(rope.left)
+
+
+def iterate(rope):
+    for leaf in leaves(rope):
+        yield from leaf
+
+
+def iterate_reversed(rope):
+    pending = [rope] if rope is not None else []
+    while pending:
+        rope = pending.pop()
+        if type(rope) is not Node:
+            yield from reversed(rope)
+        else:
+            pending.append(rope.left)
+            pending.append(rope.right)
+
+
+def stored_size(rope):
+    """Return how many items the rope actually stores, counting each Repeat as one."""
+    return sum(len(leaf) if type(leaf) is tuple else 1 for leaf in leaves(rope))
@@ -0,0 +1,412 @@
+import collections
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+from Compiler import OPCODE_KEYS, OPERATORS, TOKEN_TYPES, CompiledSpell, Compiler
+from Lexer import Lexer
+from Parser import Parser
+from token_types.DropKeep import DropKeep
+from token_types.ListLiteral import ListLiteral
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from token_types.VectorLiteral import VectorLiteral
+from values.IotaList import IotaList
+from values.NumericList import NumericList
+from values.Vec3 import Vec3
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where saves still merge with the file but aren't serialized
+    fcntl = None
+
+MAGIC = b"PHXSPELL"
+FORMAT_VERSION = 2
+# Opcodes index into the operators and token types, so a cache is only valid for the same list of them
+INTERPRETER_VERSION = hashlib.blake2b("\n".join(map(str, OPCODE_KEYS)).encode(), digest_size=16).digest()
+
+# Magic, format version, interpreter version and number of spells
+HEADER = struct.Struct("<8sI16sI")
+# Source key, and the offset and length of the spell's record, sorted by key
+INDEX_ENTRY = struct.Struct("<16sQQ")
+COUNT = struct.Struct("<I")
+FLOAT = struct.Struct("<d")
+VECTOR = struct.Struct("<3d")
+OPERATOR_INDEX = struct.Struct("<H")
+ARRAY_DTYPE = np.dtype("<f8")
+# Decoded spells kept in memory, so a long batch over many distinct spells doesn't keep them all
+DECODED_CACHE_SIZE = 4096
+
+OPERATOR_INDICES = {op: i for i, op in enumerate(OPERATORS)}
+
+
+def source_key(source, optimized=False):
+    """Return the key a spell's source is cached under, which differs for optimized spells."""
+    prefix = b"o" if optimized else b"p"
+    return hashlib.blake2b(prefix + source.encode(), digest_size=16).digest()
+
+
+def encode_string(value, out):
+    data = value.encode()
+    out += COUNT.pack(len(data))
+    out += data
+
+
+def encode_value(value, out):
+    """Append a tagged encoding of a literal value or token to ``out``."""
+    if isinstance(value, Operator):
+        out += b"o"
+        out += OPERATOR_INDEX.pack(OPERATOR_INDICES[value])
+    elif isinstance(value, Vec3):
+        out += b"v"
+        out += VECTOR.pack(*value)
+    elif isinstance(value, float):
+        out += b"f"
+        out += FLOAT.pack(value)
+    elif isinstance(value, NumericList):
+        # Stored as the raw array, so loading it is one copy
+        out += b"w" if value.is_vectors else b"n"
+        out += COUNT.pack(len(value))
+        out += value.array.astype(ARRAY_DTYPE).tobytes()
+    elif isinstance(value, IotaList):
+        out += b"l"
+        out += COUNT.pack(len(value))
+        for item in value:
+            encode_value(item, out)
+    # The literal token types subclass NumberLiteral, so they are checked first
+    elif isinstance(value, ListLiteral):
+        out += b"L"
+        encode_value(value.value, out)
+    elif isinstance(value, VectorLiteral):
+        out += b"V"
+        encode_value(value.value, out)
+    elif isinstance(value, NumberLiteral):
+        out += b"#"
+        encode_value(value.value, out)
+    elif isinstance(value, DropKeep):
+        out += b"k"
+        encode_string(value.value, out)
+    elif isinstance(value, StackPermutation):
+        out += b"p"
+        out += COUNT.pack(value.depth)
+        out += COUNT.pack(len(value.order))
+        for index in value.order:
+            out += COUNT.pack(index)
+        out += COUNT.pack(len(value.instructions))
+        for instruction in value.instructions:
+            encode_value(instruction, out)
+    elif isinstance(value, str):
+        out += b"s"
+        encode_string(value, out)
+    else:
+        raise ValueError(f"\"{value}\" cannot be cached")
+
+
+def encode_spell(spell):
+    """Return a compiled spell as the bytes of its cache record."""
+    out = bytearray(COUNT.pack(len(spell.opcodes)))
+    out += spell.opcodes.tobytes()
+    operands = array("I", spell.operands)
+    if sys.byteorder == "big":
+        operands.byteswap()
+    out += operands.tobytes()
+    for token_type in TOKEN_TYPES:
+        pool = spell.pools[token_type]
+        out += COUNT.pack(len(pool))
+        for token in pool:
+            encode_value(token, out)
+    return bytes(out)
+
+
+class RecordReader:
+    """Decodes one spell's record from a buffer, starting at ``position``."""
+
+    def __init__(self, buffer, position):
+        self.buffer = buffer
+        self.position = position
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.buffer, self.position)
+        self.position += layout.size
+        return values
+
+    def read_count(self):
+        return self.unpack(COUNT)[0]
+
+    def read_bytes(self, length):
+        data = self.buffer[self.position:self.position + length]
+        self.position += length
+        return data
+
+    def read_string(self):
+        return bytes(self.read_bytes(self.read_count())).decode()
+
+    def read_operator(self):
+        return OPERATORS[self.unpack(OPERATOR_INDEX)[0]]
+
+    def read_vector(self):
+        return Vec3.of(*self.unpack(VECTOR))
+
+    def read_float(self):
+        return self.unpack(FLOAT)[0]
+
+    def read_list(self):
+        return IotaList([self.read_value() for _ in range(self.read_count())])
+
+    def read_array(self, columns):
+        count = self.read_count() * columns
+        array = np.frombuffer(self.buffer, ARRAY_DTYPE, count, self.position).astype(float)
+        self.position += count * ARRAY_DTYPE.itemsize
+        return array
+
+    def read_numbers(self):
+        return NumericList.wrap(self.read_array(1))
+
+    def read_vectors(self):
+        return NumericList.wrap(self.read_array(3).reshape(-1, 3))
+
+    def read_list_literal(self):
+        return ListLiteral(self.read_value())
+
+    def read_vector_literal(self):
+        return VectorLiteral(self.read_value())
+
+    def read_number_literal(self):
+        return NumberLiteral(self.read_value())
+
+    def read_drop_keep(self):
+        return DropKeep(self.read_string())
+
+    def read_permutation(self):
+        depth = self.read_count()
+        order = [self.read_count() for _ in range(self.read_count())]
+        instructions = [self.read_value() for _ in range(self.read_count())]
+        return StackPermutation(depth, order, instructions)
+
+    def read_value(self):
+        tag = self.buffer[self.position]
+        self.position += 1
+        reader = READERS.get(tag)
+        if reader is None:
+            raise ValueError(f"unknown tag {tag} in spell cache")
+        return reader(self)
+
+    def read_spell(self):
+        length = self.read_count()
+        opcodes = array("B", self.read_bytes(length))
+        operands = array("I")
+        operands.frombytes(self.read_bytes(length * operands.itemsize))
+        if sys.byteorder == "big":
+            operands.byteswap()
+        pools = {}
+        for token_type in TOKEN_TYPES:
+            pools[token_type] = [self.read_value() for _ in range(self.read_count())]
+        return CompiledSpell(opcodes, operands, pools)
+
+
+READERS = {
+    ord("o"): RecordReader.read_operator,
+    ord("v"): RecordReader.read_vector,
+    ord("f"): RecordReader.read_float,
+    ord("l"): RecordReader.read_list,
+    ord("n"): RecordReader.read_numbers,
+    ord("w"): RecordReader.read_vectors,
+    ord("L"): RecordReader.read_list_literal,
+    ord("V"): RecordReader.read_vector_literal,
+    ord("#"): RecordReader.read_number_literal,
+    ord("k"): RecordReader.read_drop_keep,
+    ord("p"): RecordReader.read_permutation,
+    ord("s"): RecordReader.read_string,
+}
+
+
+class SpellCache:
+    """Compiled spells kept in a file, keyed by a hash of their source.
+
+    The file starts with a header, then an index of source keys sorted so a lookup is a
+    binary search, then each spell's opcodes, operands and constant pools. It is memory
+    mapped read only, so processes that open the same cache share one copy of it, and
+    only the spells they look up are decoded. A file written by another version of the
+    interpreter is ignored and replaced on the next ``save``.
+
+    New spells are kept in memory until ``save`` writes them out along with the spells
+    in the file at the time, so processes sharing a cache don't drop each other's spells.
+    Saves hold a lock on a file next to the cache while they merge, and the file is
+    replaced in one step, so readers never see half of it. The most recently used
+    ``size`` decoded spells are kept, so looking them up again doesn't decode them again.
+    """
+
+    def __init__(self, path, size=DECODED_CACHE_SIZE):
+        self.path = path
+        self.size = size
+        self.file = None
+        self.map = None
+        self.count = 0
+        # Records of spells added since the file was written, by source key
+        self.pending = {}
+        self.decoded = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count + sum(1 for key in self.pending if self.find(key) is None)
+
+    def open(self):
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        if os.fstat(self.file.fileno()).st_size < HEADER.size:
+            self.close()
+            return
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, interpreter_version, count = HEADER.unpack_from(self.map)
+        if (magic != MAGIC or version != FORMAT_VERSION or interpreter_version != INTERPRETER_VERSION
+                or len(self.map) < HEADER.size + count * INDEX_ENTRY.size):
+            self.close()
+            return
+        self.count = count
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.count = 0
+
+    def entry(self, i):
+        return INDEX_ENTRY.unpack_from(self.map, HEADER.size + i * INDEX_ENTRY.size)
+
+    def find(self, key):
+        """Return the offset and length of the record for the key in the file, or None."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry_key, offset, length = self.entry(middle)
+            if entry_key == key:
+                return offset, length
+            if entry_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get(self, source, optimized=False):
+        """Return the cached compiled spell for the source, or None if it isn't cached."""
+        key = source_key(source, optimized)
+        spell = self.decoded.get(key)
+        if spell is not None:
+            self.decoded.move_to_end(key)
+        else:
+            record = self.pending.get(key)
+            if record is not None:
+                spell = RecordReader(record, 0).read_spell()
+            else:
+                location = self.find(key)
+                if location is None:
+                    self.misses += 1
+                    return None
+                spell = RecordReader(self.map, location[0]).read_spell()
+            self.remember(key, spell)
+        self.hits += 1
+        return spell
+
+    def remember(self, key, spell):
+        self.decoded[key] = spell
+        self.decoded.move_to_end(key)
+        if len(self.decoded) > self.size:
+            self.decoded.popitem(last=False)
+
+    def put(self, source, spell, optimized=False):
+        """Add a compiled spell to the cache. Spells with values that can't be stored are skipped."""
+        try:
+            record = encode_spell(spell)
+        except ValueError:
+            return
+        key = source_key(source, optimized)
+        self.pending[key] = record
+        self.remember(key, spell)
+
+    def compile(self, source, optimizer=None):
+        """Return the source compiled, from the cache if it is there, running the optimizer if given."""
+        spell = self.get(source, optimizer is not None)
+        if spell is not None:
+            return spell
+        parsed = Parser(Lexer(source)).process_all_tokens()
+        if optimizer is not None:
+            parsed = optimizer.run(parsed)
+        spell = Compiler.compile(parsed)
+        # Syntax errors are not cached, so they are reported with their position every time
+        if isinstance(spell, CompiledSpell):
+            self.put(source, spell, optimizer is not None)
+        return spell
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the cache's lock file, so only one process saves to it at a time."""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "wb") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def save(self):
+        """Write the spells in the file and any new ones to the file, if there are new ones."""
+        if not self.pending:
+            return
+        with self.locked():
+            # Another process may have saved since the file was opened, so the spells are
+            # merged with what is in the file now
+            self.close()
+            self.open()
+            self.write()
+        self.pending.clear()
+
+    def write(self):
+        """Replace the file with one holding the spells in it and the pending ones."""
+        records = {}
+        for i in range(self.count):
+            key, offset, length = self.entry(i)
+            records[key] = self.map[offset:offset + length]
+        records.update(self.pending)
+
+        keys = sorted(records)
+        offset = HEADER.size + len(keys) * INDEX_ENTRY.size
+        index = bytearray()
+        for key in keys:
+            index += INDEX_ENTRY.pack(key, offset, len(records[key]))
+            offset += len(records[key])
+
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, INTERPRETER_VERSION, len(keys)))
+            file.write(index)
+            for key in keys:
+                file.write(records[key])
+        self.close()
+        os.replace(temporary_path, self.path)
+        self.open()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "spells": len(self)}
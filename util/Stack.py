@@ -0,0 +1,200 @@
+from util import Rope
+from util.MemoryBudget import charge
+from values.IotaList import IotaList, stored_items
+
+# Items kept in the plain list at the top of the stack once deep operations start
+TOP_SIZE = Rope.LEAF_SIZE
+# Operations within this many items of the top are cheaper as plain list operations
+LIST_DISTANCE = 1 << 16
+# Pushing or popping more items than this at once shares structure with the rope instead
+# of copying them
+LAZY_ITEMS = 1 << 10
+
+
+class Stack:
+    """The executor's stack.
+
+    The top of the stack is a plain list, so pushes, pops and shuffles near the top are
+    list operations. Anything below it lives in a persistent rope, so yanking from or
+    inserting deep into the stack is O(log n) and copies share everything but the top.
+    Items only move into the rope when a deep operation needs them there, or when many
+    are pushed or popped at once, which joins or splits the rope instead of copying them.
+    """
+    __slots__ = ("top", "rope", "rope_size", "append", "extend")
+
+    def __init__(self, items=()):
+        self.top = list(items)
+        self.rope = None
+        self.rope_size = 0
+        # The top list is only ever modified in place, so these stay bound to it
+        self.append = self.top.append
+        self.extend = self.top.extend
+
+    def __len__(self):
+        return self.rope_size + len(self.top)
+
+    def __iter__(self):
+        yield from Rope.iterate(self.rope)
+        yield from self.top
+
+    def __reversed__(self):
+        yield from reversed(self.top)
+        yield from Rope.iterate_reversed(self.rope)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, (Stack, list)):
+            return len(self) == len(other) and all(a is b or a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def copy(self):
+        """Return an independent stack with the same items, sharing the rope."""
+        self.flush()
+        stack = Stack(self.top)
+        stack.rope = self.rope
+        stack.rope_size = self.rope_size
+        return stack
+
+    def flush(self):
+        """Move all but the top TOP_SIZE items of the top list into the rope."""
+        count = len(self.top) - TOP_SIZE
+        if count > 0:
+            self.rope = Rope.join(self.rope, Rope.from_iterable(self.top[:count]))
+            self.rope_size += count
+            del self.top[:count]
+
+    def stored_size(self):
+        """Return how many items the stack actually stores, counting lazily repeated ones once."""
+        return len(self.top) + Rope.stored_size(self.rope)
+
+    def live_size(self):
+        """Return how many items the stack keeps in memory, counting the items of lists on it."""
+        size = sum(map(stored_items, self.top))
+        for leaf in Rope.leaves(self.rope):
+            size += sum(map(stored_items, leaf)) if type(leaf) is tuple else stored_items(leaf.value)
+        return size
+
+    def push_rope(self, rope):
+        """Push the items of a rope by joining it onto the stack's rope, without copying them."""
+        self.rope = Rope.join(Rope.join(self.rope, Rope.from_iterable(self.top)), rope)
+        self.rope_size = Rope.size(self.rope)
+        self.top.clear()
+
+    def repeat(self, value, count):
+        """Push ``count`` copies of the value. Many copies are kept as one Repeat in the rope,
+        so they take no memory until they are touched."""
+        if count <= 0:
+            return
+        if count <= LAZY_ITEMS:
+            charge(count)
+            self.top.extend([value] * count)
+        else:
+            self.push_rope(Rope.repeat(value, count))
+
+    def push_list(self, lst):
+        """Push the items of a list. Long IotaLists join the rope, sharing their structure."""
+        if type(lst) is IotaList and len(lst) > LAZY_ITEMS:
+            self.push_rope(lst.to_rope())
+        else:
+            charge(len(lst))
+            self.top.extend(lst)
+
+    def pop_list(self, count):
+        """Pop the top ``count`` items as an IotaList in stack order. Long lists share the rope's structure."""
+        if count > len(self):
+            raise IndexError("pop from empty list")
+        if count <= 0:
+            return IotaList.EMPTY
+        top = self.top
+        if count <= len(top):
+            lst = IotaList(top[-count:])
+            del top[-count:]
+            return lst
+        self.push_rope(None)
+        self.rope, rope = Rope.split(self.rope, self.rope_size - count)
+        self.rope_size -= count
+        return IotaList.build((), rope, ())
+
+    def refill(self):
+        """Move the uppermost rope items back into the empty top list."""
+        self.rope, upper = Rope.split(self.rope, self.rope_size - TOP_SIZE)
+        self.rope_size -= Rope.size(upper)
+        self.top.extend(Rope.iterate(upper))
+
+    def absolute_index(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("stack index out of range")
+        return index
+
+    def locate(self, index):
+        """Return where an absolute index lives: an index into the top list, or None for the rope."""
+        if index >= self.rope_size:
+            if index - self.rope_size >= len(self.top) - LIST_DISTANCE:
+                return index - self.rope_size
+            self.flush()
+            if index >= self.rope_size:
+                return index - self.rope_size
+        return None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        top = self.top
+        if -len(top) <= index < 0:
+            return top[index]
+        index = self.absolute_index(index)
+        if index >= self.rope_size:
+            return top[index - self.rope_size]
+        return Rope.get(self.rope, index)
+
+    def __setitem__(self, index, value):
+        index = self.absolute_index(index)
+        top_index = self.locate(index)
+        if top_index is not None:
+            self.top[top_index] = value
+        else:
+            self.rope = Rope.replace(self.rope, index, value)
+
+    def pop(self, index=-1):
+        top = self.top
+        if index == -1 and top:
+            return top.pop()
+        if not len(self):
+            raise IndexError("pop from empty list")
+        if index == -1:
+            self.refill()
+            return top.pop()
+
+        index = self.absolute_index(index)
+        top_index = self.locate(index)
+        if top_index is not None:
+            return top.pop(top_index)
+        value = Rope.get(self.rope, index)
+        self.rope = Rope.delete(self.rope, index)
+        self.rope_size -= 1
+        return value
+
+    def insert(self, index, value):
+        length = len(self)
+        if index < 0:
+            index = max(index + length, 0)
+        index = min(index, length)
+        if index >= self.rope_size and index - self.rope_size >= len(self.top) - LIST_DISTANCE:
+            self.top.insert(index - self.rope_size, value)
+            return
+        self.flush()
+        if index >= self.rope_size:
+            self.top.insert(index - self.rope_size, value)
+        else:
+            self.rope = Rope.insert(self.rope, index, value)
+            self.rope_size += 1
+
+    def clear(self):
+        self.top.clear()
+        self.rope = None
+        self.rope_size = 0
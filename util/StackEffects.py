@@ -0,0 +1,209 @@
+from token_types.DropKeep import DropKeep
+from token_types.NumberLiteral import NumberLiteral
+from token_types.Operator import Operator
+from token_types.StackPermutation import StackPermutation
+from util.Escapes import read_escape_seq
+
+# Items each operator pops and pushes. Operators that only look below the top count the
+# items they look at as popped and pushed back. Operators whose effect depends on values
+# on the stack (such as dup_n or eval) are missing.
+STACK_EFFECTS = {
+    Operator.ADD: (2, 1),
+    Operator.SUB: (2, 1),
+    Operator.MUL: (2, 1),
+    Operator.DIV: (2, 1),
+    Operator.MAG: (1, 1),
+    Operator.PWR: (2, 1),
+    Operator.FLR: (1, 1),
+    Operator.CEIL: (1, 1),
+    Operator.VCTR_MK: (3, 1),
+    Operator.VCTR_UNMK: (1, 3),
+    Operator.MOD: (2, 1),
+    Operator.AXIS: (1, 1),
+    Operator.RANDOM: (0, 1),
+
+    Operator.TRUE: (0, 1),
+    Operator.FALSE: (0, 1),
+    Operator.NULL: (0, 1),
+    Operator.ZERO_VEC: (0, 1),
+    Operator.VEC_X_PLUS: (0, 1),
+    Operator.VEC_X_MINUS: (0, 1),
+    Operator.VEC_Y_PLUS: (0, 1),
+    Operator.VEC_Y_MINUS: (0, 1),
+    Operator.VEC_Z_PLUS: (0, 1),
+    Operator.VEC_Z_MINUS: (0, 1),
+    Operator.TAU: (0, 1),
+    Operator.PI: (0, 1),
+    Operator.E: (0, 1),
+
+    Operator.SWAP: (2, 2),
+    Operator.ROTATE_LFT: (3, 3),
+    Operator.ROTATE_RIGHT: (3, 3),
+    Operator.DUP: (1, 2),
+    Operator.DUP_SECOND: (2, 3),
+    Operator.DUP_TOP_DOWN: (2, 3),
+    Operator.DUP_2: (2, 4),
+    Operator.STACK_LEN: (0, 1),
+    # Only ever permutes as much of the stack as there is
+    Operator.LEHMER_PERMUTE: (1, 0),
+
+    Operator.BOOL_COERCE: (1, 1),
+    Operator.BOOL_TO_NUM: (1, 1),
+    Operator.NOT: (1, 1),
+    Operator.OR: (2, 1),
+    Operator.AND: (2, 1),
+    Operator.XOR: (2, 1),
+    Operator.CONDITIONAL_REMOVE: (3, 1),
+    Operator.EQ: (2, 1),
+    Operator.NOT_EQ: (2, 1),
+    Operator.GT: (2, 1),
+    Operator.LT: (2, 1),
+    Operator.GE: (2, 1),
+    Operator.LE: (2, 1),
+
+    Operator.INDEX: (2, 1),
+    Operator.SUBLIST: (3, 1),
+    Operator.APPEND: (2, 1),
+    Operator.EXTEND: (2, 1),
+    Operator.EMPTY_LST: (0, 1),
+    Operator.SINGLET: (1, 1),
+    Operator.LENGTH: (1, 1),
+    Operator.REVERSE: (1, 1),
+    Operator.FIND: (2, 1),
+    Operator.DELETE_INDEX: (2, 1),
+    Operator.SET_INDEX: (3, 1),
+    Operator.ENQUEUE: (2, 1),
+    Operator.DEQUEUE: (1, 2),
+
+    Operator.PRINT: (1, 0),
+    Operator.STORE_TEMP: (1, 0),
+    Operator.READ_TEMP: (0, 1),
+    Operator.INPUT: (0, 1),
+
+    Operator.SIN: (1, 1),
+    Operator.COS: (1, 1),
+    Operator.TAN: (1, 1),
+    Operator.ARCSIN: (1, 1),
+    Operator.ARCCOS: (1, 1),
+    Operator.ARCTAN: (1, 1),
+    Operator.ARCTAN2: (2, 1),
+    Operator.LOG: (2, 1),
+
+    Operator.UNIFY: (2, 1),
+    Operator.INTERSECT: (2, 1),
+    Operator.DISJUNCT: (2, 1),
+    Operator.INVERT: (1, 1),
+    Operator.UNIQUE: (1, 1),
+
+    # Each item runs on its own frame, so the body can't reach below the two arguments
+    Operator.LIST_EVAL: (2, 1),
+    Operator.HALT: (0, 0),
+}
+
+# Shuffles that always need the same number of items and ignore their values
+SHUFFLES = frozenset([
+    Operator.SWAP,
+    Operator.ROTATE_LFT,
+    Operator.ROTATE_RIGHT,
+    Operator.DUP,
+    Operator.DUP_SECOND,
+    Operator.DUP_TOP_DOWN,
+    Operator.DUP_2,
+    DropKeep,
+])
+
+
+def stack_effect(instruction):
+    """Return the items the instruction pops and pushes, or None if that depends on the stack."""
+    if isinstance(instruction, NumberLiteral):
+        return 0, 1
+    if isinstance(instruction, DropKeep):
+        drop_order = instruction.drop_order
+        return len(drop_order), len(drop_order) - sum(drop_order)
+    if isinstance(instruction, StackPermutation):
+        return instruction.depth, len(instruction.order)
+    if instruction == "EOF":
+        return 0, 0
+    if isinstance(instruction, Operator):
+        return STACK_EFFECTS.get(instruction)
+    return None
+
+
+class StackAnalysis:
+    """The stack depths a spell goes through, relative to the stack it starts on.
+
+    ``depths`` has the depth before each instruction, or None past the point where the
+    depth stops being known (or the spell has halted). ``required_depth`` is how many
+    items the spell needs to start with, and ``max_depth`` is the most items it adds on
+    top of them at any point. The spell is static when every instruction's effect is
+    known and it leaves no escape open, in which case running it on a stack with at
+    least ``required_depth`` items never underflows.
+    """
+
+    def __init__(self):
+        self.depths = []
+        self.required_depth = 0
+        self.max_depth = 0
+        self.final_depth = 0
+        self.is_static = True
+
+    def depth_at(self, index):
+        return self.depths[index]
+
+
+def analyze(instructions, effects=None):
+    """Return the StackAnalysis of the instructions.
+
+    ``effects`` can give each instruction's stack_effect up front, for callers that can
+    work them out faster than one at a time.
+    """
+    instructions = list(instructions)
+    if effects is None:
+        effects = [stack_effect(instruction) for instruction in instructions]
+    analysis = StackAnalysis()
+    depths = analysis.depths
+    escape = Operator.ESCAPE
+    start_escape_seq = Operator.START_ESCAPE_SEQ
+    halt = Operator.HALT
+    depth = 0
+    lowest = 0
+    highest = 0
+    i = 0
+    while i < len(instructions):
+        instruction = instructions[i]
+        if instruction is escape or instruction is start_escape_seq:
+            if instruction is escape:
+                end = i + 1 if i + 1 < len(instructions) else None
+            else:
+                items, end = read_escape_seq(instructions, i)
+            if end is None:
+                # Leaves the executor escaping once the spell is over
+                analysis.is_static = False
+                break
+            depths.extend([depth] * (end + 1 - i))
+            depth += 1
+            if depth > highest:
+                highest = depth
+            i = end + 1
+            continue
+
+        effect = effects[i]
+        if effect is None:
+            analysis.is_static = False
+            break
+        depths.append(depth)
+        i += 1
+        if instruction is halt:
+            break
+        pops, pushes = effect
+        if depth - pops < lowest:
+            lowest = depth - pops
+        depth += pushes - pops
+        if depth > highest:
+            highest = depth
+
+    depths.extend([None] * (len(instructions) - len(depths)))
+    analysis.required_depth = -lowest
+    analysis.max_depth = highest
+    analysis.final_depth = depth
+    return analysis
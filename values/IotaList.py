@@ -0,0 +1,276 @@
+from util import Rope
+from util.MemoryBudget import TEXT_ITEM_SIZE, charge
+
+LEAF_SIZE = Rope.LEAF_SIZE
+
+
+def as_rope(items):
+    return items if items else None
+
+
+def numeric_operator(name):
+    """Return a method that runs the NumericList method ``name`` if the list holds only
+    numbers or only vectors."""
+    def apply(self, *args):
+        numeric = self.numeric()
+        if numeric is not None:
+            return getattr(numeric, name)(*args)
+        if args:
+            return NotImplemented
+        raise TypeError(f"bad operand type for {name.strip('_')}: list of mixed items")
+
+    return apply
+
+
+def stored_items(value):
+    """Return how many items a value keeps in memory, counting those of a list it is."""
+    return 1 + value.stored_size() if isinstance(value, IotaList) else 1
+
+
+class IotaList:
+    """An immutable list of iotas.
+
+    The middle of the list is a persistent rope, with a small tuple buffer at each end.
+    Pushing and popping at either end only copies a buffer of at most LEAF_SIZE items and
+    moves a whole buffer into or out of the rope once it fills up or runs out, so queue
+    operations are amortized O(1). Indexing, setting, slicing and concatenation are
+    O(log n), and lists share structure, so copying one is free. Every method returns a
+    new list and leaves the original untouched. Lists built from lazily repeated stack
+    items keep them lazy, as Repeat leaves in the rope.
+    """
+    __slots__ = ("front", "rope", "back", "length", "hash", "members", "numeric_list")
+
+    def __init__(self, items=()):
+        items = tuple(items)
+        if len(items) <= LEAF_SIZE:
+            self.front, self.rope, self.back = (), None, items
+        else:
+            charge(len(items))
+            self.front, self.rope, self.back = (), Rope.from_iterable(items), ()
+        self.length = len(items)
+        self.hash = None
+        self.members = None
+        self.numeric_list = None
+
+    @staticmethod
+    def build(front, rope, back):
+        lst = object.__new__(IotaList)
+        lst.front = front
+        lst.rope = rope
+        lst.back = back
+        lst.length = len(front) + Rope.size(rope) + len(back)
+        lst.hash = None
+        lst.members = None
+        lst.numeric_list = None
+        return lst
+
+    def to_rope(self):
+        return Rope.join(Rope.join(as_rope(self.front), self.rope), as_rope(self.back))
+
+    def __len__(self):
+        return self.length
+
+    def stored_size(self):
+        """Return how many items the list actually stores, counting lazily repeated ones once."""
+        return len(self.front) + Rope.stored_size(self.rope) + len(self.back)
+
+    def __iter__(self):
+        yield from self.front
+        yield from Rope.iterate(self.rope)
+        yield from self.back
+
+    def __reversed__(self):
+        yield from reversed(self.back)
+        yield from Rope.iterate_reversed(self.rope)
+        yield from reversed(self.front)
+
+    def __repr__(self):
+        charge(self.length, TEXT_ITEM_SIZE)
+        return "[" + ", ".join(repr(item) for item in self) + "]"
+
+    __str__ = __repr__
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, IotaList):
+            # Lists whose hashes are already known and differ can't be equal
+            if self.length != other.length or (self.hash is not None and other.hash is not None
+                                               and self.hash != other.hash):
+                return False
+        if isinstance(other, (IotaList, list)):
+            return len(self) == len(other) and all(a is b or a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self):
+        if self.hash is None:
+            charge(self.length)
+            self.hash = hash(tuple(self))
+        return self.hash
+
+    def __reduce__(self):
+        return IotaList, (tuple(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def numeric(self):
+        """Return the list as a NumericList if it holds only numbers or only vectors, or else None.
+        It is worked out once per list, so math on the same list doesn't convert it again."""
+        if self.numeric_list is None:
+            from values.NumericList import NumericList
+            self.numeric_list = NumericList.from_items(self) or False
+        return self.numeric_list or None
+
+    # Adding two lists always joins them. Other math, and adding a number or vector to a
+    # list of only numbers or only vectors, applies to each item
+    def __add__(self, other):
+        if isinstance(other, (IotaList, list)):
+            return self.concat(other)
+        numeric = self.numeric()
+        if numeric is not None:
+            return numeric.__add__(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return IotaList(other).concat(self)
+        numeric = self.numeric()
+        if numeric is not None:
+            return numeric.__radd__(other)
+        return NotImplemented
+
+    __sub__ = numeric_operator("__sub__")
+    __rsub__ = numeric_operator("__rsub__")
+    __mul__ = numeric_operator("__mul__")
+    __rmul__ = numeric_operator("__rmul__")
+    __truediv__ = numeric_operator("__truediv__")
+    __rtruediv__ = numeric_operator("__rtruediv__")
+    __pow__ = numeric_operator("__pow__")
+    __rpow__ = numeric_operator("__rpow__")
+    __gt__ = numeric_operator("__gt__")
+    __lt__ = numeric_operator("__lt__")
+    __ge__ = numeric_operator("__ge__")
+    __le__ = numeric_operator("__le__")
+    __abs__ = numeric_operator("__abs__")
+    __floor__ = numeric_operator("__floor__")
+    __ceil__ = numeric_operator("__ceil__")
+
+    def absolute_index(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("list index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                charge(self.length)
+                return IotaList(tuple(self)[index])
+            if stop <= start:
+                return IotaList()
+            rest, upper = Rope.split(self.to_rope(), stop)
+            lower, middle = Rope.split(rest, start)
+            return IotaList.build((), middle, ())
+
+        index = self.absolute_index(index)
+        if index < len(self.front):
+            return self.front[index]
+        index -= len(self.front)
+        rope_size = Rope.size(self.rope)
+        if index < rope_size:
+            return Rope.get(self.rope, index)
+        return self.back[index - rope_size]
+
+    def __contains__(self, value):
+        if self.members is not None:
+            return value in self.members
+        return any(item is value or item == value for item in self)
+
+    def distinct(self):
+        """Return a dict with each distinct item of the list as a key, in the order they first
+        appear. It is worked out once per list, so set operators on the same list don't hash
+        its items again."""
+        if self.members is None:
+            charge(self.length)
+            self.members = dict.fromkeys(self)
+        return self.members
+
+    def index(self, value):
+        for i, item in enumerate(self):
+            if item is value or item == value:
+                return i
+        raise ValueError(f"{value!r} is not in list")
+
+    def set(self, index, value):
+        """Return a copy of the list with the item at ``index`` replaced."""
+        index = self.absolute_index(index)
+        front, rope, back = self.front, self.rope, self.back
+        if index < len(front):
+            return IotaList.build(front[:index] + (value,) + front[index + 1:], rope, back)
+        index -= len(front)
+        rope_size = Rope.size(rope)
+        if index < rope_size:
+            return IotaList.build(front, Rope.replace(rope, index, value), back)
+        index -= rope_size
+        return IotaList.build(front, rope, back[:index] + (value,) + back[index + 1:])
+
+    def push(self, value):
+        """Return a copy of the list with the value added at the end."""
+        if len(self.back) < LEAF_SIZE:
+            return IotaList.build(self.front, self.rope, self.back + (value,))
+        return IotaList.build(self.front, Rope.join(self.rope, self.back), (value,))
+
+    def push_front(self, value):
+        """Return a copy of the list with the value added at the start."""
+        if len(self.front) < LEAF_SIZE:
+            return IotaList.build((value,) + self.front, self.rope, self.back)
+        return IotaList.build((value,), Rope.join(self.front, self.rope), self.back)
+
+    def pop_front(self):
+        """Return the first item and the list without it."""
+        front, rope, back = self.front, self.rope, self.back
+        if not front:
+            if rope is not None:
+                leaf, rope = Rope.split(rope, LEAF_SIZE)
+                front = tuple(Rope.iterate(leaf))
+            elif back:
+                front, back = back, ()
+            else:
+                raise IndexError("pop from empty list")
+        return front[0], IotaList.build(front[1:], rope, back)
+
+    def pop_back(self):
+        """Return the last item and the list without it."""
+        front, rope, back = self.front, self.rope, self.back
+        if not back:
+            if rope is not None:
+                rope, leaf = Rope.split(rope, Rope.size(rope) - LEAF_SIZE)
+                back = tuple(Rope.iterate(leaf))
+            elif front:
+                front, back = (), front
+            else:
+                raise IndexError("pop from empty list")
+        return back[-1], IotaList.build(front, rope, back[:-1])
+
+    def concat(self, other):
+        """Return a list holding the items of this list followed by the other's."""
+        if not isinstance(other, IotaList):
+            other = IotaList(other)
+        if not other:
+            return self
+        if not self:
+            return other
+        return IotaList.build((), Rope.join(self.to_rope(), other.to_rope()), ())
+
+    def reverse(self):
+        """Return a copy of the list in reverse order."""
+        return IotaList(reversed(self))
+
+
+IotaList.EMPTY = IotaList()
@@ -0,0 +1,410 @@
+import numpy as np
+
+from util import Rope
+from util.MemoryBudget import charge
+from values.IotaList import IotaList
+from values.Vec3 import Vec3
+
+# Shorter lists are quicker to build and iterate as tuples than as arrays
+MIN_ARRAY_ITEMS = 16
+# Smallest buffer allocated when a list grows
+MIN_CAPACITY = 8
+
+ADD = "add"
+SUB = "sub"
+MUL = "mul"
+DIV = "div"
+PWR = "pwr"
+LOG = "log"
+GT = "gt"
+LT = "lt"
+GE = "ge"
+LE = "le"
+
+COMPARISONS = {GT: np.greater, LT: np.less, GE: np.greater_equal, LE: np.less_equal}
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def operand(value):
+    """Return the array data of a number, vector or list of either, whether it holds vectors
+    and whether it is a list.
+
+    Returns None for anything else, including lists that mix numbers and vectors.
+    """
+    if isinstance(value, IotaList):
+        value = value.numeric()
+        if value is None:
+            return None
+        return value.array, value.is_vectors, True
+    if type(value) is Vec3:
+        return np.array(value), True, False
+    if is_number(value):
+        return float(value), False, False
+    return None
+
+
+def new_buffer(array, capacity, start=0):
+    buffer = np.empty((capacity,) + array.shape[1:])
+    buffer[start:start + len(array)] = array
+    return buffer
+
+
+def elementwise(operation, left, right):
+    """Apply a math operator over lists of numbers or vectors, as it would apply to each item.
+
+    ``left`` and ``right`` are the operator's operands in the order the scalar operator
+    takes them. Lists must be the same length, and numbers or single vectors broadcast
+    over them. Returns NotImplemented if an operand is not a number, vector or list of
+    either, and raises like the scalar operator if the operation is undefined.
+    """
+    left_operand = operand(left)
+    right_operand = operand(right)
+    if left_operand is None or right_operand is None:
+        return NotImplemented
+    left_data, left_vectors, left_is_list = left_operand
+    right_data, right_vectors, right_is_list = right_operand
+    if left_is_list and right_is_list and len(left_data) != len(right_data):
+        raise ValueError("lists must be the same length")
+
+    if operation in COMPARISONS:
+        if left_vectors or right_vectors:
+            raise TypeError("vectors have no ordering")
+        return IotaList(COMPARISONS[operation](left_data, right_data).tolist())
+
+    # Numbers combined with vectors apply to each component
+    if left_vectors and not right_vectors:
+        right_data = np.asarray(right_data)[..., None]
+    elif right_vectors and not left_vectors:
+        left_data = np.asarray(left_data)[..., None]
+
+    with np.errstate(divide="raise", invalid="raise", over="ignore"):
+        if operation == ADD:
+            result = np.add(left_data, right_data)
+        elif operation == SUB:
+            result = np.subtract(left_data, right_data)
+        elif operation == MUL:
+            if left_vectors and right_vectors:
+                result = np.sum(left_data * right_data, axis=-1)
+            else:
+                result = np.multiply(left_data, right_data)
+        elif operation == DIV:
+            if left_vectors and right_vectors:
+                result = np.cross(left_data, right_data)
+            else:
+                result = np.divide(left_data, right_data)
+        elif operation == PWR:
+            if left_vectors and right_vectors:
+                # Projects the right vectors onto the left ones
+                scale = np.sum(left_data * right_data, axis=-1) / np.sum(left_data * left_data, axis=-1)
+                result = left_data * scale[..., None]
+            else:
+                result = np.power(left_data, right_data)
+        elif operation == LOG:
+            if left_vectors or right_vectors:
+                raise TypeError("logarithms need numbers")
+            result = np.log(left_data) / np.log(right_data)
+        else:
+            raise ValueError(f"unknown operation {operation}")
+    return NumericList.wrap(result)
+
+
+def map_numbers(func, value):
+    """Apply a NumPy function to each item of a list of numbers."""
+    numeric = value.numeric()
+    if numeric is None or numeric.array.ndim != 1:
+        raise TypeError("list must hold only numbers")
+    with np.errstate(divide="raise", invalid="raise", over="ignore"):
+        return NumericList.wrap(func(numeric.array))
+
+
+def make_list(items):
+    """Return the items as a NumericList if there are enough of them and they are all numbers
+    or all vectors, or else as an IotaList."""
+    items = tuple(items)
+    if len(items) >= MIN_ARRAY_ITEMS:
+        numeric = NumericList.from_items(items)
+        if numeric is not None:
+            return numeric
+    return IotaList(items)
+
+
+class NumericList(IotaList):
+    """An IotaList of only numbers or only vectors, stored as a float64 array.
+
+    Numbers are kept in an N array and vectors in an N x 3 array. It behaves like any
+    other IotaList, and math operators apply to each item with NumPy. Adding two lists
+    joins them, while other math on two lists needs them to be the same length.
+
+    Lists are immutable, so ``array`` is a read only view into ``buffer``, which may be
+    shared with other lists and have room past either end of the view. ``head`` and
+    ``tail`` hold the start and end of the part of the buffer in use, or are None for
+    lists that may not grow into it. A list that pushes past the end of its view claims
+    ``tail`` by popping it, so only one list ever writes to each spare slot, and pushes
+    and pushes to the front are amortized O(1). Indexing and slicing are O(1).
+    """
+    __slots__ = ("array", "buffer", "start", "head", "tail")
+
+    def __init__(self, array):
+        array = np.array(array, dtype=float)
+        self.init(array, 0, len(array), [0], [len(array)])
+
+    def init(self, buffer, start, length, head, tail):
+        self.front, self.rope, self.back = (), None, ()
+        self.buffer = buffer
+        self.start = start
+        self.length = length
+        self.head = head
+        self.tail = tail
+        self.hash = None
+        self.members = None
+        self.array = buffer[start:start + length]
+        self.array.flags.writeable = False
+
+    @staticmethod
+    def view(buffer, start, length, head=None, tail=None):
+        lst = object.__new__(NumericList)
+        lst.init(buffer, start, length, head, tail)
+        return lst
+
+    @staticmethod
+    def wrap(array):
+        """Return a list over an array that nothing else refers to, without copying it."""
+        charge(array.size)
+        return NumericList.view(array, 0, len(array), [0], [len(array)])
+
+    @staticmethod
+    def from_items(items):
+        """Return the items as a NumericList, or None unless they are all numbers or all vectors."""
+        if not isinstance(items, (tuple, list)):
+            # Most other lists are ruled out by their first item, without copying them
+            for first in items:
+                if type(first) is not Vec3 and not is_number(first):
+                    return None
+                break
+            charge(len(items))
+            items = tuple(items)
+        if not items:
+            return None
+        if type(items[0]) is Vec3:
+            if not all(type(item) is Vec3 for item in items):
+                return None
+        elif not all(type(item) is float for item in items) and not all(map(is_number, items)):
+            return None
+        return NumericList.wrap(np.array(items, dtype=float))
+
+    def stored_size(self):
+        return self.array.size
+
+    @property
+    def is_vectors(self):
+        return self.array.ndim == 2
+
+    def numeric(self):
+        return self
+
+    def to_rope(self):
+        return Rope.from_iterable(self) if self.length else None
+
+    def coerce(self, value):
+        """Return the value as an item of this list, or None if it is the wrong kind."""
+        if self.is_vectors:
+            return value if type(value) is Vec3 else None
+        return float(value) if is_number(value) else None
+
+    def __iter__(self):
+        if self.is_vectors:
+            return iter(Vec3.from_rows(self.array))
+        return iter(self.array.tolist())
+
+    def __reversed__(self):
+        return reversed(list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, NumericList):
+            return self.array.shape == other.array.shape and bool(np.array_equal(self.array, other.array))
+        return super().__eq__(other)
+
+    __hash__ = IotaList.__hash__
+
+    def __reduce__(self):
+        return NumericList, (np.array(self.array),)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return NumericList(self.array[index])
+            if stop <= start:
+                return IotaList()
+            return NumericList.view(self.buffer, self.start + start, stop - start)
+        item = self.array[self.absolute_index(index)]
+        if self.is_vectors:
+            return Vec3.of(*item.tolist())
+        return float(item)
+
+    def matches(self, value):
+        """Return a boolean array of which items equal the value."""
+        if self.is_vectors:
+            if type(value) is not Vec3:
+                return None
+            return np.all(self.array == np.array(value), axis=1)
+        if not isinstance(value, (int, float)):
+            return None
+        return self.array == float(value)
+
+    def __contains__(self, value):
+        matches = self.matches(value)
+        return matches is not None and bool(matches.any())
+
+    def index(self, value):
+        matches = self.matches(value)
+        if matches is not None:
+            found = np.flatnonzero(matches)
+            if len(found):
+                return int(found[0])
+        raise ValueError(f"{value!r} is not in list")
+
+    def generic(self):
+        return IotaList(tuple(self))
+
+    def set(self, index, value):
+        item = self.coerce(value)
+        if item is None:
+            return self.generic().set(index, value)
+        array = np.array(self.array)
+        array[self.absolute_index(index)] = item
+        return NumericList.wrap(array)
+
+    def extend_back(self, rows):
+        """Return a list with the rows added at the end, writing them into spare buffer space if it can."""
+        end = self.start + self.length
+        count = len(rows)
+        claimed = None
+        if self.tail is not None:
+            try:
+                claimed = self.tail.pop()
+            except IndexError:
+                pass
+        if claimed == end and end + count <= len(self.buffer):
+            self.buffer[end:end + count] = rows
+            self.tail.append(end + count)
+            return NumericList.view(self.buffer, self.start, self.length + count, self.head, self.tail)
+        if claimed is not None:
+            self.tail.append(claimed)
+        length = self.length + count
+        buffer = new_buffer(self.array, max(2 * length, MIN_CAPACITY))
+        buffer[self.length:length] = rows
+        return NumericList.view(buffer, 0, length, [0], [length])
+
+    def push(self, value):
+        item = self.coerce(value)
+        if item is None:
+            return self.generic().push(value)
+        return self.extend_back([item])
+
+    def push_front(self, value):
+        item = self.coerce(value)
+        if item is None:
+            return self.generic().push_front(value)
+        claimed = None
+        if self.head is not None:
+            try:
+                claimed = self.head.pop()
+            except IndexError:
+                pass
+        if claimed == self.start and self.start > 0:
+            start = self.start - 1
+            self.buffer[start] = item
+            self.head.append(start)
+            return NumericList.view(self.buffer, start, self.length + 1, self.head, self.tail)
+        if claimed is not None:
+            self.head.append(claimed)
+        capacity = max(2 * (self.length + 1), MIN_CAPACITY)
+        start = capacity - self.length - 1
+        buffer = new_buffer(self.array, capacity, start + 1)
+        buffer[start] = item
+        return NumericList.view(buffer, start, self.length + 1, [start], [capacity])
+
+    def pop_front(self):
+        if not self.length:
+            raise IndexError("pop from empty list")
+        return self[0], NumericList.view(self.buffer, self.start + 1, self.length - 1)
+
+    def pop_back(self):
+        if not self.length:
+            raise IndexError("pop from empty list")
+        return self[-1], NumericList.view(self.buffer, self.start, self.length - 1)
+
+    def concat(self, other):
+        if not isinstance(other, IotaList):
+            other = IotaList(other)
+        if not other:
+            return self
+        numeric = other.numeric()
+        if numeric is None or numeric.is_vectors != self.is_vectors:
+            return self.generic().concat(other)
+        return self.extend_back(numeric.array)
+
+    def reverse(self):
+        return NumericList(self.array[::-1])
+
+    # + on two lists joins them, as it always has, so it only adds numbers and vectors to each item
+    def __add__(self, other):
+        if isinstance(other, (IotaList, list)):
+            return self.concat(other)
+        return elementwise(ADD, self, other)
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return IotaList(other).concat(self)
+        return elementwise(ADD, other, self)
+
+    def __sub__(self, other):
+        return elementwise(SUB, self, other)
+
+    def __rsub__(self, other):
+        return elementwise(SUB, other, self)
+
+    def __mul__(self, other):
+        return elementwise(MUL, self, other)
+
+    def __rmul__(self, other):
+        return elementwise(MUL, other, self)
+
+    def __truediv__(self, other):
+        return elementwise(DIV, self, other)
+
+    def __rtruediv__(self, other):
+        return elementwise(DIV, other, self)
+
+    def __pow__(self, other):
+        return elementwise(PWR, self, other)
+
+    def __rpow__(self, other):
+        return elementwise(PWR, other, self)
+
+    def __gt__(self, other):
+        return elementwise(GT, self, other)
+
+    def __lt__(self, other):
+        return elementwise(LT, self, other)
+
+    def __ge__(self, other):
+        return elementwise(GE, self, other)
+
+    def __le__(self, other):
+        return elementwise(LE, self, other)
+
+    def __abs__(self):
+        if self.is_vectors:
+            return NumericList.wrap(np.sqrt(np.sum(self.array * self.array, axis=1)))
+        return NumericList.wrap(np.abs(self.array))
+
+    def __floor__(self):
+        return map_numbers(np.floor, self)
+
+    def __ceil__(self):
+        return map_numbers(np.ceil, self)
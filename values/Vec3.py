@@ -0,0 +1,196 @@
+import math
+
+import numpy as np
+
+new_tuple = tuple.__new__
+
+
+class Vec3(tuple):
+    """An immutable, hashable 3D vector.
+
+    Vectors are tuples underneath, so they hash, compare and index like tuples, but the
+    arithmetic operators follow the spell semantics: ``+`` and ``-`` work componentwise
+    (numbers broadcast), ``*`` is the dot product (or scaling by a number) and ``/`` is
+    the cross product (or division by a number). ``**`` and ``%`` with a number, and ``/``
+    with a number on the left, apply to each component.
+    """
+    __slots__ = ()
+
+    def __new__(cls, x, y, z):
+        return new_tuple(cls, (float(x), float(y), float(z)))
+
+    @staticmethod
+    def of(x, y, z):
+        """Build a vector from components that are already floats, skipping conversion."""
+        return new_tuple(Vec3, (x, y, z))
+
+    @staticmethod
+    def from_numpy(array):
+        return Vec3.of(*array.tolist())
+
+    @staticmethod
+    def from_rows(array):
+        """Convert an N x 3 array into a list of vectors."""
+        return [new_tuple(Vec3, row) for row in np.asarray(array, dtype=float).tolist()]
+
+    @staticmethod
+    def to_rows(vectors):
+        """Convert a sequence of vectors into an N x 3 array."""
+        return np.array(vectors, dtype=float).reshape(-1, 3)
+
+    def to_numpy(self):
+        return np.array(self, dtype=float)
+
+    @property
+    def x(self):
+        return self[0]
+
+    @property
+    def y(self):
+        return self[1]
+
+    @property
+    def z(self):
+        return self[2]
+
+    def __reduce__(self):
+        return Vec3.of, tuple(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"vec([{self[0]}, {self[1]}, {self[2]}])"
+
+    __str__ = __repr__
+
+    def __add__(self, other):
+        x, y, z = self
+        if type(other) is Vec3:
+            ox, oy, oz = other
+            return new_tuple(Vec3, (x + ox, y + oy, z + oz))
+        if isinstance(other, (int, float)):
+            return new_tuple(Vec3, (x + other, y + other, z + other))
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        x, y, z = self
+        if type(other) is Vec3:
+            ox, oy, oz = other
+            return new_tuple(Vec3, (x - ox, y - oy, z - oz))
+        if isinstance(other, (int, float)):
+            return new_tuple(Vec3, (x - other, y - other, z - other))
+        return NotImplemented
+
+    def __rsub__(self, other):
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (other - x, other - y, other - z))
+        return NotImplemented
+
+    def __neg__(self):
+        x, y, z = self
+        return new_tuple(Vec3, (-x, -y, -z))
+
+    def __mul__(self, other):
+        if type(other) is Vec3:
+            return self.dot(other)
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (x * other, y * other, z * other))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if type(other) is Vec3:
+            return self.cross(other)
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (x / other, y / other, z / other))
+        return NotImplemented
+
+    def __rtruediv__(self, other):
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (other / x, other / y, other / z))
+        return NotImplemented
+
+    # math.pow raises for a negative base and fractional exponent, instead of returning complex components
+    def __pow__(self, other):
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (math.pow(x, other), math.pow(y, other), math.pow(z, other)))
+        return NotImplemented
+
+    def __rpow__(self, other):
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (math.pow(other, x), math.pow(other, y), math.pow(other, z)))
+        return NotImplemented
+
+    def __mod__(self, other):
+        x, y, z = self
+        if type(other) is Vec3:
+            ox, oy, oz = other
+            return new_tuple(Vec3, (x % ox, y % oy, z % oz))
+        if isinstance(other, (int, float)):
+            return new_tuple(Vec3, (x % other, y % other, z % other))
+        return NotImplemented
+
+    def __rmod__(self, other):
+        if isinstance(other, (int, float)):
+            x, y, z = self
+            return new_tuple(Vec3, (other % x, other % y, other % z))
+        return NotImplemented
+
+    def __abs__(self):
+        return self.norm()
+
+    # Vectors have no ordering
+    def __lt__(self, other):
+        return NotImplemented
+
+    __le__ = __gt__ = __ge__ = __lt__
+
+    def dot(self, other):
+        x, y, z = self
+        ox, oy, oz = other
+        return x * ox + y * oy + z * oz
+
+    def cross(self, other):
+        x, y, z = self
+        ox, oy, oz = other
+        return new_tuple(Vec3, (y * oz - z * oy, z * ox - x * oz, x * oy - y * ox))
+
+    def norm(self):
+        x, y, z = self
+        return math.sqrt(x * x + y * y + z * z)
+
+    def project(self, onto):
+        """Return the projection of this vector onto another one."""
+        return onto * (self.dot(onto) / onto.dot(onto))
+
+    def axis(self):
+        """Return the unit axis vector closest in direction to this one, or the zero vector for zero."""
+        if self == Vec3.ZERO:
+            return Vec3.ZERO
+        x, y, z = self
+        # Ties go to the first axis, in the order +x, +y, +z, -x, -y, -z
+        dots = (x, y, z, -x, -y, -z)
+        return Vec3.AXES[dots.index(max(dots))]
+
+
+Vec3.ZERO = Vec3(0, 0, 0)
+Vec3.X_PLUS = Vec3(1, 0, 0)
+Vec3.X_MINUS = Vec3(-1, 0, 0)
+Vec3.Y_PLUS = Vec3(0, 1, 0)
+Vec3.Y_MINUS = Vec3(0, -1, 0)
+Vec3.Z_PLUS = Vec3(0, 0, 1)
+Vec3.Z_MINUS = Vec3(0, 0, -1)
+Vec3.AXES = (Vec3.X_PLUS, Vec3.Y_PLUS, Vec3.Z_PLUS, Vec3.X_MINUS, Vec3.Y_MINUS, Vec3.Z_MINUS)